@@ -7,21 +7,16 @@ Add Chat Date Property - データベースに「チャット日時」プロパ
 import os
 import sys
 import json
-import time
 import re
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 
-try:
-    from notion_client import Client
-    from notion_client.errors import APIResponseError, RequestTimeoutError
-except Exception:
-    print("notion-client がありません。`pip install -r requirements.txt` を実行してください。")
-    sys.exit(1)
-
 from dotenv import load_dotenv
 load_dotenv()
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from notion_common import with_retry, create_client
+
 # 環境変数
 NOTION_TOKEN = os.getenv("NOTION_TOKEN")
 CHATGPT_DB_ID = os.getenv("CHATGPT_DB_ID")
@@ -32,32 +27,7 @@ if not NOTION_TOKEN or not CHATGPT_DB_ID:
     sys.exit(1)
 
 # Notionクライアント
-notion = Client(auth=NOTION_TOKEN, timeout_ms=int(NOTION_TIMEOUT * 1000))
-
-def with_retry(fn, *, max_attempts=4, base_delay=1.0, what="api"):
-    """リトライ付きAPI呼び出し"""
-    import random
-    attempt = 0
-    while True:
-        try:
-            return fn()
-        except RequestTimeoutError as e:
-            attempt += 1
-            if attempt >= max_attempts:
-                raise
-            delay = base_delay * (2 ** (attempt-1)) + random.uniform(0, 0.5)
-            print(f"[RETRY] Timeout on {what}. retry {attempt}/{max_attempts} in {delay:.1f}s")
-            time.sleep(delay)
-        except APIResponseError as e:
-            if getattr(e, "code", "") == "rate_limited":
-                attempt += 1
-                retry_after = float(getattr(e, "headers", {}).get("Retry-After", 1)) if hasattr(e, "headers") else 1.0
-                delay = max(retry_after, base_delay * (2 ** (attempt-1))) + random.uniform(0, 0.5)
-                print(f"[RETRY] rate_limited on {what}. retry {attempt}/{max_attempts} in {delay:.1f}s")
-                time.sleep(delay)
-                if attempt < max_attempts:
-                    continue
-            raise
+notion = create_client(NOTION_TOKEN, NOTION_TIMEOUT)
 
 def add_chat_date_property_to_database():
     """データベースに「チャット日時」プロパティを追加"""
@@ -11,16 +11,12 @@ import re
 import time
 from typing import List, Dict, Any
 
-try:
-    from notion_client import Client
-    from notion_client.errors import APIResponseError, RequestTimeoutError
-except Exception:
-    print("notion-client がありません。`pip install -r requirements.txt` を実行してください。")
-    sys.exit(1)
-
 from dotenv import load_dotenv
 load_dotenv()
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from notion_common import with_retry, create_client, iter_database_pages, iter_block_children
+
 # 環境変数
 NOTION_TOKEN = os.getenv("NOTION_TOKEN")
 CHATGPT_DB_ID = os.getenv("CHATGPT_DB_ID")
@@ -31,32 +27,7 @@ if not NOTION_TOKEN or not CHATGPT_DB_ID:
     sys.exit(1)
 
 # Notionクライアント
-notion = Client(auth=NOTION_TOKEN, timeout_ms=int(NOTION_TIMEOUT * 1000))
-
-def with_retry(fn, *, max_attempts=4, base_delay=1.0, what="api"):
-    """リトライ付きAPI呼び出し"""
-    import random
-    attempt = 0
-    while True:
-        try:
-            return fn()
-        except RequestTimeoutError as e:
-            attempt += 1
-            if attempt >= max_attempts:
-                raise
-            delay = base_delay * (2 ** (attempt-1)) + random.uniform(0, 0.5)
-            print(f"[RETRY] Timeout on {what}. retry {attempt}/{max_attempts} in {delay:.1f}s")
-            time.sleep(delay)
-        except APIResponseError as e:
-            if getattr(e, "code", "") == "rate_limited":
-                attempt += 1
-                retry_after = float(getattr(e, "headers", {}).get("Retry-After", 1)) if hasattr(e, "headers") else 1.0
-                delay = max(retry_after, base_delay * (2 ** (attempt-1))) + random.uniform(0, 0.5)
-                print(f"[RETRY] rate_limited on {what}. retry {attempt}/{max_attempts} in {delay:.1f}s")
-                time.sleep(delay)
-                if attempt < max_attempts:
-                    continue
-            raise
+notion = create_client(NOTION_TOKEN, NOTION_TIMEOUT)
 
 def clean_garbage_text_properly(text: str) -> str:
     """適切にゴミ文字のみを除去（必要なテキストは保持）"""
@@ -104,59 +75,21 @@ def has_garbage_text(text: str) -> bool:
 def get_all_pages() -> List[Dict[str, Any]]:
     """データベース内の全ページを取得"""
     pages = []
-    start_cursor = None
-    
-    while True:
-        try:
-            response = with_retry(
-                lambda: notion.databases.query(
-                    database_id=CHATGPT_DB_ID,
-                    start_cursor=start_cursor,
-                    page_size=100
-                ),
-                what="query database"
-            )
-            
-            pages.extend(response.get("results", []))
-            
-            if not response.get("has_more"):
-                break
-                
-            start_cursor = response.get("next_cursor")
-            
-        except Exception as e:
-            print(f"ページ取得エラー: {e}")
-            break
-    
+    try:
+        for page in iter_database_pages(notion, CHATGPT_DB_ID):
+            pages.append(page)
+    except Exception as e:
+        print(f"ページ取得エラー: {e}")
     return pages
 
 def get_page_blocks(page_id: str) -> List[Dict[str, Any]]:
     """ページの全ブロックを取得"""
     blocks = []
-    start_cursor = None
-    
-    while True:
-        try:
-            response = with_retry(
-                lambda: notion.blocks.children.list(
-                    block_id=page_id,
-                    start_cursor=start_cursor,
-                    page_size=100
-                ),
-                what="get page blocks"
-            )
-            
-            blocks.extend(response.get("results", []))
-            
-            if not response.get("has_more"):
-                break
-                
-            start_cursor = response.get("next_cursor")
-            
-        except Exception as e:
-            print(f"ブロック取得エラー: {e}")
-            break
-    
+    try:
+        for block in iter_block_children(notion, page_id):
+            blocks.append(block)
+    except Exception as e:
+        print(f"ブロック取得エラー: {e}")
     return blocks
 
 def update_block_content(block_id: str, new_content: str) -> bool:
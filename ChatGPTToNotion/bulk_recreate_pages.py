@@ -12,16 +12,12 @@ import time
 import json
 from typing import List, Dict, Any
 
-try:
-    from notion_client import Client
-    from notion_client.errors import APIResponseError, RequestTimeoutError
-except Exception:
-    print("notion-client がありません。`pip install -r requirements.txt` を実行してください。")
-    sys.exit(1)
-
 from dotenv import load_dotenv
 load_dotenv()
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from notion_common import with_retry, create_client, iter_database_pages, iter_block_children
+
 # 環境変数
 NOTION_TOKEN = os.getenv("NOTION_TOKEN")
 CHATGPT_DB_ID = os.getenv("CHATGPT_DB_ID")
@@ -32,32 +28,7 @@ if not NOTION_TOKEN or not CHATGPT_DB_ID:
     sys.exit(1)
 
 # Notionクライアント
-notion = Client(auth=NOTION_TOKEN, timeout_ms=int(NOTION_TIMEOUT * 1000))
-
-def with_retry(fn, *, max_attempts=4, base_delay=1.0, what="api"):
-    """リトライ付きAPI呼び出し"""
-    import random
-    attempt = 0
-    while True:
-        try:
-            return fn()
-        except RequestTimeoutError as e:
-            attempt += 1
-            if attempt >= max_attempts:
-                raise
-            delay = base_delay * (2 ** (attempt-1)) + random.uniform(0, 0.5)
-            print(f"[RETRY] Timeout on {what}. retry {attempt}/{max_attempts} in {delay:.1f}s")
-            time.sleep(delay)
-        except APIResponseError as e:
-            if getattr(e, "code", "") == "rate_limited":
-                attempt += 1
-                retry_after = float(getattr(e, "headers", {}).get("Retry-After", 1)) if hasattr(e, "headers") else 1.0
-                delay = max(retry_after, base_delay * (2 ** (attempt-1))) + random.uniform(0, 0.5)
-                print(f"[RETRY] rate_limited on {what}. retry {attempt}/{max_attempts} in {delay:.1f}s")
-                time.sleep(delay)
-                if attempt < max_attempts:
-                    continue
-            raise
+notion = create_client(NOTION_TOKEN, NOTION_TIMEOUT)
 
 def clean_garbage_text_comprehensive(text: str) -> str:
     """包括的なゴミ文字除去（改行は保持）"""
@@ -111,59 +82,21 @@ def clean_garbage_text_comprehensive(text: str) -> str:
 def get_all_pages() -> List[Dict[str, Any]]:
     """データベースの全ページを取得"""
     pages = []
-    start_cursor = None
-    
-    while True:
-        try:
-            response = with_retry(
-                lambda: notion.databases.query(
-                    database_id=CHATGPT_DB_ID,
-                    start_cursor=start_cursor,
-                    page_size=100
-                ),
-                what="query database"
-            )
-            
-            pages.extend(response.get("results", []))
-            
-            if not response.get("has_more"):
-                break
-                
-            start_cursor = response.get("next_cursor")
-            
-        except Exception as e:
-            print(f"ページ取得エラー: {e}")
-            break
-    
+    try:
+        for page in iter_database_pages(notion, CHATGPT_DB_ID):
+            pages.append(page)
+    except Exception as e:
+        print(f"ページ取得エラー: {e}")
     return pages
 
 def get_page_blocks(page_id: str) -> List[Dict[str, Any]]:
     """ページの全ブロックを取得"""
     blocks = []
-    start_cursor = None
-    
-    while True:
-        try:
-            response = with_retry(
-                lambda: notion.blocks.children.list(
-                    block_id=page_id,
-                    start_cursor=start_cursor,
-                    page_size=100
-                ),
-                what="get page blocks"
-            )
-            
-            blocks.extend(response.get("results", []))
-            
-            if not response.get("has_more"):
-                break
-                
-            start_cursor = response.get("next_cursor")
-            
-        except Exception as e:
-            print(f"ブロック取得エラー: {e}")
-            break
-    
+    try:
+        for block in iter_block_children(notion, page_id):
+            blocks.append(block)
+    except Exception as e:
+        print(f"ブロック取得エラー: {e}")
     return blocks
 
 def get_page_properties(page_id: str) -> Dict[str, Any]:
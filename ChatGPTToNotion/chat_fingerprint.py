@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+Chat Fingerprint - エクスポートだけで行うチャットの変更検出
+update_time・メッセージIDの並び・累積（ローリング）ハッシュから指紋を作り、
+索引に保存した前回の指紋と比べて「変更なし / 追記のみ / 書き換え」を判定します。
+"""
+
+import hashlib
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+# 判定結果
+UNCHANGED = "unchanged"   # 変更なし（APIを呼ばない）
+APPENDED = "appended"     # 末尾にメッセージが追加された
+REWRITTEN = "rewritten"   # 既存メッセージが編集・分岐された
+UNKNOWN = "unknown"       # 前回の指紋がない（索引構築直後など）
+
+
+def message_key(msg: Dict[str, Any], position: int) -> str:
+    """メッセージIDを返す（古い形式でIDがない場合は位置で代用）"""
+    return str(msg.get("id") or f"#{position}")
+
+
+def rolling_hashes(messages: List[Dict[str, Any]]) -> List[str]:
+    """先頭から各メッセージまでの累積ハッシュの一覧"""
+    hashes = []
+    h = hashlib.sha256()
+    for msg in messages:
+        h.update(f"{msg.get('role', '')}\0{msg.get('content', '')}\0".encode("utf-8"))
+        hashes.append(h.copy().hexdigest())
+    return hashes
+
+
+def compute_fingerprint(chat: Dict[str, Any], messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """チャットの指紋を計算"""
+    update_time = chat.get("update_time")
+    hashes = rolling_hashes(messages)
+    return {
+        "update_time": None if update_time is None else str(update_time),
+        "message_ids": [message_key(msg, i) for i, msg in enumerate(messages)],
+        "content_hash": hashes[-1] if hashes else "",
+        "rolling_hashes": hashes,
+    }
+
+
+def classify_change(entry: Optional[Dict[str, Any]], fingerprint: Dict[str, Any]) -> Tuple[str, int]:
+    """前回の索引エントリと指紋を比較
+
+    Returns:
+        (判定結果, 既存ページに反映済みのメッセージ数)
+    """
+    if not entry or entry.get("content_hash") is None:
+        return UNKNOWN, 0
+
+    stored_count = entry.get("message_count") or 0
+    if (entry["content_hash"] == fingerprint["content_hash"]
+            and entry.get("update_time") == fingerprint["update_time"]):
+        return UNCHANGED, stored_count
+
+    stored_ids = json.loads(entry["message_ids"]) if entry.get("message_ids") else None
+    if stored_ids is None:
+        # メッセージIDを保存していない古いエントリはメッセージ数の増加で判定
+        if len(fingerprint["message_ids"]) > stored_count:
+            return APPENDED, stored_count
+        return UNCHANGED, stored_count
+
+    current_ids = fingerprint["message_ids"]
+    hashes = fingerprint["rolling_hashes"]
+    if stored_count == 0:
+        return (APPENDED, 0) if current_ids else (UNCHANGED, 0)
+    if (len(current_ids) >= stored_count
+            and current_ids[:stored_count] == stored_ids
+            and hashes[stored_count - 1] == entry["content_hash"]):
+        # 既存部分が一致し、末尾だけ増えた（update_timeのみの変化も含む）
+        if len(current_ids) == stored_count:
+            return UNCHANGED, stored_count
+        return APPENDED, stored_count
+    return REWRITTEN, stored_count
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+Chat Page Index - チャットID → NotionページIDのローカル索引
+同期済みチャットのページID・メッセージ数・update_time・内容ハッシュ・メッセージIDをSQLiteに保存し、
+変更のないチャットではNotion APIを一切呼ばずに済むようにします。
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+DEFAULT_INDEX_PATH = str(Path(__file__).resolve().parent / "chat_page_index.db")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chat_pages (
+    chat_id TEXT PRIMARY KEY,
+    page_id TEXT NOT NULL,
+    message_count INTEGER,
+    update_time TEXT,
+    content_hash TEXT,
+    message_ids TEXT,
+    synced_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class ChatPageIndex:
+    """チャットID → ページ情報の永続索引"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("CHAT_INDEX_PATH", DEFAULT_INDEX_PATH)
+        # 並列ライタのワーカーからも更新するため、接続は1つをロックで共有する
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(_SCHEMA)
+        self._migrate()
+        self.conn.commit()
+
+    def _migrate(self):
+        """古い索引ファイルに不足している列を追加"""
+        columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(chat_pages)")}
+        if "message_ids" not in columns:
+            self.conn.execute("ALTER TABLE chat_pages ADD COLUMN message_ids TEXT")
+
+    def close(self):
+        self.conn.close()
+
+    def get(self, chat_id: str) -> Optional[Dict[str, Any]]:
+        """索引のエントリを取得（未登録ならNone）"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT * FROM chat_pages WHERE chat_id = ?", (chat_id,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def upsert(self, chat_id: str, page_id: str, message_count: Optional[int] = None,
+               update_time: Optional[Any] = None, content_hash: Optional[str] = None,
+               message_ids: Optional[List[str]] = None):
+        """エントリを登録・更新（Noneの項目は既存値を保持）"""
+        with self._lock:
+            self.conn.execute(
+                """
+                INSERT INTO chat_pages (chat_id, page_id, message_count, update_time, content_hash, message_ids, synced_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(chat_id) DO UPDATE SET
+                    page_id = excluded.page_id,
+                    message_count = COALESCE(excluded.message_count, chat_pages.message_count),
+                    update_time = COALESCE(excluded.update_time, chat_pages.update_time),
+                    content_hash = COALESCE(excluded.content_hash, chat_pages.content_hash),
+                    message_ids = COALESCE(excluded.message_ids, chat_pages.message_ids),
+                    synced_at = excluded.synced_at
+                """,
+                (chat_id, page_id, message_count,
+                 None if update_time is None else str(update_time),
+                 content_hash,
+                 None if message_ids is None else json.dumps(message_ids),
+                 time.time()),
+            )
+            self.conn.commit()
+
+    def count(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM chat_pages").fetchone()[0]
+
+    def is_bootstrapped(self) -> bool:
+        """データベース全件スキャンによる初期構築が済んでいるか"""
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = 'bootstrapped_at'").fetchone()
+        return row is not None
+
+    def mark_bootstrapped(self):
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('bootstrapped_at', ?)",
+                (str(time.time()),),
+            )
+            self.conn.commit()
+
+    def reset(self):
+        """索引を空にする（再構築用）"""
+        with self._lock:
+            self.conn.execute("DELETE FROM chat_pages")
+            self.conn.execute("DELETE FROM meta WHERE key = 'bootstrapped_at'")
+            self.conn.commit()
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+ChatGPT Export Stream - エクスポートファイルの逐次読み込み
+conversations.json を丸ごと json.load せず、会話を1件ずつ取り出します。
+メモリ使用量は「最大の会話1件分 + 読み込みバッファ」に収まります。
+"""
+
+import json
+from typing import Any, Dict, Iterator, Optional, TextIO
+
+# 1回の読み込みサイズ（会話が収まらない場合はバッファに合わせて倍々で増やす）
+READ_CHUNK_SIZE = 1024 * 1024
+
+_WHITESPACE = " \t\n\r"
+
+
+class _StreamReader:
+    """JSONテキストを先頭から順に消費するための小さなバッファ"""
+
+    def __init__(self, f: TextIO, chunk_size: int = READ_CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        """バッファに追記。読み込めた場合はTrue"""
+        if self.eof:
+            return False
+        # 消費済み部分を捨ててから追記する
+        if self.pos:
+            self.buffer = self.buffer[self.pos:]
+            self.pos = 0
+        size = max(self.chunk_size, len(self.buffer))
+        chunk = self.f.read(size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer += chunk
+        return True
+
+    def peek(self) -> Optional[str]:
+        """空白を読み飛ばし、次の1文字を返す（EOFならNone）"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return None
+
+    def expect(self, chars: str) -> str:
+        """次の文字が chars のいずれかであることを確認して消費"""
+        c = self.peek()
+        if c is None or c not in chars:
+            raise ValueError(f"JSON形式エラー: '{chars}' を期待しましたが '{c}' でした")
+        self.pos += 1
+        return c
+
+    def value(self) -> Any:
+        """次のJSON値を1つ読み込む"""
+        self.peek()
+        while True:
+            try:
+                obj, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # 数値などはバッファ末尾で途切れている可能性があるため、続きを確認する
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return obj
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            if not self._fill():
+                # EOFで確定させるために最後にもう一度だけ試す
+                obj, end = self.decoder.raw_decode(self.buffer, self.pos)
+                self.pos = end
+                return obj
+
+
+def _iter_array(reader: _StreamReader) -> Iterator[Any]:
+    """'[' の直後から配列要素を1件ずつ返す"""
+    if reader.peek() == "]":
+        reader.pos += 1
+        return
+    while True:
+        yield reader.value()
+        if reader.expect(",]") == "]":
+            return
+
+
+def iter_chatgpt_conversations(file_path: str) -> Iterator[Dict[str, Any]]:
+    """エクスポートファイルから会話を1件ずつ返す
+
+    対応形式:
+      - トップレベルが会話のリスト（conversations.json）
+      - {"conversations": [...]} 形式
+    """
+    with open(file_path, "r", encoding="utf-8") as f:
+        reader = _StreamReader(f)
+        first = reader.peek()
+
+        if first == "[":
+            reader.pos += 1
+            for chat in _iter_array(reader):
+                if isinstance(chat, dict):
+                    yield chat
+            return
+
+        if first == "{":
+            reader.pos += 1
+            if reader.peek() == "}":
+                raise ValueError(f"サポートされていないファイル形式: {file_path}")
+            while True:
+                key = reader.value()
+                reader.expect(":")
+                if key == "conversations" and reader.peek() == "[":
+                    reader.pos += 1
+                    for chat in _iter_array(reader):
+                        if isinstance(chat, dict):
+                            yield chat
+                    return
+                # 会話以外の値は読み飛ばす
+                reader.value()
+                if reader.expect(",}") == "}":
+                    break
+
+        raise ValueError(f"サポートされていないファイル形式: {file_path}")
+
+
+def looks_like_chatgpt_export(file_path: str) -> bool:
+    """ChatGPTのエクスポートファイルかどうかを、判定に必要なところまでだけ読んで確認する
+
+    判定基準:
+      - トップレベルがリスト: mapping（新しい形式）か messages（古い形式）を持つ要素があれば対象
+        （それより前に辞書以外の要素があれば対象外）
+      - トップレベルが辞書: conversations か messages のキーがあれば対象。
+        なければ conversations.json というファイル名なら対象
+    """
+    with open(file_path, "r", encoding="utf-8") as f:
+        reader = _StreamReader(f)
+        first = reader.peek()
+
+        if first == "[":
+            reader.pos += 1
+            for item in _iter_array(reader):
+                if not isinstance(item, dict):
+                    return False
+                if "mapping" in item or "messages" in item:
+                    return True
+            return False
+
+        if first == "{":
+            reader.pos += 1
+            if reader.peek() != "}":
+                while True:
+                    key = reader.value()
+                    if key in ("conversations", "messages"):
+                        return True
+                    reader.expect(":")
+                    # 判定に関係ない値は読み飛ばす
+                    reader.value()
+                    if reader.expect(",}") == "}":
+                        break
+            return file_path.endswith("conversations.json")
+
+        return False
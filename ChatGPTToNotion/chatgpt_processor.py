@@ -7,7 +7,6 @@ ChatGPTのエクスポートファイル（圧縮形式含む）を自動で処
 
 import os
 import sys
-import json
 import zipfile
 import tarfile
 import shutil
@@ -15,6 +14,8 @@ from pathlib import Path
 from datetime import datetime
 import glob
 
+from chatgpt_export_stream import looks_like_chatgpt_export
+
 def extract_archive(archive_path: str, extract_dir: str = None) -> str:
     """圧縮ファイルを解凍"""
     if extract_dir is None:
@@ -71,36 +72,8 @@ def find_json_files(directory: str) -> list:
 def validate_chatgpt_export(json_file: str) -> bool:
     """ChatGPTエクスポートファイルかどうかを検証"""
     try:
-        with open(json_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        # ChatGPTエクスポートファイルの構造をチェック
-        if isinstance(data, list):
-            # リスト形式の場合、各要素に必要なフィールドがあるかチェック
-            for item in data:
-                if not isinstance(item, dict):
-                    return False
-                # 新しい形式: mappingフィールドがあるかチェック
-                if 'mapping' in item:
-                    return True
-                # 古い形式: messagesフィールドがあるかチェック
-                if 'messages' in item:
-                    return True
-            return False
-        
-        elif isinstance(data, dict):
-            # 辞書形式の場合、conversationsフィールドがあるかチェック
-            if 'conversations' in data:
-                return True
-            # または直接messagesフィールドがあるかチェック
-            if 'messages' in data:
-                return True
-            # またはconversations.jsonファイルの場合（ファイル名で判定）
-            if json_file.endswith('conversations.json'):
-                return True
-        
-        return False
-    
+        # ファイル全体は読み込まず、会話の形式が確認できたところで判定する
+        return looks_like_chatgpt_export(json_file)
     except Exception as e:
         print(f"JSONファイル検証エラー ({json_file}): {e}")
         return False
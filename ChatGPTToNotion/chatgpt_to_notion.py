@@ -6,23 +6,26 @@ ChatGPTのチャット履歴をNotionデータベースに自動保存するツ
 
 import os
 import sys
-import json
-import time
 import hashlib
 from datetime import datetime, timezone
 from typing import Optional, Dict, Any, List
 from pathlib import Path
 
-try:
-    from notion_client import Client
-    from notion_client.errors import APIResponseError, RequestTimeoutError
-except Exception:
-    print("notion-client がありません。`pip install -r requirements.txt` を実行してください。")
-    sys.exit(1)
-
 from dotenv import load_dotenv
 load_dotenv()
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from notion_common import (
+    NotionWriter, append_blocks, create_client, create_page_with_blocks, get_block_cache, get_prop_val,
+    iter_block_children, iter_database_pages, print_call_stats, sync_page_blocks, text_to_blocks, with_retry,
+)
+
+from chatgpt_export_stream import iter_chatgpt_conversations
+from chat_page_index import ChatPageIndex
+from chat_fingerprint import (
+    compute_fingerprint, classify_change, UNCHANGED, APPENDED, REWRITTEN,
+)
+
 # 環境変数
 NOTION_TOKEN = os.getenv("NOTION_TOKEN")
 CHATGPT_DB_ID = os.getenv("CHATGPT_DB_ID")
@@ -43,55 +46,7 @@ if not NOTION_TOKEN or not CHATGPT_DB_ID:
     sys.exit(1)
 
 # Notionクライアント
-notion = Client(auth=NOTION_TOKEN, timeout_ms=int(NOTION_TIMEOUT * 1000))
-
-def with_retry(fn, *, max_attempts=4, base_delay=1.0, what="api"):
-    """リトライ付きAPI呼び出し"""
-    import random
-    attempt = 0
-    while True:
-        try:
-            return fn()
-        except RequestTimeoutError as e:
-            attempt += 1
-            if attempt >= max_attempts:
-                raise
-            delay = base_delay * (2 ** (attempt-1)) + random.uniform(0, 0.5)
-            print(f"[RETRY] Timeout on {what}. retry {attempt}/{max_attempts} in {delay:.1f}s")
-            time.sleep(delay)
-        except APIResponseError as e:
-            if getattr(e, "code", "") == "rate_limited":
-                attempt += 1
-                retry_after = float(getattr(e, "headers", {}).get("Retry-After", 1)) if hasattr(e, "headers") else 1.0
-                delay = max(retry_after, base_delay * (2 ** (attempt-1))) + random.uniform(0, 0.5)
-                print(f"[RETRY] rate_limited on {what}. retry {attempt}/{max_attempts} in {delay:.1f}s")
-                time.sleep(delay)
-                if attempt < max_attempts:
-                    continue
-            raise
-
-def get_prop_val(prop: Dict[str, Any]) -> Optional[Any]:
-    """プロパティ値の取得"""
-    t = prop.get("type")
-    if t == "date":
-        v = prop.get("date")
-        return v.get("start") if v else None
-    if t == "rich_text":
-        return "".join([span.get("plain_text", "") for span in prop.get("rich_text", [])]) or None
-    if t == "title":
-        return "".join([span.get("plain_text", "") for span in prop.get("title", [])]) or None
-    if t == "number":
-        return prop.get("number")
-    if t == "select":
-        s = prop.get("select")
-        return s.get("name") if s else None
-    if t == "multi_select":
-        return [option.get("name") for option in prop.get("multi_select", [])]
-    if t == "url":
-        return prop.get("url")
-    if t == "last_edited_time":
-        return prop.get("last_edited_time")
-    return None
+notion = create_client(NOTION_TOKEN, NOTION_TIMEOUT)
 
 def clean_garbage_text(text: str) -> str:
     """適切にゴミ文字のみを除去（必要なテキストは保持）"""
@@ -164,6 +119,7 @@ def extract_messages_from_mapping(mapping: Dict[str, Any]) -> List[Dict[str, Any
             
             if text_content.strip():
                 messages.append({
+                    "id": message.get("id") or message_id,
                     "role": role,
                     "content": text_content,
                     "timestamp": message.get("create_time")
@@ -184,6 +140,7 @@ def extract_messages_from_mapping(mapping: Dict[str, Any]) -> List[Dict[str, Any
             
             if text_content.strip():
                 messages.append({
+                    "id": message.get("id") or message_id,
                     "role": role,
                     "content": text_content,
                     "timestamp": message.get("create_time")
@@ -191,6 +148,12 @@ def extract_messages_from_mapping(mapping: Dict[str, Any]) -> List[Dict[str, Any
     
     return messages
 
+def get_chat_messages(chat_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """チャットからメッセージを取得（新しい形式（mapping）と古い形式（messages）の両方に対応）"""
+    if "mapping" in chat_data:
+        return extract_messages_from_mapping(chat_data["mapping"])
+    return chat_data.get("messages", [])
+
 def format_chat_content(messages: List[Dict[str, Any]]) -> str:
     """チャット内容をフォーマット"""
     if not messages:
@@ -265,16 +228,13 @@ def create_chat_page(chat_data: Dict[str, Any]) -> str:
     model = chat_data.get("default_model_slug", "ChatGPT")
     
     # 新しい形式（mapping）と古い形式（messages）の両方に対応
-    messages = []
-    if "mapping" in chat_data:
-        messages = extract_messages_from_mapping(chat_data["mapping"])
-    else:
-        messages = chat_data.get("messages", [])
+    messages = get_chat_messages(chat_data)
     
     message_count = len(messages)
     
-    # チャット内容をフォーマット
+    # チャット内容をフォーマットし、ページの本文ブロックに詰める
     content = format_chat_content(messages)
+    children = text_to_blocks(content)
     
     # ChatGPTのURLを生成（チャットIDから一貫したURLを生成）
     if chat_id:
@@ -292,35 +252,16 @@ def create_chat_page(chat_data: Dict[str, Any]) -> str:
         PROP_MODEL: {"multi_select": [{"name": model}]}
     }
     
-    # ページの本文コンテンツを作成
-    children = [
-        {
-            "object": "block",
-            "type": "paragraph",
-            "paragraph": {
-                "rich_text": [
-                    {
-                        "type": "text",
-                        "text": {
-                            "content": content
-                        }
-                    }
-                ]
-            }
-        }
-    ]
-    
     if DRY_RUN:
         print(f"[DRY_RUN] チャットページ作成: {title}")
         return "dry_run_page_id"
     
     try:
-        response = with_retry(
-            lambda: notion.pages.create(
-                parent={"database_id": CHATGPT_DB_ID},
-                properties=properties,
-                children=children
-            ),
+        response = create_page_with_blocks(
+            notion,
+            parent={"database_id": CHATGPT_DB_ID},
+            properties=properties,
+            blocks=children,
             what="create chat page"
         )
         page_id = response["id"]
@@ -334,8 +275,8 @@ def update_chat_page(page_id: str, chat_data: Dict[str, Any]):
     """チャットページを更新"""
     title = chat_data.get("title", "無題のチャット")
     updated_at = chat_data.get("updated_at")
-    model = chat_data.get("model", "ChatGPT")
-    messages = chat_data.get("messages", [])
+    model = chat_data.get("model") or chat_data.get("default_model_slug", "ChatGPT")
+    messages = get_chat_messages(chat_data)
     message_count = len(messages)
     
     # チャット内容をフォーマット
@@ -361,48 +302,14 @@ def update_chat_page(page_id: str, chat_data: Dict[str, Any]):
             what="update chat page properties"
         )
         
-        # 既存のブロックを削除
-        try:
-            existing_blocks = with_retry(
-                lambda: notion.blocks.children.list(block_id=page_id),
-                what="get existing blocks"
-            )
-            
-            for block in existing_blocks.get("results", []):
-                with_retry(
-                    lambda: notion.blocks.delete(block_id=block["id"]),
-                    what="delete existing block"
-                )
-        except Exception as e:
-            print(f"既存ブロック削除エラー: {e}")
-        
-        # 新しい本文コンテンツを追加
-        children = [
-            {
-                "object": "block",
-                "type": "paragraph",
-                "paragraph": {
-                    "rich_text": [
-                        {
-                            "type": "text",
-                            "text": {
-                                "content": content
-                            }
-                        }
-                    ]
-                }
-            }
-        ]
-        
-        with_retry(
-            lambda: notion.blocks.children.append(
-                block_id=page_id,
-                children=children
-            ),
-            what="update chat page content"
+        # 本文は変わったブロックだけを更新・追加・削除する
+        stats = sync_page_blocks(
+            notion, page_id, text_to_blocks(content),
+            cache=get_block_cache(), what="update chat page content"
         )
         
-        print(f"チャットページ更新完了: {title}")
+        print(f"チャットページ更新完了: {title} "
+              f"(更新{stats['update']} 追加{stats['insert']} 削除{stats['delete']})")
     except Exception as e:
         print(f"チャットページ更新エラー: {e}")
         raise
@@ -444,31 +351,12 @@ def append_new_messages_to_page(page_id: str, new_messages: List[Dict[str, Any]]
     current_date = datetime.now().strftime("%Y-%m-%d")
     
     # 新しいブロックを追加
-    children = [
-        {
-            "object": "block",
-            "type": "paragraph",
-            "paragraph": {
-                "rich_text": [
-                    {
-                        "type": "text",
-                        "text": {
-                            "content": f"\n\n--- {current_date} 追加メッセージ ---\n{new_content}"
-                        }
-                    }
-                ]
-            }
-        }
-    ]
+    children = text_to_blocks(f"\n\n--- {current_date} 追加メッセージ ---\n{new_content}")
     
     try:
-        with_retry(
-            lambda: notion.blocks.children.append(
-                block_id=page_id,
-                children=children
-            ),
-            what="append new messages"
-        )
+        append_blocks(notion, page_id, children, what="append new messages")
+        # 差分更新用のブロック一覧は次回取り直す
+        get_block_cache().discard(page_id)
         print(f"新しいメッセージを追加しました: {len(new_messages)}件")
     except Exception as e:
         print(f"メッセージ追加エラー: {e}")
@@ -503,86 +391,160 @@ def update_chat_page_properties(page_id: str, chat_data: Dict[str, Any]):
         print(f"プロパティ更新エラー: {e}")
         raise
 
+def chat_id_from_url(url: Optional[str]) -> Optional[str]:
+    """ページURLプロパティからチャットIDを取り出す"""
+    prefix = "https://chat.openai.com/c/"
+    if url and url.startswith(prefix):
+        return url[len(prefix):].strip("/") or None
+    return None
+
+def bootstrap_chat_index(chat_index: ChatPageIndex):
+    """CHATGPT_DB_IDを1回だけ全件スキャンして索引を構築"""
+    print("チャット索引を構築中（データベース全件スキャン）...")
+    registered = 0
+    for page in iter_database_pages(notion, CHATGPT_DB_ID):
+        prop = page.get("properties", {}).get(PROP_CHAT_ID)
+        chat_id = chat_id_from_url(get_prop_val(prop) if prop else None)
+        # 同じチャットのページが複数ある場合は先に見つかったものを使う
+        if chat_id and not chat_index.get(chat_id):
+            chat_index.upsert(chat_id, page["id"])
+            registered += 1
+    chat_index.mark_bootstrapped()
+    print(f"チャット索引構築完了: {registered}件")
+
+def estimate_existing_message_count(page_id: str) -> int:
+    """既存ページの本文からメッセージ数を推定（索引に指紋がない場合のみ使用）
+
+    本文が複数ブロックに分割されていても数えられるよう、全ブロックの見出しを合計する。
+    """
+    existing_message_count = 0
+    for block in iter_block_children(notion, page_id):
+        if block.get("type") == "paragraph":
+            rich_text = block.get("paragraph", {}).get("rich_text", [])
+            content = "".join([text.get("plain_text", "") for text in rich_text])
+            existing_message_count += content.count("【ユーザー") + content.count("【アシスタント")
+    return existing_message_count
+
+def sync_existing_chat(chat_index: ChatPageIndex, chat_id: str, page_id: str, chat: Dict[str, Any],
+                       change: str, existing_message_count: int,
+                       new_messages: List[Dict[str, Any]], fingerprint: Dict[str, Any]):
+    """既存ページへ変更を反映し、索引の指紋を更新"""
+    title = chat.get('title', '無題')
+    if change == REWRITTEN:
+        # 既存メッセージが編集・分岐された場合は本文を作り直す
+        print(f"  {title}: 既存メッセージの変更を検出: 本文を更新します")
+        update_chat_page(page_id, chat)
+    else:
+        if change != APPENDED:
+            # 指紋がない（索引構築直後）場合のみページ本文から推定
+            existing_message_count = estimate_existing_message_count(page_id)
+        
+        print(f"  {title}: 既存メッセージ数: {existing_message_count}, 新しいメッセージ数: {len(new_messages)}")
+        
+        if len(new_messages) > existing_message_count:
+            new_messages_only = new_messages[existing_message_count:]
+            print(f"  {title}: 新しいメッセージを検出: {len(new_messages_only)}件")
+            append_new_messages_to_page(page_id, new_messages_only)
+            
+            # プロパティも更新（メッセージ数など）
+            update_chat_page_properties(page_id, chat)
+        else:
+            print(f"  {title}: 新しいメッセージなし")
+    
+    if not DRY_RUN:
+        chat_index.upsert(
+            chat_id, page_id, len(new_messages), fingerprint["update_time"],
+            fingerprint["content_hash"], fingerprint["message_ids"]
+        )
+
+def sync_new_chat(chat_index: ChatPageIndex, chat_id: str, chat: Dict[str, Any],
+                  new_messages: List[Dict[str, Any]], fingerprint: Dict[str, Any]):
+    """新規ページを作成し、索引に登録"""
+    page_id = create_chat_page(chat)
+    if not DRY_RUN:
+        chat_index.upsert(
+            chat_id, page_id, len(new_messages), fingerprint["update_time"],
+            fingerprint["content_hash"], fingerprint["message_ids"]
+        )
+
 def process_chatgpt_export_file(file_path: str):
     """ChatGPTエクスポートファイルを処理"""
     print(f"ファイル処理中: {file_path}")
     
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        if isinstance(data, list):
-            chats = data
-        elif isinstance(data, dict) and "conversations" in data:
-            chats = data["conversations"]
-        else:
-            print(f"サポートされていないファイル形式: {file_path}")
-            return
+        # チャットID → ページIDの索引（未構築なら1回だけ全件スキャン）
+        chat_index = ChatPageIndex()
+        if not chat_index.is_bootstrapped():
+            try:
+                bootstrap_chat_index(chat_index)
+            except Exception as e:
+                print(f"チャット索引構築エラー（個別検索で続行）: {e}")
+        index_ready = chat_index.is_bootstrapped()
         
-        print(f"{len(chats)}個のチャットを処理中...")
+        # 全体をjson.loadせず、会話を1件ずつ読み込みながら処理する
+        chats = iter_chatgpt_conversations(file_path)
+        processed = 0
+        skipped = 0
+        # 書き込みは共有レート制限の下で並列に実行する
+        writer = NotionWriter()
         
         for i, chat in enumerate(chats, 1):
+            processed = i
             try:
+                new_messages = get_chat_messages(chat)
                 chat_id = chat.get("id", "")
                 if not chat_id:
                     # IDがない場合は最初のメッセージの内容からハッシュを生成
                     first_message = new_messages[0] if new_messages else {}
                     content = f"{first_message.get('role', '')}:{first_message.get('content', '')}"
                     chat_id = hashlib.md5(content.encode('utf-8')).hexdigest()
-                new_messages = chat.get("messages", [])
+                # エクスポートの内容だけで指紋を作り、前回の指紋と比較する
+                fingerprint = compute_fingerprint(chat, new_messages)
                 
-                # 既存ページを検索
-                existing_page_id = find_existing_chat(chat_id)
+                # 既存ページを索引から検索（索引が使えない場合のみAPIで検索）
+                entry = chat_index.get(chat_id)
+                if entry:
+                    existing_page_id = entry["page_id"]
+                elif index_ready:
+                    existing_page_id = None
+                else:
+                    existing_page_id = find_existing_chat(chat_id)
                 
                 if existing_page_id:
-                    print(f"[{i}/{len(chats)}] 既存チャット確認: {chat.get('title', '無題')}")
-                    
-                    # 新しいメッセージがあるかチェック（簡易版：メッセージ数の増加で判定）
-                    existing_page = with_retry(
-                        lambda: notion.pages.retrieve(page_id=existing_page_id),
-                        what="retrieve existing page"
-                    )
+                    change, existing_message_count = classify_change(entry, fingerprint)
+                    if change == UNCHANGED:
+                        # 変化がなければAPIを呼ばずにスキップ（指紋だけ最新化）
+                        if not DRY_RUN and entry.get("update_time") != fingerprint["update_time"]:
+                            chat_index.upsert(chat_id, existing_page_id, update_time=fingerprint["update_time"])
+                        skipped += 1
+                        continue
                     
-                    # 既存ページの内容を取得
-                    existing_blocks = with_retry(
-                        lambda: notion.blocks.children.list(block_id=existing_page_id),
-                        what="get existing blocks"
+                    print(f"[{i}] 既存チャット確認: {chat.get('title', '無題')}")
+                    writer.submit(
+                        lambda page_id=existing_page_id, chat=chat, chat_id=chat_id, change=change,
+                               count=existing_message_count, messages=new_messages, fp=fingerprint:
+                            sync_existing_chat(chat_index, chat_id, page_id, chat, change, count, messages, fp),
+                        what=f"sync chat {chat_id}"
                     )
-                    
-                    # 既存のメッセージ数を推定（簡易版）
-                    existing_message_count = 0
-                    for block in existing_blocks.get("results", []):
-                        if block.get("type") == "paragraph":
-                            rich_text = block.get("paragraph", {}).get("rich_text", [])
-                            content = "".join([text.get("plain_text", "") for text in rich_text])
-                            if "【ユーザー" in content or "【アシスタント" in content:
-                                # 【の数をカウントしてメッセージ数を推定
-                                message_count = content.count("【")
-                                existing_message_count = max(existing_message_count, message_count)
-                    
-                    print(f"  既存メッセージ数: {existing_message_count}, 新しいメッセージ数: {len(new_messages)}")
-                    
-                    # 新しいメッセージがあるかチェック
-                    if len(new_messages) > existing_message_count:
-                        new_messages_only = new_messages[existing_message_count:]
-                        print(f"  新しいメッセージを検出: {len(new_messages_only)}件")
-                        append_new_messages_to_page(existing_page_id, new_messages_only)
-                        
-                        # プロパティも更新（メッセージ数など）
-                        update_chat_page_properties(existing_page_id, chat)
-                    else:
-                        print(f"  新しいメッセージなし")
                 else:
-                    print(f"[{i}/{len(chats)}] 新規作成: {chat.get('title', '無題')}")
-                    create_chat_page(chat)
-                
-                time.sleep(0.5)  # API制限対策
+                    print(f"[{i}] 新規作成: {chat.get('title', '無題')}")
+                    writer.submit(
+                        lambda chat=chat, chat_id=chat_id, messages=new_messages, fp=fingerprint:
+                            sync_new_chat(chat_index, chat_id, chat, messages, fp),
+                        what=f"create chat {chat_id}"
+                    )
                 
             except Exception as e:
                 print(f"チャット処理エラー: {e}")
                 continue
         
-        print("処理完了")
+        errors = writer.wait()
+        writer.close()
+        if errors:
+            print(f"チャット処理エラー: {len(errors)}件")
+        if skipped:
+            print(f"変更なしでスキップ: {skipped}件")
+        print(f"処理完了: {processed}個のチャット")
         
     except Exception as e:
         print(f"ファイル処理エラー: {e}")
@@ -602,6 +564,7 @@ def main():
         print(f"ファイルが見つかりません: {file_path}")
         sys.exit(1)
     process_chatgpt_export_file(file_path)
+    print_call_stats()
 
 if __name__ == "__main__":
     main()
@@ -8,16 +8,12 @@ import os
 import sys
 from typing import List, Dict, Any
 
-try:
-    from notion_client import Client
-    from notion_client.errors import APIResponseError, RequestTimeoutError
-except Exception:
-    print("notion-client がありません。`pip install -r requirements.txt` を実行してください。")
-    sys.exit(1)
-
 from dotenv import load_dotenv
 load_dotenv()
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from notion_common import with_retry, create_client, iter_block_children
+
 # 環境変数
 NOTION_TOKEN = os.getenv("NOTION_TOKEN")
 CHATGPT_DB_ID = os.getenv("CHATGPT_DB_ID")
@@ -28,19 +24,22 @@ if not NOTION_TOKEN or not CHATGPT_DB_ID:
     sys.exit(1)
 
 # Notionクライアント
-notion = Client(auth=NOTION_TOKEN, timeout_ms=int(NOTION_TIMEOUT * 1000))
+notion = create_client(NOTION_TOKEN, NOTION_TIMEOUT)
 
 def find_page_by_title(title: str) -> str:
     """タイトルでページを検索してIDを取得"""
     try:
-        response = notion.databases.query(
-            database_id=CHATGPT_DB_ID,
-            filter={
-                "property": "名前",
-                "title": {
-                    "contains": title
+        response = with_retry(
+            lambda: notion.databases.query(
+                database_id=CHATGPT_DB_ID,
+                filter={
+                    "property": "名前",
+                    "title": {
+                        "contains": title
+                    }
                 }
-            }
+            ),
+            what="search page by title"
         )
         
         results = response.get("results", [])
@@ -57,27 +56,11 @@ def find_page_by_title(title: str) -> str:
 def get_page_blocks(page_id: str) -> List[Dict[str, Any]]:
     """ページの全ブロックを取得"""
     blocks = []
-    start_cursor = None
-    
-    while True:
-        try:
-            response = notion.blocks.children.list(
-                block_id=page_id,
-                start_cursor=start_cursor,
-                page_size=100
-            )
-            
-            blocks.extend(response.get("results", []))
-            
-            if not response.get("has_more"):
-                break
-                
-            start_cursor = response.get("next_cursor")
-            
-        except Exception as e:
-            print(f"ブロック取得エラー: {e}")
-            break
-    
+    try:
+        for block in iter_block_children(notion, page_id):
+            blocks.append(block)
+    except Exception as e:
+        print(f"ブロック取得エラー: {e}")
     return blocks
 
 def check_page_content(page_id: str, page_title: str):
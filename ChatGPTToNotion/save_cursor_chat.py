@@ -9,7 +9,9 @@ import sys
 import json
 import logging
 from datetime import datetime
-from notion_client import Client
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from notion_common import append_blocks, create_client
 
 # ログ設定
 logging.basicConfig(
@@ -25,7 +27,7 @@ AI_CHAT_DATABASE_ID = "1fdb061d-adf3-80f8-846d-f9d89aa6e988"
 def find_existing_page(chat_data):
     """既存のページを検索"""
     try:
-        notion = Client(auth=NOTION_TOKEN)
+        notion = create_client(NOTION_TOKEN)
         
         # チャットIDで検索
         chat_id = chat_data.get('chat_id', '')
@@ -68,7 +70,7 @@ def find_existing_page(chat_data):
 def update_notion_page(page_id, chat_data):
     """既存のNotionページを更新"""
     try:
-        notion = Client(auth=NOTION_TOKEN)
+        notion = create_client(NOTION_TOKEN)
         
         # チャット日時の設定
         chat_date = chat_data.get('chat_date', '2025-09-01')
@@ -152,7 +154,7 @@ def create_notion_page(chat_data):
 def create_new_notion_page(chat_data):
     """新しいNotionページを作成"""
     try:
-        notion = Client(auth=NOTION_TOKEN)
+        notion = create_client(NOTION_TOKEN)
         
         # チャット日時の設定
         chat_date = chat_data.get('chat_date', '2025-09-01')
@@ -420,19 +422,12 @@ def add_content_to_page(notion, page_id, content):
         # その他のMarkdownコンテンツを追加
         other_content = extract_other_content(content)
         if other_content:
-            all_rendered_blocks = parse_markdown_to_blocks(other_content)
-            if all_rendered_blocks:
-                children.extend(all_rendered_blocks[0])
-        
-        # ブロックを追加（Notion APIの制限により100ブロックずつ）
-        batch_size = 100
-        for i in range(0, len(children), batch_size):
-            batch = children[i:i + batch_size]
-            notion.blocks.children.append(
-                block_id=page_id,
-                children=batch
-            )
-            logger.info(f"コンテンツブロックを追加しました: {len(batch)}個")
+            for rendered_blocks in parse_markdown_to_blocks(other_content):
+                children.extend(rendered_blocks)
+        
+        # 長い rich_text を分割し、最小回数の呼び出しでまとめて追加
+        created = append_blocks(notion, page_id, children, what="cursor chat content")
+        logger.info(f"コンテンツブロックを追加しました: {len(created)}個")
         
     except Exception as e:
         logger.error(f"コンテンツの追加に失敗: {e}")
@@ -12,16 +12,12 @@ import re
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 
-try:
-    from notion_client import Client
-    from notion_client.errors import APIResponseError, RequestTimeoutError
-except Exception:
-    print("notion-client がありません。`pip install -r requirements.txt` を実行してください。")
-    sys.exit(1)
-
 from dotenv import load_dotenv
 load_dotenv()
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from notion_common import with_retry, create_client, iter_database_pages, iter_block_children
+
 # 環境変数
 NOTION_TOKEN = os.getenv("NOTION_TOKEN")
 CHATGPT_DB_ID = os.getenv("CHATGPT_DB_ID")
@@ -32,80 +28,27 @@ if not NOTION_TOKEN or not CHATGPT_DB_ID:
     sys.exit(1)
 
 # Notionクライアント
-notion = Client(auth=NOTION_TOKEN, timeout_ms=int(NOTION_TIMEOUT * 1000))
-
-def with_retry(fn, *, max_attempts=4, base_delay=1.0, what="api"):
-    """リトライ付きAPI呼び出し"""
-    import random
-    attempt = 0
-    while True:
-        try:
-            return fn()
-        except RequestTimeoutError as e:
-            attempt += 1
-            if attempt >= max_attempts:
-                raise
-            delay = base_delay * (2 ** (attempt-1)) + random.uniform(0, 0.5)
-            print(f"[RETRY] Timeout on {what}. retry {attempt}/{max_attempts} in {delay:.1f}s")
-            time.sleep(delay)
-        except APIResponseError as e:
-            if getattr(e, "code", "") == "rate_limited":
-                attempt += 1
-                retry_after = float(getattr(e, "headers", {}).get("Retry-After", 1)) if hasattr(e, "headers") else 1.0
-                delay = max(retry_after, base_delay * (2 ** (attempt-1))) + random.uniform(0, 0.5)
-                print(f"[RETRY] rate_limited on {what}. retry {attempt}/{max_attempts} in {delay:.1f}s")
-                time.sleep(delay)
-                if attempt < max_attempts:
-                    continue
-            raise
+notion = create_client(NOTION_TOKEN, NOTION_TIMEOUT)
 
 def get_all_pages() -> List[Dict[str, Any]]:
     """データベース内のすべてのページを取得"""
-    all_pages = []
-    start_cursor = None
-    
-    while True:
-        try:
-            response = with_retry(
-                lambda: notion.databases.query(
-                    database_id=CHATGPT_DB_ID,
-                    start_cursor=start_cursor,
-                    page_size=100
-                ),
-                what="get pages"
-            )
-            
-            pages = response.get("results", [])
-            all_pages.extend(pages)
-            
-            # 次のページがあるかチェック
-            next_cursor = response.get("next_cursor")
-            if not next_cursor:
-                break
-                
-            start_cursor = next_cursor
-            time.sleep(0.1)  # API制限を避ける
-            
-        except Exception as e:
-            print(f"ページ取得エラー: {e}")
-            break
-    
-    return all_pages
+    pages = []
+    try:
+        for page in iter_database_pages(notion, CHATGPT_DB_ID):
+            pages.append(page)
+    except Exception as e:
+        print(f"ページ取得エラー: {e}")
+    return pages
 
 def get_page_blocks(page_id: str) -> List[Dict[str, Any]]:
     """ページのブロックを取得"""
+    blocks = []
     try:
-        response = with_retry(
-            lambda: notion.blocks.children.list(
-                block_id=page_id,
-                page_size=100
-            ),
-            what="get page blocks"
-        )
-        return response.get("results", [])
+        for block in iter_block_children(notion, page_id):
+            blocks.append(block)
     except Exception as e:
         print(f"ブロック取得エラー: {e}")
-        return []
+    return blocks
 
 def extract_chat_date_from_content(content: str) -> Optional[str]:
     """チャット内容から日時を抽出"""
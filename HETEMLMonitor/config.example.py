@@ -14,6 +14,9 @@ HETEML_CONFIG = {
     'password': os.getenv('HETEML_PASSWORD'),  # SSHパスワード（環境変数から取得）
     'key_filename': None,                 # SSH秘密鍵ファイルパス（使用する場合）
     'timeout': 30,                        # 接続タイムアウト（秒）
+    'keepalive_interval': 30,             # 常駐監視で接続を保つkeepaliveの間隔（秒、0で無効）
+    'reconnect_attempts': 3,              # 接続が切れていたときの再接続の試行回数
+    'reconnect_backoff': 5,               # 再接続の最初の待ち時間（秒、失敗ごとに倍）
 }
 
 # 監視設定
@@ -21,14 +24,45 @@ MONITOR_CONFIG = {
     'target_path': '/home/users/0/nbsorjp/web/domain/nbspress.com/nbs.or.jp/stages/',  # 監視対象フォルダパス
     'check_interval': 300,                # 監視間隔（秒）
     'file_pattern': '*',                  # 監視するファイルパターン
-    'exclude_patterns': ['.*', '*.tmp'],  # 除外するファイルパターン
+    'exclude_patterns': ['.*', '*.tmp'],  # 除外するパターン（'cache/' はディレクトリだけ、'/uploads/tmp' のように / を含むと監視対象フォルダからの相対パスで一致。除外したディレクトリの中は一覧を取得しない）
     'recursive': True,                    # サブフォルダを再帰的に監視
+    'scan_workers': 4,                    # ディレクトリ一覧を並列に取得するSFTPチャネル数（1で逐次）
+    'hash_mode': 'sftp',                  # ハッシュ計算: 'sftp'（内容を転送して計算）/ 'remote'（サーバ上のmd5sumで一括計算）
+    'remote_hash_timeout': 300,           # 'remote' 時のコマンドのタイムアウト（秒）
+    'watch_mode': 'poll',                 # 'poll'（check_interval ごとに全体スキャン）/ 'event'（サーバ側の変更通知で数秒以内に検出）
+    'watch_backend': 'auto',              # 'event' 時: 'auto'（inotifywait があれば使用）/ 'find'（find -newer で問い合わせ）
+    'watch_probe_interval': 10,           # find -newer で問い合わせる間隔（秒）
+    'watch_marker': '.heteml_monitor_marker',  # find -newer の基準にするサーバ上のマーカーファイル（ホームからの相対パス）
+    'event_debounce': 2,                  # 変更が続く間はこの秒数静かになるまでまとめて判定
+    'full_scan_interval': 3600,           # 'event' 時も取りこぼしに備えて全体スキャンする間隔（秒）
 }
 
+# 複数の監視対象（空なら上の HETEML_CONFIG / MONITOR_CONFIG の1件だけを監視）
+# 各要素で MONITOR_CONFIG の項目を、'host' で HETEML_CONFIG の項目を上書きできます。
+# 同じサーバの監視対象は1本のSSH接続を共有して並行にスキャンし、履歴は file_history_<name>.db に分けて保存します。
+TARGETS = [
+    # {
+    #     'name': 'stages',
+    #     'target_path': '/home/users/0/nbsorjp/web/domain/nbspress.com/nbs.or.jp/stages/',
+    #     'file_pattern': '*',
+    #     'exclude_patterns': ['.*', '*.tmp'],
+    #     'check_interval': 300,
+    # },
+    # {
+    #     'name': 'other-site',
+    #     'host': {'hostname': 'ssh-example.heteml.net', 'username': 'example'},
+    #     'target_path': '/home/users/0/example/web/',
+    #     'check_interval': 600,
+    # },
+]
+
 # 通知設定
 NOTIFICATION_CONFIG = {
     'enabled': True,
-    'methods': ['email', 'slack'],        # 通知方法: 'email', 'slack', 'line'
+    'methods': ['email', 'slack'],        # 通知方法: 'email', 'slack', 'line'（複数指定時は並行に送信）
+    'timeouts': {'email': 30, 'slack': 10, 'line': 10},  # 通知方法ごとのタイムアウト（秒）
+    'digest_window': 0,                   # この秒数の間に検出した変更を1通にまとめる（0で即時。イベント監視では60程度を推奨）
+    'max_listed_files': 50,               # 通知の一覧に載せるファイル数の上限（種類ごと。超えた分は件数のみ）
     
     # メール通知設定
     'email': {
@@ -68,5 +102,5 @@ LOG_CONFIG = {
 # データベース設定（ファイル変更履歴保存用）
 DB_CONFIG = {
     'enabled': True,
-    'file': 'file_history.json',
+    'file': 'file_history.json',          # .json を指定すると同じ場所の .db（SQLite）に保存し、既存のJSONは初回に取り込む
 }
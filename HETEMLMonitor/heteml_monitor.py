@@ -8,10 +8,13 @@ HETEMLサーバ内の指定フォルダに新しいファイルが追加され
 import os
 import sys
 import time
-import json
 import logging
+import re
 import hashlib
+import queue
 import schedule
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
 from typing import Dict, List, Set, Optional
 import paramiko
@@ -30,73 +33,44 @@ except ImportError:
     print("設定ファイルが見つかりません。config.example.pyをconfig.pyにコピーして編集してください。")
     sys.exit(1)
 
+# 複数の監視対象（未設定なら HETEML_CONFIG / MONITOR_CONFIG の1件だけを監視）
+try:
+    from config import TARGETS
+except ImportError:
+    TARGETS = []
+
 # 通知モジュールのインポート
-from notifications import NotificationManager
+from notifications import NotificationDigest, NotificationManager
+from history_store import FileHistoryStore, history_paths
+from remote_watcher import create_remote_watcher
+from path_matcher import PathMatcher
 
-class HETEMLMonitor:
-    """HETEMLサーバ監視クラス"""
+# ハッシュ計算の読み込み単位と、SFTP先読みで同時に送る読み込み要求（32KBずつ）の上限
+HASH_CHUNK_SIZE = 1024 * 1024
+PREFETCH_MAX_REQUESTS = 64
+# サーバ側の md5sum に1回で渡すパス数。出力（1行約40バイト+パス）が SSH の受信ウィンドウに収まる量に抑え、
+# 標準入力への書き込み中に出力が溜まって md5sum と xargs が止まらないようにする
+REMOTE_HASH_BATCH_SIZE = 2000
+
+class SSHConnection:
+    """1台のサーバへのSSH接続（同じサーバの複数の監視対象で共有する）"""
     
-    def __init__(self):
-        """初期化"""
-        self.setup_logging()
-        self.logger = logging.getLogger(__name__)
+    def __init__(self, config: Dict, logger: Optional[logging.Logger] = None):
+        self.config = config
+        self.logger = logger or logging.getLogger(__name__)
         self.ssh_client = None
         self.sftp_client = None
-        self.known_files: Set[str] = set()
-        self.file_hashes: Dict[str, str] = {}
-        self.notification_manager = NotificationManager()
-        self.history_file = DB_CONFIG.get('file', 'file_history.json')
-        
-        # 既存のファイル履歴を読み込み
-        self.load_file_history()
-        
-    def setup_logging(self):
-        """ログ設定"""
-        log_config = LOG_CONFIG
-        logging.basicConfig(
-            level=getattr(logging, log_config['level']),
-            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler(log_config['file'], encoding='utf-8'),
-                logging.StreamHandler()
-            ]
-        )
-        
-    def load_file_history(self):
-        """ファイル履歴の読み込み"""
-        if DB_CONFIG.get('enabled', False) and os.path.exists(self.history_file):
-            try:
-                with open(self.history_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self.known_files = set(data.get('files', []))
-                    self.file_hashes = data.get('hashes', {})
-                self.logger.info(f"ファイル履歴を読み込みました: {len(self.known_files)}ファイル")
-            except Exception as e:
-                self.logger.error(f"ファイル履歴の読み込みに失敗: {e}")
-                
-    def save_file_history(self):
-        """ファイル履歴の保存"""
-        if DB_CONFIG.get('enabled', False):
-            try:
-                data = {
-                    'files': list(self.known_files),
-                    'hashes': self.file_hashes,
-                    'last_updated': datetime.now().isoformat()
-                }
-                with open(self.history_file, 'w', encoding='utf-8') as f:
-                    json.dump(data, f, ensure_ascii=False, indent=2)
-                self.logger.debug("ファイル履歴を保存しました")
-            except Exception as e:
-                self.logger.error(f"ファイル履歴の保存に失敗: {e}")
+        # 複数の監視対象から同時に再接続しないようにする
+        self._lock = threading.Lock()
     
-    def connect_ssh(self) -> bool:
+    def connect(self) -> bool:
         """SSH接続の確立"""
         try:
             self.ssh_client = paramiko.SSHClient()
             self.ssh_client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
             
             # 接続設定
-            config = HETEML_CONFIG
+            config = self.config
             connect_kwargs = {
                 'hostname': config['hostname'],
                 'port': config['port'],
@@ -111,6 +85,10 @@ class HETEMLMonitor:
                 connect_kwargs['key_filename'] = config['key_filename']
             
             self.ssh_client.connect(**connect_kwargs)
+            # 無通信でNATやサーバに切られないよう、定期的にkeepaliveを送る
+            keepalive = config.get('keepalive_interval', 30)
+            if keepalive:
+                self.ssh_client.get_transport().set_keepalive(keepalive)
             self.sftp_client = self.ssh_client.open_sftp()
             
             self.logger.info(f"HETEMLサーバに接続しました: {config['hostname']}")
@@ -120,24 +98,204 @@ class HETEMLMonitor:
             self.logger.error(f"SSH接続に失敗: {e}")
             return False
     
-    def disconnect_ssh(self):
+    def disconnect(self):
         """SSH接続の切断"""
-        if self.sftp_client:
-            self.sftp_client.close()
-        if self.ssh_client:
-            self.ssh_client.close()
+        try:
+            if self.sftp_client:
+                self.sftp_client.close()
+            if self.ssh_client:
+                self.ssh_client.close()
+        except Exception as e:
+            self.logger.debug(f"SSH接続の切断中にエラー: {e}")
+        self.sftp_client = None
+        self.ssh_client = None
         self.logger.debug("SSH接続を切断しました")
     
+    def is_connected(self) -> bool:
+        """既存の接続がまだ使えるか（トランスポートが生きていて、SFTPが応答するか）"""
+        if not self.ssh_client or not self.sftp_client:
+            return False
+        transport = self.ssh_client.get_transport()
+        if transport is None or not transport.is_active():
+            return False
+        try:
+            self.sftp_client.stat('.')
+            return True
+        except Exception as e:
+            self.logger.info(f"SSH接続が切れています: {e}")
+            return False
+    
+    def ensure(self) -> bool:
+        """接続を使い回し、切れていれば待ち時間を倍にしながら再接続する"""
+        with self._lock:
+            if self.is_connected():
+                return True
+            self.disconnect()
+            attempts = max(1, self.config.get('reconnect_attempts', 3))
+            delay = self.config.get('reconnect_backoff', 5)
+            for attempt in range(1, attempts + 1):
+                if self.connect():
+                    return True
+                self.disconnect()
+                if attempt < attempts:
+                    self.logger.warning(f"{delay}秒後に再接続します ({attempt}/{attempts})")
+                    time.sleep(delay)
+                    delay *= 2
+            return False
+
+class HETEMLMonitor:
+    """HETEMLサーバ監視クラス"""
+    
+    def __init__(self, host_config: Optional[Dict] = None, monitor_config: Optional[Dict] = None,
+                 name: Optional[str] = None, connection: Optional[SSHConnection] = None,
+                 history_file: Optional[str] = None,
+                 notification_manager: Optional[NotificationManager] = None):
+        """初期化
+
+        引数を省略すると HETEML_CONFIG / MONITOR_CONFIG / DB_CONFIG の1件を監視する。
+        connection を渡すと同じサーバの他の監視対象と接続を共有し、SFTPチャネルだけを専用に開く。
+        notification_manager を渡すと通知用のSMTP・HTTP接続も他の監視対象と共有する。
+        """
+        self.setup_logging()
+        self.name = name
+        self.logger = logging.getLogger(f"{__name__}.{name}" if name else __name__)
+        self.host_config = host_config or HETEML_CONFIG
+        self.monitor_config = monitor_config or MONITOR_CONFIG
+        # 監視対象・除外パターンは起動時に正規表現にまとめておく
+        self.matcher = PathMatcher(
+            self.monitor_config.get('file_pattern', '*'), self.monitor_config.get('exclude_patterns', [])
+        )
+        self.shared_connection = connection is not None
+        self.connection = connection or SSHConnection(self.host_config, self.logger)
+        self.sftp_client = None
+        # 常駐監視では接続を切らずに次のサイクルでも使い回す
+        self.keep_connection = False
+        self._known_files: Set[str] = set()
+        self._file_hashes: Dict[str, str] = {}
+        # 前回確認時のサイズ・更新日時（変わっていないファイルはハッシュ計算を省略）
+        self._file_meta: Dict[str, Dict] = {}
+        self.history_loaded = False
+        self.history_dirty = False
+        # サーバ側でのハッシュ計算が使えないと分かったらSFTPでの計算に切り替える
+        self.remote_hash_available = True
+        # 自分で作った通知マネージャーだけを監視の終了時に閉じる（共有されたものは呼び出し側が閉じる）
+        self.owns_notification_manager = notification_manager is None
+        self.notification_manager = notification_manager or NotificationManager()
+        # NOTIFICATION_CONFIG['digest_window'] 秒の間に検出した変更は1通の通知にまとめる
+        self.notification_digest = NotificationDigest(
+            self.send_notifications, NOTIFICATION_CONFIG.get('digest_window', 0)
+        )
+        # 履歴はSQLiteに保存する（旧形式の file_history.json は初回に取り込む）
+        self.history_file, legacy_history = history_paths(history_file or DB_CONFIG.get('file', 'file_history.json'))
+        self.history_store: Optional[FileHistoryStore] = None
+        if DB_CONFIG.get('enabled', False):
+            try:
+                self.history_store = FileHistoryStore(self.history_file, legacy_history)
+            except Exception as e:
+                self.logger.error(f"ファイル履歴を開けませんでした: {e}")
+        
+    @property
+    def ssh_client(self):
+        return self.connection.ssh_client
+    
+    # 履歴は最初に参照したときに読み込む
+    @property
+    def known_files(self) -> Set[str]:
+        self.load_file_history()
+        return self._known_files
+    
+    @property
+    def file_hashes(self) -> Dict[str, str]:
+        self.load_file_history()
+        return self._file_hashes
+    
+    @property
+    def file_meta(self) -> Dict[str, Dict]:
+        self.load_file_history()
+        return self._file_meta
+        
+    def setup_logging(self):
+        """ログ設定"""
+        log_config = LOG_CONFIG
+        logging.basicConfig(
+            level=getattr(logging, log_config['level']),
+            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+            handlers=[
+                logging.FileHandler(log_config['file'], encoding='utf-8'),
+                logging.StreamHandler()
+            ]
+        )
+        
+    def load_file_history(self):
+        """ファイル履歴の読み込み（2回目以降は何もしない）"""
+        if self.history_loaded:
+            return
+        self.history_loaded = True
+        if self.history_store is None:
+            return
+        try:
+            self._known_files, self._file_hashes, self._file_meta = self.history_store.load()
+            self.logger.info(f"ファイル履歴を読み込みました: {len(self._known_files)}ファイル")
+        except Exception as e:
+            self.logger.error(f"ファイル履歴の読み込みに失敗: {e}")
+                
+    def save_file_history(self):
+        """ファイル履歴の保存（前回保存時から変わった行だけを書き込む）"""
+        if self.history_store is None or not self.history_loaded:
+            return
+        try:
+            changed = self.history_store.save(self._known_files, self._file_hashes, self._file_meta)
+            self.history_dirty = False
+            self.logger.debug(f"ファイル履歴を保存しました: {changed}件更新")
+        except Exception as e:
+            self.logger.error(f"ファイル履歴の保存に失敗: {e}")
+    
+    def connect_ssh(self) -> bool:
+        """SSH接続の確立"""
+        if self.shared_connection:
+            return self.ensure_connection()
+        connected = self.connection.connect()
+        self.sftp_client = self.connection.sftp_client
+        return connected
+    
+    def disconnect_ssh(self):
+        """SSH接続の切断（共有している接続は残し、専用のSFTPチャネルだけを閉じる）"""
+        if self.shared_connection:
+            if self.sftp_client:
+                try:
+                    self.sftp_client.close()
+                except Exception as e:
+                    self.logger.debug(f"SFTPチャネルの切断中にエラー: {e}")
+            self.sftp_client = None
+            return
+        self.connection.disconnect()
+        self.sftp_client = None
+    
+    def ensure_connection(self) -> bool:
+        """接続を使い回し、切れていれば再接続する"""
+        if not self.connection.ensure():
+            self.sftp_client = None
+            return False
+        if not self.shared_connection:
+            self.sftp_client = self.connection.sftp_client
+            return True
+        # 共有接続では監視対象ごとにSFTPチャネルを開き、同時にスキャンできるようにする
+        if self.sftp_client is None or self.sftp_client.get_channel().closed:
+            try:
+                self.sftp_client = paramiko.SFTPClient.from_transport(self.ssh_client.get_transport())
+            except Exception as e:
+                self.logger.error(f"SFTPチャネルを開けませんでした: {e}")
+                self.sftp_client = None
+                return False
+        return True
+    
     def get_file_list(self) -> List[Dict]:
         """監視対象フォルダのファイル一覧を取得（再帰的）"""
         try:
-            target_path = MONITOR_CONFIG['target_path']
-            file_pattern = MONITOR_CONFIG['file_pattern']
-            exclude_patterns = MONITOR_CONFIG['exclude_patterns']
+            target_path = self.monitor_config['target_path']
             
-            # SFTPでファイル一覧を再帰的に取得
-            files = []
-            self._scan_directory_recursive(target_path, files, file_pattern, exclude_patterns)
+            # SFTPでファイル一覧を再帰的に取得（複数チャネルで並列にディレクトリを読む）
+            files = self._scan_directory_parallel(target_path)
             
             self.logger.debug(f"ファイル一覧を取得しました: {len(files)}ファイル")
             return files
@@ -146,57 +304,225 @@ class HETEMLMonitor:
             self.logger.error(f"ファイル一覧の取得に失敗: {e}")
             return []
     
-    def _scan_directory_recursive(self, current_path: str, files: List[Dict], file_pattern: str, exclude_patterns: List[str]):
+    def _classify_entry(self, current_path: str, item):
+        """listdir_attr の1エントリを ('dir', パス) / ('file', ファイル情報) / None に分類
+
+        除外されたディレクトリは None を返すので、その中は一覧を取得しない。
+        """
+        filename = item.filename
+        full_path = f"{current_path}/{filename}"
+        relative_path = full_path[len(self.monitor_config['target_path']) + 1:]
+        is_dir = bool(item.st_mode & 0o40000)
+        
+        # 除外パターンのチェック（名前・監視対象フォルダからの相対パス）
+        if self.matcher.is_excluded(relative_path, is_dir):
+            return None
+        
+        # ディレクトリかどうかをチェック
+        if is_dir:
+            return ('dir', full_path)
+        
+        # ファイルパターンのチェック
+        if not self.matcher.is_included(filename):
+            return None
+        
+        return ('file', {
+            'name': filename,
+            'size': item.st_size,
+            'mtime': item.st_mtime,
+            'path': full_path
+        })
+    
+    def _scan_directory_recursive(self, current_path: str, files: List[Dict]):
         """ディレクトリを再帰的にスキャン"""
         try:
             for item in self.sftp_client.listdir_attr(current_path):
-                filename = item.filename
-                full_path = f"{current_path}/{filename}"
-                
-                # 除外パターンのチェック
-                if any(self._matches_pattern(filename, pattern) for pattern in exclude_patterns):
+                entry = self._classify_entry(current_path, item)
+                if entry is None:
                     continue
-                
-                # ディレクトリかどうかをチェック
-                if item.st_mode & 0o40000:  # ディレクトリの場合
+                kind, value = entry
+                if kind == 'dir':
                     # サブディレクトリを再帰的にスキャン
-                    self._scan_directory_recursive(full_path, files, file_pattern, exclude_patterns)
+                    self._scan_directory_recursive(value, files)
                 else:
-                    # ファイルの場合
-                    # ファイルパターンのチェック
-                    if not self._matches_pattern(filename, file_pattern):
-                        continue
-                    
-                    file_info = {
-                        'name': filename,
-                        'size': item.st_size,
-                        'mtime': item.st_mtime,
-                        'path': full_path
-                    }
-                    files.append(file_info)
+                    files.append(value)
                     
         except Exception as e:
             self.logger.warning(f"ディレクトリスキャンエラー {current_path}: {e}")
     
-    def _matches_pattern(self, filename: str, pattern: str) -> bool:
-        """ファイル名がパターンにマッチするかチェック"""
-        import fnmatch
-        return fnmatch.fnmatch(filename, pattern)
+    def _scan_directory_parallel(self, root_path: str) -> List[Dict]:
+        """同じSSH接続上に複数のSFTPチャネルを開き、ディレクトリを並列にスキャン
+
+        MONITOR_CONFIG['scan_workers'] 個のチャネルが作業キューからディレクトリを取り出して
+        listdir_attr し、見つかったサブディレクトリをキューに戻す。1なら従来の再帰スキャン。
+        """
+        workers = max(1, int(self.monitor_config.get('scan_workers', 4)))
+        files: List[Dict] = []
+        if workers == 1:
+            self._scan_directory_recursive(root_path, files)
+            return files
+        
+        channels = [self.sftp_client]
+        transport = self.ssh_client.get_transport()
+        for _ in range(workers - 1):
+            try:
+                channels.append(paramiko.SFTPClient.from_transport(transport))
+            except Exception as e:
+                self.logger.warning(f"追加のSFTPチャネルを開けませんでした（{len(channels)}並列で続行）: {e}")
+                break
+        
+        work: "queue.Queue[Optional[str]]" = queue.Queue()
+        files_lock = threading.Lock()
+        
+        def _worker(sftp):
+            while True:
+                current_path = work.get()
+                if current_path is None:
+                    work.task_done()
+                    return
+                try:
+                    found = []
+                    for item in sftp.listdir_attr(current_path):
+                        entry = self._classify_entry(current_path, item)
+                        if entry is None:
+                            continue
+                        kind, value = entry
+                        if kind == 'dir':
+                            work.put(value)
+                        else:
+                            found.append(value)
+                    with files_lock:
+                        files.extend(found)
+                except Exception as e:
+                    self.logger.warning(f"ディレクトリスキャンエラー {current_path}: {e}")
+                finally:
+                    work.task_done()
+        
+        work.put(root_path)
+        threads = [threading.Thread(target=_worker, args=(sftp,), daemon=True) for sftp in channels]
+        for thread in threads:
+            thread.start()
+        work.join()
+        for _ in threads:
+            work.put(None)
+        for thread in threads:
+            thread.join()
+        for sftp in channels[1:]:
+            sftp.close()
+        
+        # 並列スキャンでは見つかる順番が毎回変わるため、パス順に揃える
+        files.sort(key=lambda file_info: file_info['path'])
+        return files
     
     def get_file_hash(self, file_path: str) -> str:
         """ファイルのハッシュ値を取得"""
         try:
-            # SFTPでファイルを一時的にダウンロードしてハッシュ計算
+            # ファイル全体をメモリに読まず、先読みした内容を固定サイズずつハッシュに流す
             with self.sftp_client.open(file_path, 'rb') as f:
-                content = f.read()
-                return hashlib.md5(content).hexdigest()
+                f.prefetch(max_concurrent_requests=PREFETCH_MAX_REQUESTS)
+                md5 = hashlib.md5()
+                while True:
+                    chunk = f.read(HASH_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    md5.update(chunk)
+                return md5.hexdigest()
         except Exception as e:
             self.logger.error(f"ファイルハッシュの取得に失敗 {file_path}: {e}")
             return ""
     
-    def check_file_changes(self) -> Dict[str, List[Dict]]:
-        """ファイルの変更をチェック（新規・削除・変更）"""
-        current_files = self.get_file_list()
+    def get_file_hashes(self, file_paths: List[str]) -> Dict[str, str]:
+        """複数ファイルのハッシュ値をまとめて取得
+
+        MONITOR_CONFIG['hash_mode'] が 'remote' の場合はサーバ上で md5sum を1回実行して
+        まとめて計算し（ファイル内容を転送しない）、取得できなかったファイルだけSFTPで計算する。
+        """
+        hashes: Dict[str, str] = {}
+        if not file_paths:
+            return hashes
+        if self.monitor_config.get('hash_mode', 'sftp') == 'remote' and self.remote_hash_available:
+            for start in range(0, len(file_paths), REMOTE_HASH_BATCH_SIZE):
+                batch = self._get_remote_hashes(file_paths[start:start + REMOTE_HASH_BATCH_SIZE])
+                if batch is None:
+                    # 残りはSFTPで計算する
+                    break
+                hashes.update(batch)
+        for file_path in file_paths:
+            if file_path not in hashes:
+                hashes[file_path] = self.get_file_hash(file_path)
+        return hashes
+    
+    def _get_remote_hashes(self, file_paths: List[str]) -> Optional[Dict[str, str]]:
+        """サーバ上で xargs -0 md5sum を実行し、パス → MD5 を返す（計算できなかった場合は None）
+
+        タイムアウトや接続切れで失敗した場合は今回だけSFTPで計算し、次回もサーバ側で計算する
+        （切れた接続は SSHConnection.ensure で張り直される）。
+        """
+        try:
+            stdin, stdout, stderr = self.ssh_client.exec_command(
+                "xargs -0 md5sum --", timeout=self.monitor_config.get('remote_hash_timeout', 300)
+            )
+        except Exception as e:
+            transport = self.ssh_client.get_transport() if self.ssh_client else None
+            if transport is not None and transport.is_active():
+                # 接続は生きているのにコマンドを実行できない環境
+                self.logger.warning(f"サーバ側でコマンドを実行できないためSFTPで計算します: {e}")
+                self.remote_hash_available = False
+            else:
+                self.logger.warning(f"SSH接続が切れているため今回はSFTPで計算します: {e}")
+            return None
+        try:
+            # パスはNUL区切りで標準入力から渡す（引数長の制限やエスケープを気にしなくてよい）
+            stdin.write("\0".join(file_paths).encode('utf-8'))
+            stdin.channel.shutdown_write()
+            output = stdout.read().decode('utf-8', errors='replace')
+            stderr.read()
+            status = stdout.channel.recv_exit_status()
+        except Exception as e:
+            self.logger.warning(f"サーバ側ハッシュ計算が中断されたため今回はSFTPで計算します: {e}")
+            return None
+        
+        if status in (126, 127):
+            # シェルやコマンドが使えない環境
+            self.logger.warning(f"サーバ側でmd5sumを実行できないためSFTPで計算します (exit {status})")
+            self.remote_hash_available = False
+            return None
+        
+        hashes = {}
+        for line in output.splitlines():
+            # md5sum は改行やバックスラッシュを含むパスを "\" 始まりでエスケープする
+            escaped = line.startswith('\\')
+            if escaped:
+                line = line[1:]
+            digest, sep, path = line.partition(' ')
+            if not sep or len(digest) != 32:
+                continue
+            path = path[1:] if path[:1] in (' ', '*') else path
+            if escaped:
+                path = re.sub(r'\\(.)', lambda m: '\n' if m.group(1) == 'n' else m.group(1), path)
+            hashes[path] = digest
+        self.logger.debug(f"サーバ側でハッシュを計算しました: {len(hashes)}/{len(file_paths)}ファイル")
+        return hashes
+    
+    def _meta_changed(self, file_info: Dict) -> bool:
+        """前回確認時からサイズまたは更新日時が変わったか"""
+        meta = self.file_meta.get(file_info['path'])
+        return meta is None or meta.get('size') != file_info['size'] or meta.get('mtime') != file_info['mtime']
+    
+    def _remember_meta(self, file_info: Dict):
+        self.file_meta[file_info['path']] = {'size': file_info['size'], 'mtime': file_info['mtime']}
+        self.history_dirty = True
+    
+    def check_file_changes(self, current_files: Optional[List[Dict]] = None,
+                           deletion_candidates: Optional[Set[str]] = None) -> Dict[str, List[Dict]]:
+        """ファイルの変更をチェック（新規・削除・変更）
+
+        current_files を渡すと全体をスキャンせず、そのファイルと deletion_candidates
+        （確認した範囲にあった既知のパス）だけを判定する（イベント監視モード用）。
+        """
+        partial = current_files is not None
+        if not partial:
+            current_files = self.get_file_list()
         current_file_paths = {file_info['path'] for file_info in current_files}
         
         new_files = []
@@ -204,11 +530,22 @@ class HETEMLMonitor:
         modified_files = []
         
         # 初回実行時（履歴が空の場合）は既存ファイルを履歴に追加するだけで通知しない
-        is_first_run = len(self.known_files) == 0
+        is_first_run = len(self.known_files) == 0 and not partial
         
         if is_first_run:
             self.logger.info(f"初回実行: {len(current_files)}個の既存ファイルを履歴に追加します（通知なし）")
         
+        # ハッシュが必要なファイル（新規ファイルと、サイズ・更新日時が変わった既存ファイル）をまとめて計算
+        to_hash = []
+        if not is_first_run:
+            for file_info in current_files:
+                file_path = file_info['path']
+                if file_path not in self.known_files:
+                    to_hash.append(file_path)
+                elif self._meta_changed(file_info) and (self.file_hashes.get(file_path) or file_path in self.file_meta):
+                    to_hash.append(file_path)
+        hashes = self.get_file_hashes(to_hash)
+        
         # 新規ファイルと変更ファイルのチェック
         for file_info in current_files:
             filename = file_info['name']
@@ -222,7 +559,7 @@ class HETEMLMonitor:
                     self.logger.debug(f"初回実行: 既存ファイルを履歴に追加: {file_path}")
                 else:
                     # 2回目以降はハッシュ計算を実行
-                    file_hash = self.get_file_hash(file_path)
+                    file_hash = hashes.get(file_path, "")
                     file_info['hash'] = file_hash
                     new_files.append(file_info)
                     self.logger.info(f"新規ファイルを発見: {file_path}")
@@ -230,23 +567,41 @@ class HETEMLMonitor:
                 # 常に完全パスで履歴更新
                 self.known_files.add(file_path)
                 self.file_hashes[file_path] = file_hash
+                self._remember_meta(file_info)
             else:
-                # 既存ファイルの変更チェック
-                if not is_first_run:
-                    current_hash = self.get_file_hash(file_path)
+                # 既存ファイルの変更チェック（サイズ・更新日時が変わったファイルだけハッシュを計算）
+                if not is_first_run and self._meta_changed(file_info):
                     stored_hash = self.file_hashes.get(file_path, "")
+                    old_meta = self.file_meta.get(file_path)
                     
-                    if current_hash != stored_hash and stored_hash != "":
+                    if not stored_hash and old_meta is None:
+                        # 比較できるハッシュもメタ情報もない（旧形式の履歴）: 今回の値を基準として記録するだけ
+                        self._remember_meta(file_info)
+                        continue
+                    
+                    current_hash = hashes.get(file_path, "")
+                    if not current_hash:
+                        continue
+                    
+                    if stored_hash:
+                        changed = current_hash != stored_hash
+                    else:
+                        # ハッシュ未記録のファイルはサイズの変化で判定（更新日時だけの変化は通知しない）
+                        changed = old_meta.get('size') != file_info['size']
+                    
+                    if changed:
                         file_info['hash'] = current_hash
                         file_info['old_hash'] = stored_hash
                         modified_files.append(file_info)
                         self.logger.info(f"ファイルが変更されました: {file_path}")
-                        self.file_hashes[file_path] = current_hash
+                    self.file_hashes[file_path] = current_hash
+                    self._remember_meta(file_info)
         
         # 削除ファイルのチェック
         if not is_first_run:
-            for known_file_path in list(self.known_files):
-                if known_file_path not in current_file_paths:
+            candidates = deletion_candidates if partial else self.known_files
+            for known_file_path in list(candidates or ()):
+                if known_file_path in self.known_files and known_file_path not in current_file_paths:
                     # 削除されたファイルの情報を取得
                     deleted_file_info = {
                         'name': os.path.basename(known_file_path),
@@ -259,6 +614,7 @@ class HETEMLMonitor:
                     # 履歴から削除
                     self.known_files.discard(known_file_path)
                     self.file_hashes.pop(known_file_path, None)
+                    self.file_meta.pop(known_file_path, None)
         
         if is_first_run:
             self.logger.info(f"初回実行完了: {len(self.known_files)}件の履歴を追加しました")
@@ -269,6 +625,105 @@ class HETEMLMonitor:
             'modified': modified_files
         }
     
+    def _to_monitor_path(self, remote_path: str) -> Optional[str]:
+        """監視プロセスが返したパスを、スキャン時と同じ表記（target_path + '/' + 相対パス）に揃える"""
+        root = self.monitor_config['target_path']
+        base = root.rstrip('/')
+        if remote_path.rstrip('/') == base:
+            return root
+        if not remote_path.startswith(base + '/'):
+            return None
+        relative = re.sub(r'/+', '/', remote_path[len(base):]).strip('/')
+        if not relative:
+            return root
+        # 除外パターンに一致するディレクトリの中は対象外
+        if self.matcher.has_excluded_parent(relative):
+            return None
+        return f"{root}/{relative}"
+    
+    def _resolve_changed_paths(self, remote_paths: Set[str]):
+        """変更のあったパスを調べ、(現在のファイル情報, 確認した範囲の既知パス) を返す
+
+        ファイルはstatし、ディレクトリは直下を一覧して、消えたサブディレクトリの中の既知ファイルを
+        削除候補に、まだ知らないサブディレクトリは再帰的にスキャンする。
+        """
+        root = self.monitor_config['target_path']
+        
+        # 既知のファイルを親ディレクトリごとにまとめる
+        known_children: Dict[str, Set[str]] = {}
+        for known_path in self.known_files:
+            known_children.setdefault(known_path.rpartition('/')[0], set()).add(known_path)
+        known_dirs = {root}
+        for parent in known_children:
+            while len(parent) > len(root) and parent not in known_dirs:
+                known_dirs.add(parent)
+                parent = parent.rpartition('/')[0]
+        
+        def files_under(directory: str) -> Set[str]:
+            found = set()
+            for known_dir in known_dirs:
+                if known_dir == directory or known_dir.startswith(directory + '/'):
+                    found |= known_children.get(known_dir, set())
+            return found
+        
+        current: Dict[str, Dict] = {}
+        candidates: Set[str] = set()
+        for path in sorted(filter(None, map(self._to_monitor_path, remote_paths))):
+            try:
+                attr = self.sftp_client.stat(path)
+            except IOError:
+                # 削除・移動された（ディレクトリならその中の既知ファイルもすべて）
+                candidates.add(path)
+                candidates |= files_under(path)
+                continue
+            
+            if not attr.st_mode & 0o40000:
+                attr.filename = path.rpartition('/')[2]
+                entry = self._classify_entry(path.rpartition('/')[0], attr)
+                if entry and entry[0] == 'file':
+                    current[path] = entry[1]
+                candidates.add(path)
+                continue
+            
+            if path != root and self.matcher.is_excluded(path[len(root) + 1:], is_dir=True):
+                continue
+            try:
+                items = self.sftp_client.listdir_attr(path)
+            except Exception as e:
+                self.logger.warning(f"ディレクトリスキャンエラー {path}: {e}")
+                continue
+            present_dirs = set()
+            for item in items:
+                entry = self._classify_entry(path, item)
+                if entry is None:
+                    continue
+                kind, value = entry
+                if kind == 'dir':
+                    present_dirs.add(value)
+                else:
+                    current[value['path']] = value
+            candidates |= known_children.get(path, set())
+            for known_dir in known_dirs:
+                if known_dir.rpartition('/')[0] == path and known_dir != path and known_dir not in present_dirs:
+                    candidates |= files_under(known_dir)
+            for sub_dir in present_dirs - known_dirs:
+                # 新しく現れた（移動してきた）ディレクトリは中身をすべて確認する
+                found: List[Dict] = []
+                self._scan_directory_recursive(sub_dir, found)
+                current.update((file_info['path'], file_info) for file_info in found)
+        
+        return sorted(current.values(), key=lambda file_info: file_info['path']), candidates
+    
+    def process_changed_paths(self, remote_paths: Set[str]):
+        """監視プロセスから届いたパスだけを判定して通知する"""
+        if not self.known_files:
+            # 基準となる履歴がなければ全体をスキャンする
+            self._handle_file_changes(self.check_file_changes())
+            return
+        current_files, candidates = self._resolve_changed_paths(remote_paths)
+        self.logger.debug(f"変更イベント: {len(remote_paths)}件 → 確認 {len(current_files)}ファイル")
+        self._handle_file_changes(self.check_file_changes(current_files, candidates))
+    
     def send_notifications(self, file_changes: Dict[str, List[Dict]]):
         """通知の送信"""
         new_files = file_changes.get('new', [])
@@ -281,18 +736,8 @@ class HETEMLMonitor:
         # 通知メッセージの作成
         message = self._create_notification_message(file_changes)
         
-        # 各通知方法で送信
-        for method in NOTIFICATION_CONFIG.get('methods', []):
-            try:
-                if method == 'email':
-                    self.notification_manager.send_email(message)
-                elif method == 'slack':
-                    self.notification_manager.send_slack(message)
-                elif method == 'line':
-                    self.notification_manager.send_line(message)
-                    
-            except Exception as e:
-                self.logger.error(f"{method}通知の送信に失敗: {e}")
+        # 各通知方法へ並行に送信
+        self.notification_manager.send_notification(message, NOTIFICATION_CONFIG.get('methods', []))
     
     def _create_notification_message(self, file_changes: Dict[str, List[Dict]]) -> str:
         """通知メッセージの作成"""
@@ -319,86 +764,243 @@ class HETEMLMonitor:
             title = "🔔 HETEMLサーバでファイルの変更を検出しました"
         
         message = f"{title}\n\n"
-        message += f"監視対象: {MONITOR_CONFIG['target_path']}\n"
+        target_display = f"{self.name} ({self.monitor_config['target_path']})" if self.name else self.monitor_config['target_path']
+        message += f"監視対象: {target_display}\n"
         message += f"検出時刻: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
         
+        # 大量の変更でも通知が長くなりすぎないよう、種類ごとに一覧に載せる件数を制限する
+        max_listed = NOTIFICATION_CONFIG.get('max_listed_files', 50)
+        
+        def omitted(files: List[Dict]) -> str:
+            rest = len(files) - max_listed
+            return f"…ほか {rest}件\n\n" if max_listed and rest > 0 else ""
+        
         # 新規ファイル
         if new_files:
             message += f"📁 新規ファイル ({len(new_files)}件):\n"
-            for i, file_info in enumerate(new_files, 1):
+            for i, file_info in enumerate(new_files[:max_listed or None], 1):
                 folder_path = os.path.dirname(file_info['path'])
-                relative_folder = folder_path.replace(MONITOR_CONFIG['target_path'], '').strip('/')
+                relative_folder = folder_path.replace(self.monitor_config['target_path'], '').strip('/')
                 folder_display = f"/{relative_folder}" if relative_folder else "/"
                 
                 message += f"{i}. {file_info['name']}\n"
                 message += f"   フォルダ: {folder_display}\n"
                 message += f"   サイズ: {file_info['size']:,} bytes\n"
                 message += f"   更新日時: {datetime.fromtimestamp(file_info['mtime']).strftime('%Y-%m-%d %H:%M:%S')}\n\n"
+            message += omitted(new_files)
         
         # 削除ファイル
         if deleted_files:
             message += f"🗑️ 削除ファイル ({len(deleted_files)}件):\n"
-            for i, file_info in enumerate(deleted_files, 1):
+            for i, file_info in enumerate(deleted_files[:max_listed or None], 1):
                 folder_path = file_info['folder']
-                relative_folder = folder_path.replace(MONITOR_CONFIG['target_path'], '').strip('/')
+                relative_folder = folder_path.replace(self.monitor_config['target_path'], '').strip('/')
                 folder_display = f"/{relative_folder}" if relative_folder else "/"
                 
                 message += f"{i}. {file_info['name']}\n"
                 message += f"   フォルダ: {folder_display}\n\n"
+            message += omitted(deleted_files)
         
         # 変更ファイル
         if modified_files:
             message += f"✏️ 変更ファイル ({len(modified_files)}件):\n"
-            for i, file_info in enumerate(modified_files, 1):
+            for i, file_info in enumerate(modified_files[:max_listed or None], 1):
                 folder_path = os.path.dirname(file_info['path'])
-                relative_folder = folder_path.replace(MONITOR_CONFIG['target_path'], '').strip('/')
+                relative_folder = folder_path.replace(self.monitor_config['target_path'], '').strip('/')
                 folder_display = f"/{relative_folder}" if relative_folder else "/"
                 
                 message += f"{i}. {file_info['name']}\n"
                 message += f"   フォルダ: {folder_display}\n"
                 message += f"   サイズ: {file_info['size']:,} bytes\n"
                 message += f"   更新日時: {datetime.fromtimestamp(file_info['mtime']).strftime('%Y-%m-%d %H:%M:%S')}\n\n"
+            message += omitted(modified_files)
         
         return message
     
     def monitor_once(self):
         """1回の監視実行"""
         try:
-            if not self.connect_ssh():
+            if not self.ensure_connection():
                 return
             
-            file_changes = self.check_file_changes()
-            
-            if file_changes['new'] or file_changes['deleted'] or file_changes['modified']:
-                self.send_notifications(file_changes)
-                self.save_file_history()
+            self._handle_file_changes(self.check_file_changes())
             
         except Exception as e:
             self.logger.error(f"監視実行中にエラーが発生: {e}")
         finally:
-            self.disconnect_ssh()
+            if not self.keep_connection:
+                # 1回だけの実行では、まとめている通知も送ってから終わる
+                self.notification_digest.flush()
+                self.disconnect_ssh()
+    
+    def _handle_file_changes(self, file_changes: Dict[str, List[Dict]]):
+        """検出結果を通知し、履歴を保存する"""
+        if file_changes['new'] or file_changes['deleted'] or file_changes['modified']:
+            self.notification_digest.add(file_changes)
+            self.save_file_history()
+        elif self.history_dirty:
+            # 通知はなくてもサイズ・更新日時の記録が変わった場合は保存する
+            self.save_file_history()
+    
+    def watch_changes(self):
+        """イベント監視モード: サーバ側の変更通知を受け取り、変わったパスだけを判定する
+
+        inotifywait が使えれば常時起動しておき、使えなければ find -newer で
+        MONITOR_CONFIG['watch_probe_interval'] 秒ごとに問い合わせる。取りこぼしに備えて
+        MONITOR_CONFIG['full_scan_interval'] 秒ごとに全体スキャンも行う。
+        """
+        full_scan_interval = self.monitor_config.get('full_scan_interval', 3600)
+        target_path = self.monitor_config['target_path']
+        watcher = None
+        watcher_client = None
+        last_full_scan = 0.0
+        try:
+            while True:
+                if time.time() - last_full_scan >= full_scan_interval:
+                    self.monitor_once()
+                    last_full_scan = time.time()
+                if not self.ensure_connection():
+                    time.sleep(self.host_config.get('reconnect_backoff', 5))
+                    continue
+                try:
+                    # 再接続した場合や監視プロセスが終了した場合は作り直す
+                    if watcher is None or watcher_client is not self.ssh_client or not watcher.alive():
+                        if watcher is not None:
+                            watcher.close()
+                        watcher = create_remote_watcher(self.ssh_client, target_path, self.monitor_config)
+                        watcher_client = self.ssh_client
+                    remaining = max(1.0, full_scan_interval - (time.time() - last_full_scan))
+                    changed_paths = watcher.poll(timeout=remaining)
+                    if changed_paths:
+                        self.process_changed_paths(changed_paths)
+                except Exception as e:
+                    self.logger.error(f"変更監視中にエラーが発生: {e}")
+                    watcher = None
+                    time.sleep(self.host_config.get('reconnect_backoff', 5))
+        finally:
+            if watcher is not None:
+                watcher.close()
     
     def start_monitoring(self):
         """監視の開始"""
-        interval = MONITOR_CONFIG['check_interval']
+        interval = self.monitor_config['check_interval']
         self.logger.info(f"HETEMLサーバ監視を開始します (間隔: {interval}秒)")
-        
-        # 初回実行
-        self.monitor_once()
-        
-        # 定期実行のスケジュール設定
-        schedule.every(interval).seconds.do(self.monitor_once)
+        # サイクルごとの接続・認証を省き、切れたときだけ再接続する
+        self.keep_connection = True
         
         try:
+            if self.monitor_config.get('watch_mode', 'poll') == 'event':
+                self.logger.info("イベント監視モードで実行します")
+                self.watch_changes()
+                return
+            
+            # 初回実行
+            self.monitor_once()
+            
+            # 定期実行のスケジュール設定
+            schedule.every(interval).seconds.do(self.monitor_once)
+            
             while True:
                 schedule.run_pending()
                 time.sleep(1)
         except KeyboardInterrupt:
             self.logger.info("監視を停止します")
             self.save_file_history()
+        finally:
+            self.notification_digest.flush()
+            self.disconnect_ssh()
+            if self.owns_notification_manager:
+                self.notification_manager.close()
+
+class MultiTargetMonitor:
+    """複数の監視対象を1つのプロセス・1つのスケジューラで監視するクラス
+
+    TARGETS の各要素は MONITOR_CONFIG の項目（target_path, file_pattern, exclude_patterns,
+    check_interval など）を上書きし、'host' で HETEML_CONFIG の項目を上書きする。
+    同じサーバ（ホスト名・ポート・ユーザー名）の監視対象は1本のSSH接続を共有し、
+    同時刻の監視はスレッドで並行に実行する。履歴と find -newer のマーカーは監視対象ごとに別のファイルを使う。
+    """
+    
+    def __init__(self, targets: List[Dict]):
+        self.logger = logging.getLogger(__name__)
+        connections: Dict[tuple, SSHConnection] = {}
+        self.monitors: List[HETEMLMonitor] = []
+        # 通知のSMTP・HTTP接続はすべての監視対象で共有する
+        self.notification_manager = NotificationManager()
+        history_dir = os.path.dirname(DB_CONFIG.get('file', 'file_history.json'))
+        for index, target in enumerate(targets, 1):
+            name = target.get('name') or f"target{index}"
+            host_config = {**HETEML_CONFIG, **target.get('host', {})}
+            monitor_config = {
+                **MONITOR_CONFIG,
+                **{key: value for key, value in target.items() if key not in ('name', 'host', 'history_file')}
+            }
+            if 'watch_marker' not in target:
+                # find -newer のマーカーはSSHのログインディレクトリからの相対パスなので、
+                # 同じサーバの監視対象どうしで共有しないよう監視対象ごとに分ける
+                base_marker = MONITOR_CONFIG.get('watch_marker', '.heteml_monitor_marker')
+                monitor_config['watch_marker'] = f"{base_marker}_{name}"
+            host_key = (host_config['hostname'], host_config['port'], host_config['username'])
+            if host_key not in connections:
+                connections[host_key] = SSHConnection(host_config, self.logger)
+            history_file = target.get('history_file') or os.path.join(history_dir, f"file_history_{name}.db")
+            self.monitors.append(HETEMLMonitor(
+                host_config, monitor_config, name=name,
+                connection=connections[host_key], history_file=history_file,
+                notification_manager=self.notification_manager
+            ))
+        self.connections = list(connections.values())
+        self.executor = ThreadPoolExecutor(max_workers=max(1, len(self.monitors)))
+        self.running: Dict[str, Future] = {}
+    
+    def _submit(self, monitor: HETEMLMonitor):
+        """監視対象の1回分の監視をスレッドで開始する（前回が終わっていなければ見送る）"""
+        future = self.running.get(monitor.name)
+        if future is not None and not future.done():
+            monitor.logger.warning("前回の監視が終わっていないため今回は見送ります")
+            return
+        self.running[monitor.name] = self.executor.submit(monitor.monitor_once)
+    
+    def start_monitoring(self):
+        """監視の開始"""
+        self.logger.info(
+            f"{len(self.monitors)}件の監視対象を{len(self.connections)}台のサーバで監視します: "
+            + ", ".join(f"{monitor.name} ({monitor.monitor_config['target_path']})" for monitor in self.monitors)
+        )
+        watch_threads = []
+        try:
+            for monitor in self.monitors:
+                monitor.keep_connection = True
+                if monitor.monitor_config.get('watch_mode', 'poll') == 'event':
+                    # イベント監視の対象は専用のスレッドで変更を待ち続ける
+                    thread = threading.Thread(target=monitor.watch_changes, name=monitor.name, daemon=True)
+                    thread.start()
+                    watch_threads.append(thread)
+                    continue
+                # 初回実行と定期実行のスケジュール設定
+                self._submit(monitor)
+                schedule.every(monitor.monitor_config['check_interval']).seconds.do(self._submit, monitor)
+            
+            while True:
+                schedule.run_pending()
+                time.sleep(1)
+        except KeyboardInterrupt:
+            self.logger.info("監視を停止します")
+        finally:
+            self.executor.shutdown(wait=True)
+            for monitor in self.monitors:
+                monitor.notification_digest.flush()
+                monitor.save_file_history()
+                monitor.disconnect_ssh()
+            for connection in self.connections:
+                connection.disconnect()
+            self.notification_manager.close()
 
 def main():
     """メイン関数"""
+    if TARGETS:
+        MultiTargetMonitor(TARGETS).start_monitoring()
+        return
     monitor = HETEMLMonitor()
     monitor.start_monitoring()
 
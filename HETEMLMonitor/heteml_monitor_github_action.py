@@ -8,10 +8,8 @@ GitHub Actions環境に最適化されています。
 
 import os
 import sys
-import json
 import logging
 import hashlib
-from datetime import datetime
 from typing import Dict, List, Set, Optional
 import paramiko
 from pathlib import Path
@@ -37,6 +35,11 @@ except Exception as e:
 
 # 通知モジュールのインポート
 from notifications import NotificationManager
+from history_store import FileHistoryStore
+
+# ハッシュ計算の読み込み単位と、SFTP先読みで同時に送る読み込み要求（32KBずつ）の上限
+HASH_CHUNK_SIZE = 1024 * 1024
+PREFETCH_MAX_REQUESTS = 64
 
 class HETEMLMonitorGitHubAction:
     """HETEMLサーバ監視クラス - GitHub Action版"""
@@ -51,12 +54,11 @@ class HETEMLMonitorGitHubAction:
         self.file_hashes: Dict[str, str] = {}
         self.notification_manager = NotificationManager()
         
-        # GitHub Actions環境でのファイル履歴保存場所
-        self.history_file = os.path.join(
-            os.environ.get('GITHUB_WORKSPACE', '.'),
-            'HETEMLMonitor',
-            'file_history.json'
-        )
+        # GitHub Actions環境でのファイル履歴保存場所（SQLite。旧形式の file_history.json は初回に取り込む）
+        history_dir = os.path.join(os.environ.get('GITHUB_WORKSPACE', '.'), 'HETEMLMonitor')
+        self.history_file = os.path.join(history_dir, 'file_history.db')
+        self.legacy_history_file = os.path.join(history_dir, 'file_history.json')
+        self.history_store: Optional[FileHistoryStore] = None
         
         # 既存のファイル履歴を読み込み
         self.load_file_history()
@@ -82,16 +84,17 @@ class HETEMLMonitorGitHubAction:
         
     def load_file_history(self):
         """ファイル履歴の読み込み"""
-        if DB_CONFIG.get('enabled', False) and os.path.exists(self.history_file):
+        if DB_CONFIG.get('enabled', False) and (
+            os.path.exists(self.history_file) or os.path.exists(self.legacy_history_file)
+        ):
             try:
-                with open(self.history_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self.known_files = set(data.get('files', []))
-                    self.file_hashes = data.get('hashes', {})
+                self.history_store = FileHistoryStore(self.history_file, self.legacy_history_file)
+                self.known_files, self.file_hashes, _ = self.history_store.load()
                 self.logger.info(f"ファイル履歴を読み込みました: {len(self.known_files)}ファイル")
             except Exception as e:
                 self.logger.error(f"ファイル履歴の読み込みに失敗: {e}")
                 # エラーの場合は新規作成
+                self.history_store = None
                 self.known_files = set()
                 self.file_hashes = {}
         else:
@@ -100,20 +103,13 @@ class HETEMLMonitorGitHubAction:
             self.file_hashes = {}
                 
     def save_file_history(self):
-        """ファイル履歴の保存"""
+        """ファイル履歴の保存（前回保存時から変わった行だけを書き込む）"""
         if DB_CONFIG.get('enabled', False):
             try:
-                # ディレクトリが存在しない場合は作成
-                os.makedirs(os.path.dirname(self.history_file), exist_ok=True)
-                
-                data = {
-                    'files': list(self.known_files),
-                    'hashes': self.file_hashes,
-                    'last_updated': datetime.now().isoformat()
-                }
-                with open(self.history_file, 'w', encoding='utf-8') as f:
-                    json.dump(data, f, ensure_ascii=False, indent=2)
-                self.logger.debug("ファイル履歴を保存しました")
+                if self.history_store is None:
+                    self.history_store = FileHistoryStore(self.history_file)
+                changed = self.history_store.save(self.known_files, self.file_hashes, {})
+                self.logger.debug(f"ファイル履歴を保存しました: {changed}件更新")
             except Exception as e:
                 self.logger.error(f"ファイル履歴の保存に失敗: {e}")
     
@@ -159,9 +155,16 @@ class HETEMLMonitorGitHubAction:
     def get_file_hash(self, file_path: str) -> str:
         """ファイルのハッシュ値を取得"""
         try:
+            # ファイル全体をメモリに読まず、先読みした内容を固定サイズずつハッシュに流す
             with self.sftp_client.open(file_path, 'rb') as f:
-                content = f.read()
-                return hashlib.md5(content).hexdigest()
+                f.prefetch(max_concurrent_requests=PREFETCH_MAX_REQUESTS)
+                md5 = hashlib.md5()
+                while True:
+                    chunk = f.read(HASH_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    md5.update(chunk)
+                return md5.hexdigest()
         except Exception as e:
             self.logger.error(f"ファイルハッシュの取得に失敗 {file_path}: {e}")
             return ""
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ファイル履歴ストア
+監視対象ファイルの パス → (ハッシュ, サイズ, 更新日時) をSQLiteに保存します。
+毎回JSON全体を書き直す代わりに、前回保存時から変わった行だけを更新・削除します。
+初回は既存の file_history.json を一度だけ取り込みます（JSONファイルは残します）。
+"""
+
+import json
+import os
+import sqlite3
+from datetime import datetime
+from typing import Dict, Optional, Set, Tuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    hash TEXT NOT NULL DEFAULT '',
+    size INTEGER,
+    mtime REAL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+Row = Tuple[str, Optional[int], Optional[float]]
+
+
+def history_paths(configured: str) -> Tuple[str, Optional[str]]:
+    """設定された履歴ファイル名から (SQLiteのパス, 取り込み元のJSONパス) を返す
+
+    既存の設定（'file_history.json'）はそのまま使えるように、.json なら同じ場所の .db を使う。
+    """
+    root, ext = os.path.splitext(configured)
+    if ext == '.json':
+        return f"{root}.db", configured
+    return configured, None
+
+
+class FileHistoryStore:
+    """監視対象ファイルの履歴（SQLite）"""
+
+    def __init__(self, path: str, legacy_json: Optional[str] = None):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # GitHub Actions ではファイルをそのままアーティファクトにするため、WALは使わず1ファイルに保つ
+        # （複数の監視対象を並行に監視するときはワーカースレッドから使う）
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript(_SCHEMA)
+        self.conn.commit()
+        # 最後に保存（または読み込み）した内容。保存時はこれとの差分だけを書き込む
+        self._saved: Dict[str, Row] = {}
+        if legacy_json:
+            self._migrate_json(legacy_json)
+
+    def close(self):
+        self.conn.close()
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str):
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def _migrate_json(self, json_path: str):
+        """旧形式の file_history.json を取り込む（1回だけ）"""
+        if self._get_meta('migrated_from') is not None or not os.path.exists(json_path):
+            return
+        if self.conn.execute("SELECT 1 FROM files LIMIT 1").fetchone():
+            return
+        with open(json_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        hashes = data.get('hashes', {})
+        meta = data.get('meta', {})
+        rows = []
+        for path in data.get('files', []):
+            file_meta = meta.get(path) or {}
+            rows.append((path, hashes.get(path) or '', file_meta.get('size'), file_meta.get('mtime')))
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO files (path, hash, size, mtime) VALUES (?, ?, ?, ?)", rows
+            )
+            self._set_meta('migrated_from', json_path)
+            self._set_meta('last_updated', datetime.now().isoformat())
+        print(f"ファイル履歴をJSONから移行しました: {json_path} → {self.path} ({len(rows)}ファイル)")
+
+    def load(self) -> Tuple[Set[str], Dict[str, str], Dict[str, Dict]]:
+        """(既知のパス, パス → ハッシュ, パス → {'size', 'mtime'}) を返す"""
+        known_files: Set[str] = set()
+        hashes: Dict[str, str] = {}
+        meta: Dict[str, Dict] = {}
+        self._saved = {}
+        for path, file_hash, size, mtime in self.conn.execute("SELECT path, hash, size, mtime FROM files"):
+            known_files.add(path)
+            hashes[path] = file_hash
+            if size is not None:
+                meta[path] = {'size': size, 'mtime': mtime}
+            self._saved[path] = (file_hash, size, mtime)
+        return known_files, hashes, meta
+
+    def save(self, known_files: Set[str], hashes: Dict[str, str], meta: Dict[str, Dict]) -> int:
+        """前回の保存内容から変わった行だけを書き込み、書き込んだ行数を返す"""
+        current: Dict[str, Row] = {}
+        for path in known_files:
+            file_meta = meta.get(path) or {}
+            current[path] = (hashes.get(path) or '', file_meta.get('size'), file_meta.get('mtime'))
+        changed = [(path,) + row for path, row in current.items() if self._saved.get(path) != row]
+        removed = [(path,) for path in self._saved if path not in current]
+        if not changed and not removed:
+            return 0
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO files (path, hash, size, mtime) VALUES (?, ?, ?, ?)", changed
+            )
+            self.conn.executemany("DELETE FROM files WHERE path = ?", removed)
+            self._set_meta('last_updated', datetime.now().isoformat())
+        self._saved = current
+        return len(changed) + len(removed)
@@ -3,14 +3,18 @@
 """
 通知管理モジュール
 メール、Slack、LINE通知を統合管理します。
+複数の通知方法へは並行に送信し、SMTP接続とHTTPセッションは送信のたびに作り直さず使い回します。
 """
 
 import smtplib
 import logging
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from typing import Optional
+from typing import Callable, Dict, List, Optional
 import requests
 
 # 設定ファイルのインポート
@@ -22,13 +26,62 @@ except ImportError:
 class NotificationManager:
     """通知管理クラス"""
     
+    # 通知方法ごとの既定のタイムアウト（秒）。NOTIFICATION_CONFIG['timeouts'] で上書きできる
+    DEFAULT_TIMEOUTS = {'email': 30, 'slack': 10, 'line': 10}
+    
     def __init__(self):
         """初期化"""
         self.logger = logging.getLogger(__name__)
         self.config = NOTIFICATION_CONFIG
+        self.timeouts = {**self.DEFAULT_TIMEOUTS, **self.config.get('timeouts', {})}
+        # Slack・LINEへのHTTP接続は使い回す
+        self.session = requests.Session()
+        # SMTP接続は送信後も開いたままにし、次の送信で使い回す（複数スレッドからの送信はロックで直列化）
+        self._smtp: Optional[smtplib.SMTP] = None
+        self._smtp_lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
     
-    def send_email(self, message: str, subject: Optional[str] = None) -> bool:
-        """メール通知の送信（ローカル版用）"""
+    def close(self):
+        """使い回している接続を閉じる"""
+        with self._smtp_lock:
+            self._close_smtp()
+        self.session.close()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+    
+    def _close_smtp(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except Exception:
+                pass
+            self._smtp = None
+    
+    def _get_smtp(self) -> smtplib.SMTP:
+        """ログイン済みのSMTP接続を返す（切れていれば接続し直す）"""
+        if self._smtp is not None:
+            try:
+                if self._smtp.noop()[0] == 250:
+                    return self._smtp
+            except Exception:
+                pass
+            self._close_smtp()
+        
+        email_config = self.config['email']
+        server = smtplib.SMTP(email_config['smtp_server'], email_config['smtp_port'],
+                              timeout=self.timeouts['email'])
+        
+        if email_config.get('use_tls', False):
+            server.starttls()
+        
+        # 認証
+        server.login(email_config['username'], email_config['password'])
+        self._smtp = server
+        return server
+    
+    def _send_mail(self, message: str, subject: str, label: str) -> bool:
         if not self.config.get('email', {}).get('enabled', False):
             self.logger.debug("メール通知が無効です")
             return False
@@ -40,70 +93,38 @@ class NotificationManager:
             msg = MIMEMultipart()
             msg['From'] = email_config['from_email']
             msg['To'] = email_config['to_email']
-            msg['Subject'] = subject or "HETEMLサーバ監視通知"
+            msg['Subject'] = subject
             
             # 本文の追加
             msg.attach(MIMEText(message, 'plain', 'utf-8'))
-            
-            # SMTPサーバーへの接続と送信
-            server = smtplib.SMTP(email_config['smtp_server'], email_config['smtp_port'])
-            
-            if email_config.get('use_tls', False):
-                server.starttls()
-            
-            # 認証
-            server.login(email_config['username'], email_config['password'])
-            
-            # 送信
             text = msg.as_string()
-            server.sendmail(email_config['from_email'], email_config['to_email'], text)
-            server.quit()
             
-            self.logger.info("メール通知を送信しました")
+            # 送信（使い回した接続がサーバ側で切られていた場合は1回だけ接続し直す）
+            with self._smtp_lock:
+                try:
+                    self._get_smtp().sendmail(email_config['from_email'], email_config['to_email'], text)
+                except smtplib.SMTPServerDisconnected:
+                    self._close_smtp()
+                    self._get_smtp().sendmail(email_config['from_email'], email_config['to_email'], text)
+            
+            self.logger.info(f"{label}を送信しました")
             return True
             
         except Exception as e:
-            self.logger.error(f"メール通知の送信に失敗: {e}")
+            with self._smtp_lock:
+                self._close_smtp()
+            self.logger.error(f"{label}の送信に失敗: {e}")
             return False
     
+    def send_email(self, message: str, subject: Optional[str] = None) -> bool:
+        """メール通知の送信（ローカル版用）"""
+        return self._send_mail(message, subject or "HETEMLサーバ監視通知", "メール通知")
+    
     def send_email_github_action(self, message: str, subject: Optional[str] = None) -> bool:
         """メール通知の送信（GitHub Actions版用）"""
-        if not self.config.get('email', {}).get('enabled', False):
-            self.logger.debug("メール通知が無効です")
-            return False
-        
-        try:
-            email_config = self.config['email']
-            
-            # メールの作成
-            msg = MIMEMultipart()
-            msg['From'] = email_config['from_email']
-            msg['To'] = email_config['to_email']
-            msg['Subject'] = subject or "[GitHub Actions] HETEMLサーバ監視通知"
-            
-            # 本文の追加
-            msg.attach(MIMEText(message, 'plain', 'utf-8'))
-            
-            # SMTPサーバーへの接続と送信
-            server = smtplib.SMTP(email_config['smtp_server'], email_config['smtp_port'])
-            
-            if email_config.get('use_tls', False):
-                server.starttls()
-            
-            # 認証
-            server.login(email_config['username'], email_config['password'])
-            
-            # 送信
-            text = msg.as_string()
-            server.sendmail(email_config['from_email'], email_config['to_email'], text)
-            server.quit()
-            
-            self.logger.info("GitHub Actions版メール通知を送信しました")
-            return True
-            
-        except Exception as e:
-            self.logger.error(f"GitHub Actions版メール通知の送信に失敗: {e}")
-            return False
+        return self._send_mail(
+            message, subject or "[GitHub Actions] HETEMLサーバ監視通知", "GitHub Actions版メール通知"
+        )
     
     def send_slack(self, message: str) -> bool:
         """Slack通知の送信"""
@@ -122,7 +143,7 @@ class NotificationManager:
             }
             
             # Webhookで送信
-            response = requests.post(webhook_url, json=slack_message)
+            response = self.session.post(webhook_url, json=slack_message, timeout=self.timeouts['slack'])
             response.raise_for_status()
             
             self.logger.info("Slack通知を送信しました")
@@ -163,10 +184,11 @@ class NotificationManager:
                 ]
             }
             
-            response = requests.post(
+            response = self.session.post(
                 'https://api.line.me/v2/bot/message/push',
                 headers=headers,
-                json=data
+                json=data,
+                timeout=self.timeouts['line']
             )
             response.raise_for_status()
             
@@ -188,10 +210,11 @@ class NotificationManager:
                 'message': message
             }
             
-            response = requests.post(
+            response = self.session.post(
                 'https://notify-api.line.me/api/notify',
                 headers=headers,
-                data=data
+                data=data,
+                timeout=self.timeouts['line']
             )
             response.raise_for_status()
             
@@ -203,18 +226,102 @@ class NotificationManager:
             return False
     
     def send_notification(self, message: str, methods: Optional[list] = None) -> dict:
-        """指定された方法で通知を送信"""
+        """指定された方法で通知を並行に送信
+
+        通知方法ごとのタイムアウトを過ぎたものは失敗として扱い、他の通知方法の完了を待たせない。
+        """
         if methods is None:
             methods = self.config.get('methods', [])
+        senders = {'email': self.send_email, 'slack': self.send_slack, 'line': self.send_line}
+        methods = [method for method in methods if method in senders]
+        if not methods:
+            return {}
         
-        results = {}
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=len(senders), thread_name_prefix='notify')
+        started = time.monotonic()
+        futures = {method: self._executor.submit(senders[method], message) for method in methods}
         
-        for method in methods:
-            if method == 'email':
-                results['email'] = self.send_email(message)
-            elif method == 'slack':
-                results['slack'] = self.send_slack(message)
-            elif method == 'line':
-                results['line'] = self.send_line(message)
+        results = {}
+        for method, future in futures.items():
+            # タイムアウトは送信を始めた時刻から数える
+            remaining = self.timeouts.get(method, 30) - (time.monotonic() - started)
+            try:
+                results[method] = future.result(timeout=max(0, remaining))
+            except FutureTimeoutError:
+                self.logger.error(f"{method}通知がタイムアウトしました（{self.timeouts.get(method, 30)}秒）")
+                results[method] = False
+            except Exception as e:
+                self.logger.error(f"{method}通知の送信に失敗: {e}")
+                results[method] = False
         
         return results
+
+
+class NotificationDigest:
+    """一定時間内に検出した変更をまとめ、1通の通知として送る
+
+    最初の変更を受け取ってから window 秒の間に届いた変更を1つにまとめて send に渡す。
+    同じファイルの追加→削除は打ち消し、削除→追加は変更として扱う。window が0なら即座に送る。
+    """
+    
+    def __init__(self, send: Callable[[Dict[str, List[Dict]]], None], window: float = 0):
+        self.logger = logging.getLogger(__name__)
+        self.send = send
+        self.window = window
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+        self._new: Dict[str, Dict] = {}
+        self._deleted: Dict[str, Dict] = {}
+        self._modified: Dict[str, Dict] = {}
+    
+    def add(self, file_changes: Dict[str, List[Dict]]):
+        """検出結果（new / deleted / modified）を追加する"""
+        if self.window <= 0:
+            self.send(file_changes)
+            return
+        with self._lock:
+            for file_info in file_changes.get('new', []):
+                path = file_info['path']
+                if self._deleted.pop(path, None) is not None:
+                    self._modified[path] = file_info
+                else:
+                    self._new[path] = file_info
+            for file_info in file_changes.get('modified', []):
+                path = file_info['path']
+                if path in self._new:
+                    self._new[path] = file_info
+                else:
+                    self._modified[path] = file_info
+            for file_info in file_changes.get('deleted', []):
+                path = file_info['path']
+                if self._new.pop(path, None) is None:
+                    self._modified.pop(path, None)
+                    self._deleted[path] = file_info
+            if self._timer is None and (self._new or self._deleted or self._modified):
+                self._timer = threading.Timer(self.window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+    
+    def flush(self):
+        """まとめている変更をすぐに送る"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            file_changes = {
+                'new': list(self._new.values()),
+                'deleted': list(self._deleted.values()),
+                'modified': list(self._modified.values()),
+            }
+            self._new, self._deleted, self._modified = {}, {}, {}
+        if file_changes['new'] or file_changes['deleted'] or file_changes['modified']:
+            self.logger.info(
+                f"変更をまとめて通知します: 新規 {len(file_changes['new'])}件, "
+                f"削除 {len(file_changes['deleted'])}件, 変更 {len(file_changes['modified'])}件"
+            )
+            try:
+                self.send(file_changes)
+            except Exception as e:
+                self.logger.error(f"まとめた通知の送信に失敗: {e}")
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+パスマッチャー
+監視対象（file_pattern）と除外（exclude_patterns）のパターンを起動時にそれぞれ1つの正規表現にまとめ、
+ディレクトリ走査中のエントリごとに1回の照合で判定します。
+
+除外パターンは .gitignore に近い書き方ができます。
+  '*.tmp'         … 名前で一致（どの階層でも）
+  'cache/'        … 末尾が / ならディレクトリだけに一致（中は一覧を取得しない）
+  '/uploads/tmp'  … / を含むパターンは監視対象フォルダからの相対パスで一致
+  'logs/**/*.gz'  … ** は0個以上のディレクトリに一致
+"""
+
+import fnmatch
+import re
+from typing import Iterable, List, Optional, Pattern, Union
+
+
+def _translate_path(pattern: str) -> str:
+    """相対パス用のパターンを正規表現に変換（* と ? は / をまたがない）"""
+    result: List[str] = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == '*':
+            if pattern[i:i + 2] == '**':
+                if pattern[i + 2:i + 3] == '/':
+                    result.append('(?:.*/)?')
+                    i += 3
+                else:
+                    result.append('.*')
+                    i += 2
+                continue
+            result.append('[^/]*')
+        elif c == '?':
+            result.append('[^/]')
+        elif c == '[':
+            end = pattern.find(']', i + 2 if pattern[i + 1:i + 2] in ('!', ']') else i + 1)
+            if end < 0:
+                result.append(re.escape(c))
+            else:
+                body = pattern[i + 1:end].replace('\\', '\\\\')
+                if body.startswith('!'):
+                    body = '^' + body[1:]
+                result.append(f'[{body}]')
+                i = end
+        else:
+            result.append(re.escape(c))
+        i += 1
+    return ''.join(result)
+
+
+def _compile(parts: List[str]) -> Optional[Pattern]:
+    if not parts:
+        return None
+    return re.compile('(?:' + '|'.join(parts) + r')\Z', re.DOTALL)
+
+
+class PathMatcher:
+    """監視対象・除外パターンをまとめて照合する"""
+
+    def __init__(self, include: Union[str, Iterable[str]] = '*', exclude: Iterable[str] = ()):
+        includes = [include] if isinstance(include, str) else list(include)
+        # 名前で照合するパターンは fnmatch と同じ意味になるよう fnmatch.translate を使う
+        self._include = _compile([fnmatch.translate(p) for p in includes])
+        # 除外パターンは相対パス全体に対する正規表現にまとめる（名前のパターンは任意の階層に一致させる）
+        excludes, dir_excludes = [], []
+        for pattern in exclude:
+            dir_only = pattern.endswith('/')
+            pattern = pattern.rstrip('/')
+            if not pattern:
+                continue
+            if '/' in pattern:
+                regex = _translate_path(pattern.lstrip('/'))
+            else:
+                regex = '(?:.*/)?' + _translate_path(pattern.replace('**', '*'))
+            (dir_excludes if dir_only else excludes).append(regex)
+        self._exclude = _compile(excludes)
+        self._exclude_dir = _compile(excludes + dir_excludes)
+
+    def is_excluded(self, relative_path: str, is_dir: bool = False) -> bool:
+        """監視対象フォルダからの相対パス（a/b/c）のエントリが除外されるか"""
+        regex = self._exclude_dir if is_dir else self._exclude
+        return bool(regex and regex.match(relative_path))
+
+    def has_excluded_parent(self, relative_path: str) -> bool:
+        """親ディレクトリのどれかが除外されるか（イベントで届いたパスの判定用）"""
+        parts = relative_path.split('/')
+        return any(self.is_excluded('/'.join(parts[:depth]), is_dir=True) for depth in range(1, len(parts)))
+
+    def is_included(self, name: str) -> bool:
+        """ファイル名が監視対象のパターンに一致するか"""
+        return self._include is None or bool(self._include.match(name))
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+リモート変更監視モジュール
+SSH接続上でサーバ側の変更を監視し、変更があったパスをまとめて返します。
+inotifywait が使えればイベントを常時受け取り、使えなければ find -newer で軽く問い合わせます。
+"""
+
+import logging
+import shlex
+import time
+from typing import Set
+
+
+class InotifyWatcher:
+    """inotifywait -m -r の出力を受け取り、変更されたパスを返す"""
+
+    EVENTS = 'close_write,create,delete,moved_from,moved_to,attrib'
+
+    def __init__(self, ssh_client, target_path: str, debounce: float = 2.0):
+        self.logger = logging.getLogger(__name__)
+        self.ssh_client = ssh_client
+        self.target_path = target_path
+        self.debounce = debounce
+        self.channel = None
+        self._buffer = b''
+
+    @staticmethod
+    def available(ssh_client) -> bool:
+        """サーバで inotifywait を実行できるか"""
+        try:
+            _, stdout, _ = ssh_client.exec_command('command -v inotifywait', timeout=30)
+            stdout.read()
+            return stdout.channel.recv_exit_status() == 0
+        except Exception:
+            return False
+
+    def start(self):
+        command = (
+            f"inotifywait -m -r -q -e {self.EVENTS} --format '%e %w%f' "
+            f"{shlex.quote(self.target_path)}"
+        )
+        self.channel = self.ssh_client.get_transport().open_session()
+        # 接続を閉じたときにサーバ側の inotifywait も終了するよう端末を割り当てる
+        self.channel.get_pty()
+        self.channel.exec_command(command)
+        self.logger.info(f"inotifywaitで変更監視を開始しました: {self.target_path}")
+
+    def alive(self) -> bool:
+        return self.channel is not None and not self.channel.closed and not self.channel.exit_status_ready()
+
+    def _read_lines(self, timeout: float) -> Set[str]:
+        paths: Set[str] = set()
+        deadline = time.time() + timeout
+        while time.time() < deadline and self.alive():
+            if not self.channel.recv_ready():
+                time.sleep(0.2)
+                continue
+            self._buffer += self.channel.recv(65536)
+            *lines, self._buffer = self._buffer.split(b'\n')
+            for line in lines:
+                events, sep, path = line.decode('utf-8', errors='replace').rstrip('\r').partition(' ')
+                if sep and path:
+                    paths.add(path)
+            if paths:
+                break
+        return paths
+
+    def poll(self, timeout: float) -> Set[str]:
+        """最初の変更を最大 timeout 秒待ち、その後 debounce 秒静かになるまで変更を集める"""
+        paths = self._read_lines(timeout)
+        while paths:
+            more = self._read_lines(self.debounce)
+            if not more:
+                break
+            paths |= more
+        return paths
+
+    def close(self):
+        if self.channel is not None:
+            self.channel.close()
+            self.channel = None
+
+
+class FindProbeWatcher:
+    """前回の問い合わせ以降に変更されたファイル・ディレクトリを find -newer で取得する
+
+    サーバのホームにマーカーファイルを置き、問い合わせのたびに更新する。
+    ファイルの削除は親ディレクトリの更新日時の変化として返る。
+    """
+
+    def __init__(self, ssh_client, target_path: str, marker: str, interval: float = 10.0,
+                 timeout: float = 120):
+        self.logger = logging.getLogger(__name__)
+        self.ssh_client = ssh_client
+        self.target_path = target_path
+        self.marker = marker
+        self.interval = interval
+        self.timeout = timeout
+        self._alive = True
+
+    def start(self):
+        # マーカーを作成し、それ以降の変更だけを返すようにする
+        self._probe()
+        self.logger.info(f"find -newerで変更監視を開始しました: {self.target_path} ({self.interval}秒ごと)")
+
+    def alive(self) -> bool:
+        transport = self.ssh_client.get_transport()
+        return self._alive and transport is not None and transport.is_active()
+
+    def _probe(self) -> Set[str]:
+        marker = shlex.quote(self.marker)
+        new_marker = shlex.quote(self.marker + '.new')
+        # 更新日時を保ったままアップロードされたファイルも拾えるよう ctime でも比較する
+        command = (
+            f"touch {new_marker} && "
+            f"if [ -e {marker} ]; then "
+            f"find {shlex.quote(self.target_path)} \\( -newer {marker} -o -cnewer {marker} \\) -print0; "
+            f"fi; mv -f {new_marker} {marker}"
+        )
+        try:
+            _, stdout, _ = self.ssh_client.exec_command(command, timeout=self.timeout)
+            output = stdout.read()
+            status = stdout.channel.recv_exit_status()
+        except Exception as e:
+            self.logger.warning(f"find -newerでの問い合わせに失敗: {e}")
+            self._alive = False
+            return set()
+        if status != 0:
+            self.logger.warning(f"find -newerでの問い合わせに失敗 (exit {status})")
+        return {path for path in output.decode('utf-8', errors='replace').split('\0') if path}
+
+    def poll(self, timeout: float) -> Set[str]:
+        time.sleep(min(timeout, self.interval))
+        return self._probe()
+
+    def close(self):
+        self._alive = False
+
+
+def create_remote_watcher(ssh_client, target_path: str, config: dict):
+    """inotifywait が使えれば InotifyWatcher、なければ FindProbeWatcher を作って開始する"""
+    if config.get('watch_backend', 'auto') in ('auto', 'inotify') and InotifyWatcher.available(ssh_client):
+        watcher = InotifyWatcher(ssh_client, target_path, debounce=config.get('event_debounce', 2))
+        watcher.start()
+        # 監視数の上限などで inotifywait がすぐ終了した場合は find に切り替える
+        time.sleep(1)
+        if watcher.alive():
+            return watcher
+        watcher.close()
+        logging.getLogger(__name__).warning("inotifywaitが終了したため、find -newerで監視します")
+    watcher = FindProbeWatcher(
+        ssh_client, target_path,
+        marker=config.get('watch_marker', '.heteml_monitor_marker'),
+        interval=config.get('watch_probe_interval', 10),
+    )
+    watcher.start()
+    return watcher
@@ -6,30 +6,28 @@
 """
 
 import os
-import json
 from datetime import datetime
 
+from history_store import FileHistoryStore
+
 def reset_file_history():
     """ファイル履歴をリセット"""
-    history_file = 'file_history.json'
+    history_file = 'file_history.db'
+    legacy_history_file = 'file_history.json'
     
     print("🔄 ファイル履歴をリセット中...")
     
-    # バックアップを作成
-    if os.path.exists(history_file):
-        backup_file = f"file_history_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        os.rename(history_file, backup_file)
-        print(f"✅ バックアップ作成: {backup_file}")
+    # バックアップを作成（旧形式のJSONも移動し、再び取り込まれないようにする）
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    for path in (history_file, legacy_history_file):
+        if os.path.exists(path):
+            root, ext = os.path.splitext(path)
+            backup_file = f"{root}_backup_{timestamp}{ext}"
+            os.rename(path, backup_file)
+            print(f"✅ バックアップ作成: {backup_file}")
     
     # 空の履歴ファイルを作成
-    empty_history = {
-        "files": [],
-        "hashes": {},
-        "last_updated": datetime.now().isoformat()
-    }
-    
-    with open(history_file, 'w', encoding='utf-8') as f:
-        json.dump(empty_history, f, ensure_ascii=False, indent=2)
+    FileHistoryStore(history_file).close()
     
     print("✅ ファイル履歴をリセットしました")
     print("📝 次回実行時は全てのファイルが新規ファイルとして検出されます")
@@ -17,7 +17,25 @@ MT_CONFIG = {
     'password': os.getenv('MT_PASSWORD'),
     'blog_id': os.getenv('MT_BLOG_ID', '1'),  # 再構築対象のブログID
     'site_name': os.getenv('MT_SITE_NAME', 'MovableTypeサイト'),  # サイト名（通知用）
-    'timeout': 300,  # 再構築タイムアウト（秒）
+    'timeout': 300,  # 再構築1ステップあたりのタイムアウト（秒）
+    # 再構築の範囲: all / index / types / incremental（前回成功以降に更新された記事とインデックス）
+    'rebuild_mode': os.getenv('MT_REBUILD_MODE', 'all'),
+    # typesモードで再構築するアーカイブタイプ（例: Individual,Monthly,Category）
+    'rebuild_types': [t.strip() for t in os.getenv('MT_REBUILD_TYPES', '').split(',') if t.strip()],
+    'entries_per_rebuild': int(os.getenv('MT_ENTRIES_PER_REBUILD', 40)),  # 1ステップで再構築する件数
+    'max_rebuild_steps': 5000,  # 分割再構築のステップ数の上限
+    # incrementalモードで更新された記事を調べるData API（未設定なら mt.cgi と同じ場所の mt-data-api.cgi）
+    'data_api_url': os.getenv('MT_DATA_API_URL'),
+    'data_api_version': os.getenv('MT_DATA_API_VERSION', 'v4'),
+    'state_file': str(current_dir / 'rebuild_state.json'),  # 前回成功した再構築・チェックポイントの記録
+    'checkpoint_max_age_hours': 24,  # これより古いチェックポイントからは再開しない
+    'session_file': str(current_dir / '.mt_session.json'),  # ログイン済みセッションクッキーの保存先
+    # 複数ブログを再構築する場合のブログ一覧（未設定なら blog_id の1ブログ）
+    # MT_BLOG_IDS=1,3,5 で指定するか、ブログごとにサイト名・モード・アーカイブタイプを変える場合は直接記述する
+    # 例: [{'blog_id': '1', 'site_name': 'メインブログ', 'mode': 'incremental'},
+    #      {'blog_id': '3', 'mode': 'types', 'types': ['Individual', 'Monthly']}]
+    'blogs': [{'blog_id': b.strip()} for b in os.getenv('MT_BLOG_IDS', '').split(',') if b.strip()],
+    'max_parallel_rebuilds': int(os.getenv('MT_MAX_PARALLEL_REBUILDS', 2)),  # 同時に再構築するブログ数の上限
 }
 
 # 通知設定
@@ -50,4 +68,9 @@ LOG_CONFIG = {
 EXECUTION_CONFIG = {
     'rebuild_interval_minutes': int(os.getenv('REBUILD_INTERVAL_MINUTES', 5)),
     'max_retry_count': int(os.getenv('MAX_RETRY_COUNT', 3)),
+    'retry_wait_seconds': int(os.getenv('RETRY_WAIT_SECONDS', 30)),  # 再試行までの待ち時間（秒）
+    # 再構築のスケジュール（cron形式: 分 時 日 月 曜日）。デフォルトは毎月1日の0:01
+    'schedule': os.getenv('REBUILD_SCHEDULE', '1 0 1 * *'),
+    'catch_up_hours': int(os.getenv('REBUILD_CATCH_UP_HOURS', 72)),  # 逃した予定を後から実行する期限（時間）
+    'schedule_jitter_seconds': int(os.getenv('REBUILD_JITTER_SECONDS', 0)),  # 開始を最大この秒数だけランダムに遅らせる
 }
@@ -28,7 +28,7 @@ launchctl load ~/Library/LaunchAgents/com.user.movabletype-rebuilder.plist
 
 echo "=== セットアップ完了 ==="
 echo "サービス名: com.user.movabletype-rebuilder"
-echo "実行スケジュール: 毎月1日の0:01"
+echo "起動: 毎時1分（REBUILD_SCHEDULE の予定時刻を過ぎていれば再構築）"
 echo ""
 echo "管理コマンド:"
 echo "  サービス停止: launchctl unload ~/Library/LaunchAgents/com.user.movabletype-rebuilder.plist"
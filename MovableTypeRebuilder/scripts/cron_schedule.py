@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+cron形式のスケジュール
+「分 時 日 月 曜日」の5項目（* , - / と月・曜日の英語略称、@monthly などの別名）から
+次の実行予定時刻を計算します。常駐スケジューラーからも使うため標準ライブラリだけに依存します。
+"""
+
+from datetime import datetime, timedelta
+from typing import List, Optional, Set
+
+ALIASES = {
+    '@yearly': '0 0 1 1 *',
+    '@annually': '0 0 1 1 *',
+    '@monthly': '0 0 1 * *',
+    '@weekly': '0 0 * * 0',
+    '@daily': '0 0 * * *',
+    '@hourly': '0 * * * *',
+}
+
+_MONTH_NAMES = ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec']
+_DOW_NAMES = ['sun', 'mon', 'tue', 'wed', 'thu', 'fri', 'sat']
+
+# 存在しない日付（2月30日など）の指定で無限に探さないための上限
+_SEARCH_YEARS = 5
+
+
+def _parse_value(value: str, names: Optional[List[str]], offset: int) -> int:
+    lowered = value.lower()
+    if names and lowered in names:
+        return names.index(lowered) + offset
+    return int(value)
+
+
+def _parse_field(field: str, low: int, high: int, names: Optional[List[str]] = None,
+                 name_offset: int = 0) -> Set[int]:
+    values: Set[int] = set()
+    for part in field.split(','):
+        body, _, step_text = part.partition('/')
+        step = int(step_text) if step_text else 1
+        if step < 1:
+            raise ValueError(f"間隔は1以上で指定してください: {part}")
+        if body == '*':
+            start, end = low, high
+        elif '-' in body:
+            start_text, end_text = body.split('-', 1)
+            start = _parse_value(start_text, names, name_offset)
+            end = _parse_value(end_text, names, name_offset)
+        else:
+            start = _parse_value(body, names, name_offset)
+            end = high if step_text else start
+        if not (low <= start <= high and low <= end <= high) or start > end:
+            raise ValueError(f"範囲外の値です: {part}（{low}〜{high}）")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSchedule:
+    """cron形式（分 時 日 月 曜日）のスケジュール。時刻はローカル時刻（naive）で扱う"""
+
+    def __init__(self, expression: str):
+        self.expression = expression
+        fields = ALIASES.get(expression.strip(), expression).split()
+        if len(fields) != 5:
+            raise ValueError(f"cron形式は「分 時 日 月 曜日」の5項目で指定してください: {expression}")
+        minute, hour, day, month, weekday = fields
+        self.minutes = _parse_field(minute, 0, 59)
+        self.hours = _parse_field(hour, 0, 23)
+        self.days = _parse_field(day, 1, 31)
+        self.months = _parse_field(month, 1, 12, _MONTH_NAMES, 1)
+        # 曜日は 0 と 7 のどちらも日曜日
+        self.weekdays = {d % 7 for d in _parse_field(weekday, 0, 7, _DOW_NAMES, 0)}
+        # cronと同じく、日と曜日の両方が指定されていればどちらかに一致すればよい
+        self._day_any = day == '*'
+        self._weekday_any = weekday == '*'
+
+    def _day_matches(self, moment: datetime) -> bool:
+        in_days = moment.day in self.days
+        in_weekdays = (moment.weekday() + 1) % 7 in self.weekdays
+        if self._day_any or self._weekday_any:
+            return in_days and in_weekdays
+        return in_days or in_weekdays
+
+    def next_after(self, moment: datetime) -> datetime:
+        """moment より後で最初の予定時刻"""
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = moment + timedelta(days=366 * _SEARCH_YEARS)
+        while candidate <= limit:
+            if candidate.month not in self.months:
+                # 翌月の1日 0:00 へ
+                year, month = divmod(candidate.month, 12)
+                candidate = candidate.replace(year=candidate.year + year, month=month + 1, day=1,
+                                              hour=0, minute=0)
+                continue
+            if not self._day_matches(candidate):
+                candidate = candidate.replace(hour=0, minute=0) + timedelta(days=1)
+                continue
+            if candidate.hour not in self.hours:
+                candidate = candidate.replace(minute=0) + timedelta(hours=1)
+                continue
+            if candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+                continue
+            return candidate
+        raise ValueError(f"{_SEARCH_YEARS}年以内に実行予定がありません: {self.expression}")
+
+
+def due_slot(schedule: CronSchedule, last_slot: Optional[datetime], now: datetime,
+             catch_up: timedelta) -> Optional[datetime]:
+    """まだ実行していない予定時刻のうち、now 以前で最新のものを返す（なければ None）
+
+    最後に実行した予定時刻（last_slot）より後で、catch_up より古くない予定だけを対象にする。
+    パソコンのスリープなどで予定時刻を逃しても、catch_up の間なら次の起動時に1回だけ実行できる。
+    """
+    base = now - catch_up
+    if last_slot is not None and last_slot > base:
+        base = last_slot
+    slot = None
+    candidate = schedule.next_after(base)
+    while candidate <= now:
+        slot = candidate
+        candidate = schedule.next_after(candidate)
+    return slot
@@ -6,12 +6,16 @@ MovableTypeウェブサイトの月次再構築を自動化するツール
 
 import os
 import sys
+import copy
+import json
 import time
 import logging
+import threading
+import random
 import argparse
-import schedule
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 import requests
 from bs4 import BeautifulSoup
 
@@ -21,6 +25,13 @@ try:
     sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
     from config import MT_CONFIG, NOTIFICATION_CONFIG, LOG_CONFIG, EXECUTION_CONFIG
     from notifications import NotificationManager
+    from cron_schedule import CronSchedule, due_slot
+    from rebuild_scheduler import rebuilder_args
+    from rebuild_planner import (
+        REBUILD_MODES, RebuildState, add_timing, completed_types, continuation_params, data_api_url,
+        fetch_touched_entry_ids, find_continuation, format_timings, is_rebuild_complete, parse_archive_types,
+        plan_types, step_type,
+    )
 except ImportError:
     print("設定ファイルが見つかりません。config.pyを確認してください。")
     sys.exit(1)
@@ -43,6 +54,12 @@ def setup_logging():
     )
     return logging.getLogger(__name__)
 
+class BlogLogAdapter(logging.LoggerAdapter):
+    """複数ブログを並行に再構築するとき、ログの先頭にブログIDを付ける"""
+    
+    def process(self, msg, kwargs):
+        return f"[blog_id: {self.extra['blog_id']}] {msg}", kwargs
+
 class MovableTypeRebuilder:
     """MovableType再構築クラス"""
     
@@ -57,16 +74,38 @@ class MovableTypeRebuilder:
         self.mt_blog_id = MT_CONFIG['blog_id']
         self.mt_site_name = MT_CONFIG['site_name']
         
+        # 再構築の範囲と分割再構築の設定
+        self.rebuild_mode = MT_CONFIG.get('rebuild_mode', 'all')
+        self.rebuild_types = MT_CONFIG.get('rebuild_types', [])
+        self.entries_per_rebuild = MT_CONFIG.get('entries_per_rebuild', 40)
+        self.step_timeout = MT_CONFIG.get('timeout', 300)
+        self.max_rebuild_steps = MT_CONFIG.get('max_rebuild_steps', 5000)
+        self.data_api_url = data_api_url(
+            self.mt_url, MT_CONFIG.get('data_api_url'), MT_CONFIG.get('data_api_version', 'v4')
+        )
+        self.state = RebuildState(MT_CONFIG.get('state_file', 'rebuild_state.json'))
+        self.checkpoint_max_age = MT_CONFIG.get('checkpoint_max_age_hours', 24)
+        self.session_file = MT_CONFIG.get('session_file')
+        
         # 実行設定
         self.rebuild_interval = EXECUTION_CONFIG['rebuild_interval_minutes']
+        self.schedule_expression = EXECUTION_CONFIG.get('schedule', '1 0 1 * *')
+        self.catch_up_hours = EXECUTION_CONFIG.get('catch_up_hours', 72)
+        self.schedule_jitter = EXECUTION_CONFIG.get('schedule_jitter_seconds', 0)
         self.max_retry = EXECUTION_CONFIG['max_retry_count']
+        self.retry_wait = EXECUTION_CONFIG.get('retry_wait_seconds', 30)
+        self.max_parallel = max(1, MT_CONFIG.get('max_parallel_rebuilds', 2))
         
         # 初期化チェック
         self._validate_config()
         
-        # クライアント初期化
+        # クライアント初期化（複数ブログの再構築でも1つのログイン済みセッションを共有する）
         self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=max(10, self.max_parallel))
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
         self.notification_manager = NotificationManager()
+        self._login_lock = threading.Lock()
         
     def _validate_config(self):
         """設定の妥当性をチェック"""
@@ -77,10 +116,12 @@ class MovableTypeRebuilder:
             raise ValueError(f"必要な設定が不足しています: {', '.join(missing_configs)}")
         
         # blog_idが数値であることを確認
-        try:
-            int(self.mt_blog_id)
-        except ValueError:
-            raise ValueError(f"blog_idは数値である必要があります: {self.mt_blog_id}")
+        blog_ids = [self.mt_blog_id] + [blog.get('blog_id') for blog in MT_CONFIG.get('blogs') or []]
+        for blog_id in blog_ids:
+            try:
+                int(blog_id)
+            except (TypeError, ValueError):
+                raise ValueError(f"blog_idは数値である必要があります: {blog_id}")
     
     def login_to_mt(self) -> bool:
         """MovableTypeにログイン"""
@@ -141,36 +182,210 @@ class MovableTypeRebuilder:
                 self.logger.error(f"レスポンス内容: {e.response.text[:1000]}")
             return False
     
-    def trigger_rebuild(self) -> Dict[str, Any]:
-        """サイト再構築を実行"""
+    def _save_session(self):
+        """ログイン済みのセッションクッキーを保存（次回の実行・再試行でログインを省く）"""
+        if not self.session_file:
+            return
+        cookies = [
+            {'name': c.name, 'value': c.value, 'domain': c.domain, 'path': c.path, 'expires': c.expires}
+            for c in self.session.cookies
+        ]
         try:
-            self.logger.info("サイト再構築を開始...")
-            
-            # 再構築URL
-            rebuild_url = self.mt_url
-            rebuild_data = {
-                '__mode': 'rebuild',
-                'blog_id': self.mt_blog_id,  # 設定されたブログID
-                'type': 'all'
+            fd = os.open(self.session_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'blog_id': self.mt_blog_id, 'cookies': cookies}, f)
+        except OSError as e:
+            self.logger.warning(f"セッションクッキーを保存できませんでした: {e}")
+    
+    def restore_session(self) -> bool:
+        """保存したセッションクッキーを読み込み、まだ有効ならTrueを返す"""
+        if not self.session_file or not os.path.exists(self.session_file):
+            return False
+        try:
+            with open(self.session_file, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return False
+        now = time.time()
+        for cookie in saved.get('cookies', []):
+            if cookie.get('expires') and cookie['expires'] < now:
+                continue
+            self.session.cookies.set(
+                cookie['name'], cookie['value'], domain=cookie.get('domain'), path=cookie.get('path', '/')
+            )
+        # 再構築ダイアログが表示できればログイン済み
+        archive_types, _ = self._fetch_rebuild_dialog()
+        if archive_types:
+            self.logger.info("保存したセッションでログイン済みです（ログインを省略）")
+            return True
+        self.session.cookies.clear()
+        return False
+    
+    def _fetch_rebuild_dialog(self) -> Tuple[Dict[str, str], Optional[str]]:
+        """再構築ダイアログから (アーカイブタイプの選択肢, magic_token) を取得"""
+        try:
+            response = self.session.get(
+                self.mt_url, params={'__mode': 'rebuild_confirm', 'blog_id': self.mt_blog_id}, timeout=30
+            )
+            response.raise_for_status()
+        except Exception as e:
+            self.logger.warning(f"再構築ダイアログを取得できませんでした: {e}")
+            return {}, None
+        soup = BeautifulSoup(response.text, 'html.parser')
+        token = soup.find('input', attrs={'name': 'magic_token'})
+        return parse_archive_types(response.text), token.get('value') if token else None
+    
+    def plan_rebuild(self, mode: str, types: Optional[List[str]] = None,
+                     archive_types: Optional[Dict[str, str]] = None) -> Tuple[List[str], str]:
+        """再構築モードから再構築順（type の並び）を決める。(再構築順, 実際のモード) を返す"""
+        touched = None
+        if mode == 'incremental':
+            since = self.state.last_success(self.mt_blog_id)
+            if since is None:
+                self.logger.info("前回成功した再構築の記録がないため、すべて再構築します")
+                mode = 'all'
+            else:
+                try:
+                    touched = fetch_touched_entry_ids(self.session, self.data_api_url, self.mt_blog_id, since)
+                    self.logger.info(f"{since.isoformat()} 以降に更新された記事: {len(touched)}件")
+                except Exception as e:
+                    self.logger.warning(f"更新された記事を取得できないため、すべて再構築します: {e}")
+                    mode = 'all'
+        plan = plan_types(mode, archive_types or {}, types, touched)
+        return plan, mode
+    
+    def _log_progress(self, step: int, plan: List[str], params: Dict[str, str]):
+        """次のステップのURLから再構築の進捗をログに出力"""
+        order = params['type'].split(',') if params.get('type') else plan
+        try:
+            index = int(params.get('next', 0))
+        except ValueError:
+            index = 0
+        total = params.get('total') or params.get('total_entries')
+        position = f"{params.get('offset', 0)}/{total}" if total else params.get('offset', '0')
+        self.logger.info(
+            f"再構築中: ステップ{step} {step_type(plan, params)} "
+            f"({min(index + 1, len(order))}/{len(order)}) 件数 {position}"
+        )
+    
+    def _run_paged_rebuild(self, plan: List[str], checkpoint: Dict[str, Any],
+                           magic_token: Optional[str] = None) -> Dict[str, Any]:
+        """分割再構築を開始（またはチェックポイントから再開）し、次のステップがなくなるまでたどる
+        
+        各ステップの前にチェックポイント（次のステップのURL・完了したtype・所要時間）を保存する。
+        """
+        timings = checkpoint.setdefault('timings', {})
+        steps = checkpoint.get('steps', 0)
+        next_url = checkpoint.get('next_url')
+        if next_url:
+            self.logger.info(
+                f"前回の続きから再構築を再開します: ステップ{steps + 1} "
+                f"(完了: {', '.join(checkpoint.get('completed', [])) or 'なし'})"
+            )
+            params = continuation_params(next_url)
+        else:
+            params = {
+                # type=all は従来どおり1リクエストでの再構築。それ以外は画面と同じく start_rebuild から始める
+                '__mode': 'rebuild' if plan == ['all'] else 'start_rebuild',
+                'blog_id': self.mt_blog_id,
+                'type': ','.join(plan),
+                'next': 0,
+                'offset': 0,
+                'limit': self.entries_per_rebuild,
             }
-            
-            # 再構築実行
-            response = self.session.post(rebuild_url, data=rebuild_data, timeout=300)
+        while True:
+            step_started = time.monotonic()
+            if next_url:
+                response = self.session.get(next_url, timeout=self.step_timeout)
+            else:
+                data = dict(params, magic_token=magic_token) if magic_token else params
+                response = self.session.post(self.mt_url, data=data, timeout=self.step_timeout)
             response.raise_for_status()
+            elapsed = time.monotonic() - step_started
+            steps += 1
+            add_timing(timings, step_type(plan, params), elapsed)
+            self.logger.debug(f"ステップ{steps} {step_type(plan, params)}: {elapsed:.1f}秒")
+            
+            next_url = find_continuation(response.text, response.url)
+            if next_url is None:
+                break
+            if steps >= self.max_rebuild_steps:
+                raise RuntimeError(f"再構築のステップ数が上限（{self.max_rebuild_steps}）に達しました")
+            params = continuation_params(next_url)
+            checkpoint.update({
+                'next_url': next_url,
+                'steps': steps,
+                'completed': completed_types(plan, params),
+            })
+            self.state.save_checkpoint(self.mt_blog_id, checkpoint)
+            self._log_progress(steps, plan, params)
+        return {
+            'success': is_rebuild_complete(response.text),
+            'steps': steps,
+            'timings': timings,
+            'response_text': response.text,
+        }
+    
+    def _log_timings(self, timings: Dict[str, Dict[str, Any]]):
+        """typeごとのページ数と所要時間を、時間のかかった順にログに出力"""
+        for line in format_timings(timings):
+            self.logger.info(f"  {line}")
+    
+    def trigger_rebuild(self, mode: Optional[str] = None, types: Optional[List[str]] = None) -> Dict[str, Any]:
+        """サイト再構築を実行（モードに応じて範囲を決め、分割再構築で進める）
+        
+        同じモード・アーカイブタイプで途中まで進んだチェックポイントがあれば、その続きから再開する。
+        """
+        mode = mode or self.rebuild_mode
+        types = types or self.rebuild_types
+        try:
+            checkpoint = self.state.checkpoint(self.mt_blog_id, self.checkpoint_max_age)
+            if checkpoint and checkpoint.get('requested') != [mode, types]:
+                self.logger.info("再構築の指定が前回と異なるため、チェックポイントを破棄します")
+                self.state.clear_checkpoint(self.mt_blog_id)
+                checkpoint = None
             
-            # 結果の解析
-            soup = BeautifulSoup(response.text, 'html.parser')
+            magic_token = None
+            if checkpoint:
+                plan, mode = checkpoint['plan'], checkpoint['mode']
+                started_at = datetime.fromisoformat(checkpoint['started_at'])
+            else:
+                started_at = datetime.now().astimezone()
+                self.logger.info(f"サイト再構築を開始... (モード: {mode})")
+                archive_types, magic_token = self._fetch_rebuild_dialog()
+                requested = [mode, types]
+                plan, mode = self.plan_rebuild(mode, types, archive_types)
+                checkpoint = {
+                    'requested': requested,
+                    'mode': mode,
+                    'plan': plan,
+                    'started_at': started_at.isoformat(),
+                }
+            self.logger.info(f"再構築順: {', '.join(plan)}")
             
-            # 成功メッセージの確認
-            success_indicators = ['再構築が完了しました', 'rebuild completed', 'success']
-            is_success = any(indicator in response.text for indicator in success_indicators)
+            rebuild = self._run_paged_rebuild(plan, checkpoint, magic_token)
+            self.logger.info("typeごとの所要時間:")
+            self._log_timings(rebuild['timings'])
             
-            if is_success:
-                self.logger.info(f"再構築成功: {self.mt_site_name} (blog_id: {self.mt_blog_id})")
+            if rebuild['success']:
+                self.state.record_success(
+                    self.mt_blog_id, started_at, mode, rebuild['steps'], rebuild['timings']
+                )
+                self.logger.info(
+                    f"再構築成功: {self.mt_site_name} (blog_id: {self.mt_blog_id}) "
+                    f"{len(plan)}種類 / {rebuild['steps']}ステップ"
+                )
                 return {
                     'success': True,
-                    'message': f'{self.mt_site_name} (blog_id: {self.mt_blog_id}) の再構築が正常に完了しました',
-                    'timestamp': datetime.now().isoformat()
+                    'message': (
+                        f'{self.mt_site_name} (blog_id: {self.mt_blog_id}) の再構築が正常に完了しました'
+                        f'（モード: {mode}、{len(plan)}種類、{rebuild["steps"]}ステップ）'
+                    ),
+                    'timestamp': datetime.now().isoformat(),
+                    'mode': mode,
+                    'types': plan,
+                    'steps': rebuild['steps'],
+                    'timings': rebuild['timings'],
                 }
             else:
                 self.logger.warning("再構築結果が不明: レスポンスを確認してください")
@@ -178,7 +393,11 @@ class MovableTypeRebuilder:
                     'success': False,
                     'message': '再構築結果が確認できませんでした',
                     'timestamp': datetime.now().isoformat(),
-                    'response_text': response.text[:500]  # 最初の500文字のみ
+                    'mode': mode,
+                    'types': plan,
+                    'steps': rebuild['steps'],
+                    'timings': rebuild['timings'],
+                    'response_text': rebuild['response_text'][:500]  # 最初の500文字のみ
                 }
                 
         except Exception as e:
@@ -189,6 +408,21 @@ class MovableTypeRebuilder:
                 'timestamp': datetime.now().isoformat()
             }
     
+    def _format_run_details(self, result: Dict[str, Any]) -> str:
+        """通知用: 試行回数とtypeごとのページ数・所要時間（時間のかかった順）"""
+        if 'results' in result:
+            # 複数ブログの場合はブログごとに出力
+            return '\n'.join(
+                f"\n[{blog['site_name']} (blog_id: {blog['blog_id']})]\n{self._format_run_details(blog)}"
+                for blog in result['results']
+            )
+        lines = []
+        if result.get('attempts', 1) > 1:
+            lines.append(f"試行回数: {result['attempts']}")
+        if result.get('timings'):
+            lines += ['', 'typeごとの所要時間:'] + [f"  {line}" for line in format_timings(result['timings'])]
+        return '\n'.join(lines)
+    
     def send_email_notification(self, result: Dict[str, Any]):
         """メール通知を送信"""
         try:
@@ -201,10 +435,11 @@ class MovableTypeRebuilder:
             message = f"""
 MovableType再構築結果
 
-対象サイト: {self.mt_site_name} (blog_id: {self.mt_blog_id})
+対象サイト: {result.get('target') or f'{self.mt_site_name} (blog_id: {self.mt_blog_id})'}
 {status}
 時刻: {result['timestamp']}
 メッセージ: {result['message']}
+{self._format_run_details(result)}
 
 ---
 MovableType再構築システム
@@ -225,12 +460,98 @@ MovableType再構築システム
         except Exception as e:
             self.logger.error(f"メール通知エラー: {e}")
     
-    def execute_rebuild(self) -> Dict[str, Any]:
-        """再構築を実行（ログイン→再構築→通知）"""
+    def _ensure_login(self) -> bool:
+        """保存したセッションが有効ならそのまま使い、無効ならログインしてセッションを保存"""
+        # 並行に再構築しているブログが同時に再ログインしないようにする
+        with self._login_lock:
+            if self.restore_session():
+                return True
+            if self.login_to_mt():
+                self._save_session()
+                return True
+            return False
+    
+    def blog_targets(self, mode: Optional[str] = None, types: Optional[List[str]] = None,
+                     blog_ids: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """再構築するブログと、ブログごとのモード・アーカイブタイプ
+        
+        MT_CONFIG['blogs'] が未設定なら blog_id の1ブログ。mode/types を指定すると全ブログに適用する。
+        """
+        blogs = MT_CONFIG.get('blogs') or [{'blog_id': self.mt_blog_id}]
+        if blog_ids:
+            configured = {str(blog['blog_id']): blog for blog in blogs}
+            blogs = [configured.get(str(blog_id), {'blog_id': blog_id}) for blog_id in blog_ids]
+        return [
+            {
+                'blog_id': str(blog['blog_id']),
+                'site_name': blog.get('site_name', self.mt_site_name),
+                'mode': mode or blog.get('mode') or self.rebuild_mode,
+                'types': types or blog.get('types') or self.rebuild_types,
+            }
+            for blog in blogs
+        ]
+    
+    def _for_blog(self, target: Dict[str, Any], tag_logs: bool = False) -> 'MovableTypeRebuilder':
+        """指定したブログを再構築するためのインスタンス（セッション・状態ファイル・通知は共有）"""
+        rebuilder = copy.copy(self)
+        rebuilder.mt_blog_id = target['blog_id']
+        rebuilder.mt_site_name = target['site_name']
+        rebuilder.rebuild_mode = target['mode']
+        rebuilder.rebuild_types = target['types']
+        if tag_logs:
+            rebuilder.logger = BlogLogAdapter(self.logger, {'blog_id': target['blog_id']})
+        return rebuilder
+    
+    def rebuild_with_retry(self) -> Dict[str, Any]:
+        """再構築を実行し、失敗したら max_retry_count 回まで、チェックポイントの続きから再試行する"""
+        attempts = max(1, self.max_retry)
+        for attempt in range(1, attempts + 1):
+            result = self.trigger_rebuild()
+            if result['success'] or attempt == attempts:
+                break
+            self.logger.warning(
+                f"再構築に失敗しました。{self.retry_wait}秒後に続きから再試行します ({attempt}/{attempts - 1})"
+            )
+            time.sleep(self.retry_wait)
+            # 再構築中にセッションが切れていれば再ログイン
+            if not self._ensure_login():
+                break
+        result.update({'attempts': attempt, 'blog_id': self.mt_blog_id, 'site_name': self.mt_site_name})
+        return result
+    
+    def _rebuild_blogs(self, targets: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """複数のブログを同時に max_parallel_rebuilds 件まで並行に再構築し、結果をまとめる"""
+        workers = min(self.max_parallel, len(targets))
+        self.logger.info(f"{len(targets)}ブログを再構築します（同時実行: {workers}）")
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(
+                lambda target: self._for_blog(target, tag_logs=True).rebuild_with_retry(), targets
+            ))
+        elapsed = time.monotonic() - started
+        succeeded = sum(1 for result in results if result['success'])
+        self.logger.info(f"{succeeded}/{len(results)}ブログの再構築が完了しました（{elapsed:.1f}秒）")
+        return {
+            'success': succeeded == len(results),
+            'message': f'{succeeded}/{len(results)}ブログの再構築が完了しました（{elapsed:.1f}秒）\n' + '\n'.join(
+                f"- {result['message']}" for result in results
+            ),
+            'timestamp': datetime.now().isoformat(),
+            'target': f"{self.mt_site_name} (blog_id: {', '.join(t['blog_id'] for t in targets)})",
+            'results': results,
+        }
+    
+    def execute_rebuild(self, mode: Optional[str] = None, types: Optional[List[str]] = None,
+                        blog_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+        """再構築を実行（ログイン→再構築→通知）
+        
+        複数のブログが設定されていれば、1つのログイン済みセッションで並行に再構築する。
+        """
         self.logger.info("=== MovableType再構築開始 ===")
+        targets = self.blog_targets(mode, types, blog_ids)
         
         # ログイン
-        if not self.login_to_mt():
+        if not self._ensure_login():
             # ログイン失敗の詳細情報を取得
             error_details = "ログイン失敗の詳細: 認証エラーまたはアクセス拒否"
             result = {
@@ -243,9 +564,11 @@ MovableType再構築システム
             self.send_email_notification(result)
             self.logger.info("=== MovableType再構築完了（ログイン失敗） ===")
             return result
-        else:
+        elif len(targets) == 1:
             # 再構築実行
-            result = self.trigger_rebuild()
+            result = self._for_blog(targets[0]).rebuild_with_retry()
+        else:
+            result = self._rebuild_blogs(targets)
         
         # 通知送信（ログイン成功時）
         self.send_email_notification(result)
@@ -253,30 +576,36 @@ MovableType再構築システム
         self.logger.info("=== MovableType再構築完了 ===")
         return result
     
-    def run_scheduled_rebuild(self):
-        """スケジュール実行"""
-        self.logger.info("スケジュール実行を開始")
-        
-        # 毎月1日の0:01に実行（scheduleライブラリの制限により、毎日0:01に実行して日付をチェック）
-        schedule.every().day.at("00:01").do(self._check_and_execute_monthly)
+    def run_once(self, mode: Optional[str] = None, types: Optional[List[str]] = None,
+                 blog_ids: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        """予定時刻を過ぎた未実行の再構築があれば1回だけ実行し、なければすぐ終了する
         
-        while True:
-            schedule.run_pending()
-            time.sleep(60)  # 1分ごとにチェック
-    
-    def _check_and_execute_monthly(self):
-        """毎月1日かどうかをチェックして実行"""
-        current_date = datetime.now()
-        if current_date.day == 1:
-            self.logger.info("毎月1日を検出しました。MovableType再構築を実行します。")
-            self.execute_rebuild()
-        else:
-            self.logger.debug(f"毎月1日ではありません。現在の日付: {current_date.day}日")
+        launchd・cron・常駐スケジューラーから起動する。スリープなどで予定時刻を逃していても、
+        catch_up_hours 以内なら実行する。成功した予定時刻だけを記録するので、失敗したら次回の起動で再実行する。
+        """
+        schedule = CronSchedule(self.schedule_expression)
+        now = datetime.now()
+        slot = due_slot(schedule, self.state.last_scheduled_slot(), now, timedelta(hours=self.catch_up_hours))
+        if slot is None:
+            self.logger.info(f"実行予定の再構築はありません（次回: {schedule.next_after(now):%Y-%m-%d %H:%M}）")
+            return None
+        if now - slot > timedelta(minutes=5):
+            self.logger.info(f"予定時刻 {slot:%Y-%m-%d %H:%M} の再構築を逃していたため、今から実行します")
+        if self.schedule_jitter > 0:
+            # 同じ時刻に起動する他のジョブとサーバ負荷が重ならないよう、開始を少しずらす
+            delay = random.uniform(0, self.schedule_jitter)
+            self.logger.info(f"{delay:.0f}秒後に再構築を開始します")
+            time.sleep(delay)
+        result = self.execute_rebuild(mode, types, blog_ids)
+        if result['success']:
+            self.state.record_scheduled_slot(slot)
+        return result
     
-    def run_test(self):
+    def run_test(self, mode: Optional[str] = None, types: Optional[List[str]] = None,
+                 blog_ids: Optional[List[str]] = None):
         """テスト実行"""
         self.logger.info("テスト実行を開始")
-        result = self.execute_rebuild()
+        result = self.execute_rebuild(mode, types, blog_ids)
         self.logger.info(f"テスト結果: {result}")
         return result
 
@@ -284,19 +613,36 @@ def main():
     """メイン関数"""
     parser = argparse.ArgumentParser(description='MovableType再構築ツール')
     parser.add_argument('--test', action='store_true', help='テスト実行')
-    parser.add_argument('--schedule', action='store_true', help='スケジュール実行')
+    parser.add_argument('--schedule', action='store_true',
+                        help='スケジュール実行（常駐し、予定時刻ごとに --once を別プロセスで実行）')
+    parser.add_argument('--once', action='store_true',
+                        help='予定時刻を過ぎた未実行の再構築があれば実行して終了（launchd・cron用）')
+    parser.add_argument('--mode', choices=REBUILD_MODES,
+                        help='再構築の範囲（all: すべて, index: インデックスのみ, types: アーカイブタイプ指定, '
+                             'incremental: 前回成功以降に更新された記事とインデックス）')
+    parser.add_argument('--types', help='typesモードで再構築するアーカイブタイプ（カンマ区切り 例: Individual,Monthly）')
+    parser.add_argument('--blog-ids', help='再構築するブログID（カンマ区切り。未指定なら設定されたすべてのブログ）')
     args = parser.parse_args()
+    types = [t.strip() for t in args.types.split(',') if t.strip()] if args.types else None
+    blog_ids = [b.strip() for b in args.blog_ids.split(',') if b.strip()] if args.blog_ids else None
     
     try:
+        if args.schedule:
+            # 常駐は標準ライブラリだけで動く rebuild_scheduler.py に置き換える
+            # （requests や BeautifulSoup を読み込んだまま眠らない。Ctrl+C もそちらで処理する）
+            scheduler = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rebuild_scheduler.py')
+            os.execv(sys.executable, [sys.executable, scheduler,
+                                      *rebuilder_args(args.mode, args.types, args.blog_ids)])
+        
         rebuilder = MovableTypeRebuilder()
         
         if args.test:
-            rebuilder.run_test()
-        elif args.schedule:
-            rebuilder.run_scheduled_rebuild()
+            rebuilder.run_test(args.mode, types, blog_ids)
+        elif args.once:
+            rebuilder.run_once(args.mode, types, blog_ids)
         else:
             # 通常実行
-            rebuilder.execute_rebuild()
+            rebuilder.execute_rebuild(args.mode, types, blog_ids)
             
     except Exception as e:
         logging.error(f"実行エラー: {e}")
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+再構築プランナー
+再構築する範囲（すべて・インデックスのみ・アーカイブタイプ指定・前回成功以降の変更分）から、
+MovableTypeの分割再構築（__mode=start_rebuild → __mode=rebuild&next=…&offset=…）に渡す
+type（カンマ区切りの再構築順）を組み立てます。
+前回成功した日時、途中まで進んだ再構築のチェックポイント、ステップごとの所要時間は
+ブログごとに状態ファイル（JSON）へ記録します。
+"""
+
+import copy
+import html
+import json
+import os
+import re
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urljoin, urlparse
+
+from bs4 import BeautifulSoup
+
+REBUILD_MODES = ('all', 'index', 'types', 'incremental')
+
+# 再構築中の画面は次のステップへ JavaScript（またはmeta refresh）で移動する
+_CONTINUATION_PATTERNS = [
+    re.compile(r"""location(?:\.href)?\s*=\s*['"]([^'"]*__mode=rebuild(?:&|&amp;)[^'"]*)['"]"""),
+    re.compile(r"""http-equiv=["']refresh["'][^>]*content=["']\d+\s*;\s*url=([^"']*__mode=rebuild(?:&|&amp;)[^"']*)["']""",
+               re.IGNORECASE),
+]
+
+# 再構築完了画面の文言（日本語・英語）
+SUCCESS_INDICATORS = [
+    '再構築が完了しました', '再構築しました', 'have been rebuilt', 'rebuild completed', 'success',
+]
+
+
+def find_continuation(page: str, base_url: str) -> Optional[str]:
+    """再構築中の画面から次のステップのURLを取り出す（完了画面なら None）"""
+    for pattern in _CONTINUATION_PATTERNS:
+        match = pattern.search(page)
+        if match:
+            return urljoin(base_url, html.unescape(match.group(1)))
+    return None
+
+
+def continuation_params(url: str) -> Dict[str, str]:
+    """次のステップのURLのクエリ（type, next, offset など）を返す"""
+    return {key: values[0] for key, values in parse_qs(urlparse(url).query).items()}
+
+
+def parse_archive_types(page: str) -> Dict[str, str]:
+    """再構築ダイアログ（__mode=rebuild_confirm）の選択肢から {type: 表示名} を返す
+
+    先頭の「すべてのファイル」はカンマ区切りの全アーカイブタイプ（index を含む）になっている。
+    """
+    soup = BeautifulSoup(page, 'html.parser')
+    select = soup.find('select', attrs={'name': 'type'})
+    if select is None:
+        return {}
+    return {
+        option.get('value'): option.get_text(strip=True)
+        for option in select.find_all('option') if option.get('value')
+    }
+
+
+def is_rebuild_complete(page: str) -> bool:
+    return any(indicator in page for indicator in SUCCESS_INDICATORS)
+
+
+def step_type(plan: List[str], params: Dict[str, str]) -> str:
+    """ステップのクエリ（next）から、そのステップで再構築しているtypeを返す"""
+    if params.get('__mode') != 'rebuild':
+        return '開始'
+    order = params['type'].split(',') if params.get('type') else plan
+    try:
+        index = int(params.get('next', 0))
+    except ValueError:
+        index = 0
+    return order[index] if index < len(order) else '完了処理'
+
+
+def completed_types(plan: List[str], params: Dict[str, str]) -> List[str]:
+    """次のステップのクエリから、再構築が終わったtypeを返す"""
+    try:
+        return plan[:int(params.get('next', 0))]
+    except ValueError:
+        return []
+
+
+def add_timing(timings: Dict[str, Dict[str, Any]], rebuild_type: str, seconds: float):
+    """typeごとのページ数（リクエスト数）と所要時間を加算する"""
+    timing = timings.setdefault(rebuild_type, {'pages': 0, 'seconds': 0.0})
+    timing['pages'] += 1
+    timing['seconds'] = round(timing['seconds'] + seconds, 3)
+
+
+def format_timings(timings: Dict[str, Dict[str, Any]]) -> List[str]:
+    """typeごとのページ数と所要時間を、時間のかかった順に1行ずつ返す"""
+    return [
+        f"{rebuild_type}: {timing['pages']}ページ / {timing['seconds']:.1f}秒"
+        for rebuild_type, timing in sorted(timings.items(), key=lambda item: -item[1]['seconds'])
+    ]
+
+
+class RebuildState:
+    """ブログごとの再構築の記録（JSON）
+
+    last_success: 前回成功した再構築の開始時刻
+    checkpoint: 途中で失敗した再構築の続き（再構築順・次のステップのURL・完了したtype・所要時間）
+    last_timings: 前回成功した再構築のtypeごとのページ数と所要時間
+    scheduled_slot: スケジュール実行で最後に成功した予定時刻（ブログ共通）
+    複数のブログを並行に再構築するスレッドから共有する。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.RLock()
+        self.data: Dict[str, Any] = {'blogs': {}}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.data = json.load(f)
+            except (OSError, ValueError):
+                # 壊れていても再構築は止めない（次の成功時に書き直す）
+                self.data = {'blogs': {}}
+        self.data.setdefault('blogs', {})
+
+    def blog(self, blog_id: str) -> Dict[str, Any]:
+        with self._lock:
+            return self.data['blogs'].setdefault(str(blog_id), {})
+
+    def last_success(self, blog_id: str) -> Optional[datetime]:
+        value = self.blog(blog_id).get('last_success')
+        return datetime.fromisoformat(value) if value else None
+
+    def record_success(self, blog_id: str, started_at: datetime, mode: str, steps: int,
+                       timings: Optional[Dict[str, Dict[str, Any]]] = None):
+        """再構築の開始時刻を記録する（再構築中に更新された記事は次回の対象にする）"""
+        with self._lock:
+            blog = self.blog(blog_id)
+            blog.pop('checkpoint', None)
+            blog.update({
+                'last_success': started_at.isoformat(),
+                'mode': mode,
+                'steps': steps,
+                'last_timings': copy.deepcopy(timings or {}),
+            })
+            self.save()
+
+    def last_scheduled_slot(self) -> Optional[datetime]:
+        value = self.data.get('scheduled_slot')
+        return datetime.fromisoformat(value) if value else None
+
+    def record_scheduled_slot(self, slot: datetime):
+        with self._lock:
+            self.data['scheduled_slot'] = slot.isoformat()
+            self.save()
+
+    def checkpoint(self, blog_id: str, max_age_hours: float = 24) -> Optional[Dict[str, Any]]:
+        """再開できるチェックポイント（古すぎるものは捨てる）"""
+        with self._lock:
+            checkpoint = copy.deepcopy(self.blog(blog_id).get('checkpoint'))
+        if not checkpoint:
+            return None
+        updated = datetime.fromisoformat(checkpoint['updated_at'])
+        if datetime.now().astimezone() - updated > timedelta(hours=max_age_hours):
+            self.clear_checkpoint(blog_id)
+            return None
+        return checkpoint
+
+    def save_checkpoint(self, blog_id: str, checkpoint: Dict[str, Any]):
+        checkpoint['updated_at'] = datetime.now().astimezone().isoformat()
+        with self._lock:
+            # 呼び出し側は再構築を続けながら checkpoint を更新するので、保存時点の内容を複製して持つ
+            self.blog(blog_id)['checkpoint'] = copy.deepcopy(checkpoint)
+            self.save()
+
+    def clear_checkpoint(self, blog_id: str):
+        with self._lock:
+            if self.blog(blog_id).pop('checkpoint', None) is not None:
+                self.save()
+
+    def save(self):
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+
+
+def data_api_url(mt_url: str, configured: Optional[str] = None, version: str = 'v4') -> str:
+    """Data APIのエンドポイント（未設定なら mt.cgi と同じ場所の mt-data-api.cgi）"""
+    base = configured or re.sub(r'mt\.cgi$', 'mt-data-api.cgi', mt_url.rstrip('/'))
+    return f"{base.rstrip('/')}/{version}"
+
+
+def fetch_touched_entry_ids(session, api_url: str, blog_id: str, since: datetime,
+                            timeout: int = 60, page_size: int = 100) -> List[int]:
+    """前回成功以降に更新された公開済みの記事・ウェブページのIDを返す
+
+    Data API の一覧を更新日時の新しい順に取得し、since より古いものが出たところで打ち切る。
+    """
+    since = since if since.tzinfo else since.astimezone()
+    entry_ids: List[int] = []
+    for resource in ('entries', 'pages'):
+        offset = 0
+        while True:
+            response = session.get(
+                f"{api_url}/sites/{blog_id}/{resource}",
+                params={
+                    'status': 'Publish',
+                    'sortBy': 'modified_on',
+                    'sortOrder': 'descend',
+                    'fields': 'id,modifiedDate',
+                    'limit': page_size,
+                    'offset': offset,
+                },
+                timeout=timeout,
+            )
+            response.raise_for_status()
+            items = response.json().get('items', [])
+            reached_older = False
+            for item in items:
+                modified = datetime.fromisoformat(item['modifiedDate'])
+                if not modified.tzinfo:
+                    modified = modified.astimezone()
+                if modified < since:
+                    reached_older = True
+                    break
+                entry_ids.append(int(item['id']))
+            if reached_older or len(items) < page_size:
+                break
+            offset += page_size
+    return entry_ids
+
+
+def plan_types(mode: str, archive_types: Dict[str, str], requested_types: Optional[List[str]] = None,
+               touched_entry_ids: Optional[List[int]] = None) -> List[str]:
+    """再構築モードから MovableType に渡す再構築順（type の並び）を返す
+
+    archive_types は parse_archive_types の結果。取得できなかった場合は空でよい。
+    """
+    if mode not in REBUILD_MODES:
+        raise ValueError(f"未対応の再構築モードです: {mode}（{', '.join(REBUILD_MODES)}）")
+    all_types = next((value.split(',') for value in archive_types if ',' in value), [])
+    if mode == 'all':
+        return all_types or ['all']
+    if mode == 'index':
+        return ['index']
+    if mode == 'types':
+        if not requested_types:
+            raise ValueError("typesモードでは再構築するアーカイブタイプを指定してください")
+        known = set(all_types) | set(archive_types)
+        unknown = [t for t in requested_types if known and t not in known]
+        if unknown:
+            raise ValueError(f"このブログにないアーカイブタイプです: {', '.join(unknown)}")
+        return list(requested_types)
+    # incremental: 変更された記事（とその記事を含むアーカイブ）とインデックスだけ
+    return [f"entry-{entry_id}" for entry_id in touched_entry_ids or []] + ['index']
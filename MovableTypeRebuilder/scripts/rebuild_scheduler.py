@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+再構築スケジューラー（常駐版）
+cron形式のスケジュールから次の予定時刻を計算してその時刻まで眠り、
+予定時刻になったら mt_rebuilder.py --once を別プロセスで実行します。
+常駐するプロセスは標準ライブラリだけで動き、requests や BeautifulSoup は再構築のときだけ読み込まれます。
+launchd や cron から起動する場合は常駐させず、mt_rebuilder.py --once を直接実行してください。
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+import subprocess
+from datetime import datetime
+from typing import List, Optional, Sequence
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import EXECUTION_CONFIG
+from cron_schedule import CronSchedule
+
+REBUILDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mt_rebuilder.py')
+
+# スリープから復帰したときに時刻がずれないよう、長くても1時間ごとに残り時間を計算し直す
+MAX_SLEEP_SECONDS = 3600
+
+logger = logging.getLogger(__name__)
+
+
+def sleep_until(moment: datetime):
+    """指定した時刻まで眠る"""
+    while True:
+        remaining = (moment - datetime.now()).total_seconds()
+        if remaining <= 0:
+            return
+        time.sleep(min(remaining, MAX_SLEEP_SECONDS))
+
+
+def run_rebuilder(args: Sequence[str] = ()) -> int:
+    """mt_rebuilder.py --once を別プロセスで実行（予定時刻を過ぎていなければすぐ終了する）"""
+    command = [sys.executable, REBUILDER, '--once', *args]
+    logger.info(f"再構築プロセスを起動: {' '.join(command)}")
+    returncode = subprocess.run(command).returncode
+    if returncode != 0:
+        logger.warning(f"再構築プロセスが終了コード {returncode} で終了しました")
+    return returncode
+
+
+def run_scheduler(expression: str, args: Sequence[str] = ()):
+    """スケジュールに従って再構築を実行し続ける"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    schedule = CronSchedule(expression)
+    logger.info(f"スケジュール実行を開始: {expression}")
+
+    # 停止中に逃した予定があれば実行する
+    run_rebuilder(args)
+    while True:
+        next_run = schedule.next_after(datetime.now())
+        logger.info(f"次回の再構築: {next_run:%Y-%m-%d %H:%M}")
+        sleep_until(next_run)
+        run_rebuilder(args)
+
+
+def rebuilder_args(mode: Optional[str] = None, types: Optional[str] = None,
+                   blog_ids: Optional[str] = None) -> List[str]:
+    """mt_rebuilder.py に渡す再構築範囲の引数"""
+    args: List[str] = []
+    if mode:
+        args += ['--mode', mode]
+    if types:
+        args += ['--types', types]
+    if blog_ids:
+        args += ['--blog-ids', blog_ids]
+    return args
+
+
+def main():
+    parser = argparse.ArgumentParser(description='MovableType再構築スケジューラー（常駐版）')
+    parser.add_argument('--cron', default=EXECUTION_CONFIG.get('schedule', '1 0 1 * *'),
+                        help='cron形式のスケジュール（分 時 日 月 曜日）')
+    parser.add_argument('--mode', help='再構築の範囲（mt_rebuilder.py --mode と同じ）')
+    parser.add_argument('--types', help='typesモードで再構築するアーカイブタイプ（カンマ区切り）')
+    parser.add_argument('--blog-ids', help='再構築するブログID（カンマ区切り）')
+    args = parser.parse_args()
+    try:
+        run_scheduler(args.cron, rebuilder_args(args.mode, args.types, args.blog_ids))
+    except KeyboardInterrupt:
+        logger.info("スケジュール実行を終了します")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+Journal Cache - 日記データベースの検索キャッシュ
+実行ごとに日記データベースを1回だけ全件取得し、一致用日付とタイトルから
+日記ページをメモリ上で引けるようにします。対象ページごとの databases.query が不要になります。
+複数のデータベースを並列に処理するスレッドから共有でき、同じ日付の日記ページの作成は1回にまとめます。
+registry（JournalRegistry）を渡すと、作成前にローカル台帳で日付を予約し、プロセスをまたいでも二重作成しません。
+"""
+
+import re
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from notion_common import get_prop_val, iter_database_pages
+
+_MATCH_PATTERN = re.compile(r"^(\d{4})-(\d{2})-(\d{2})$")
+
+
+def journal_title(match_text: str) -> str:
+    """一致用日付（YYYY-MM-DD）から日記ページのタイトル（YYYY-MMDD）を作る"""
+    match = _MATCH_PATTERN.match(match_text)
+    if match:
+        year, month, day = match.groups()
+        return f"{year}-{month}{day}"
+    return match_text
+
+
+def normalize_title(title: str) -> str:
+    """タイトルの表記ゆれ（前後の空白、YYYY-MM-DD 形式）を YYYY-MMDD に揃える"""
+    return journal_title(title.strip())
+
+
+class JournalCache:
+    """一致用日付・タイトル → 日記ページ の対応表"""
+
+    def __init__(self, notion, database_id: str, match_prop: str, title_prop: str,
+                 registry=None, verify: Optional[Callable[[str], bool]] = None):
+        self.notion = notion
+        self.registry = registry
+        self.verify = verify
+        self.database_id = database_id
+        self.match_prop = match_prop
+        self.title_prop = title_prop
+        self.by_match: Dict[str, Dict[str, Any]] = {}
+        self.by_title: Dict[str, Dict[str, Any]] = {}
+        self.loaded = False
+        self._lock = threading.RLock()
+        self._load_lock = threading.Lock()
+        self._create_locks: Dict[str, threading.Lock] = {}
+
+    def load(self):
+        """日記データベースを全件読み込む（複数スレッドから呼ばれても1回だけ）"""
+        with self._load_lock:
+            if self.loaded:
+                return
+            for page in iter_database_pages(self.notion, self.database_id):
+                self.add(page)
+            if self.registry is not None:
+                # Notion上の既存ページを台帳にも登録しておく
+                with self._lock:
+                    items = [(title, page["id"]) for title, page in self.by_title.items()]
+                self.registry.record_many(items)
+            self.loaded = True
+        print(f"日記キャッシュ: {len(self.by_title)}件読み込み")
+
+    def add(self, page: Dict[str, Any], match_text: Optional[str] = None):
+        """ページを登録（作成直後で一致用日付が未計算のページは match_text を渡す）"""
+        props = page.get("properties", {})
+        match_value = match_text
+        if match_value is None and self.match_prop in props:
+            match_value = get_prop_val(props[self.match_prop])
+        title = get_prop_val(props[self.title_prop]) if self.title_prop in props else None
+        with self._lock:
+            if match_value:
+                # 同じ日付のページが複数ある場合は先に見つかった方を使う
+                self.by_match.setdefault(match_value, page)
+            if title:
+                self.by_title.setdefault(normalize_title(title), page)
+            elif match_text:
+                self.by_title.setdefault(journal_title(match_text), page)
+
+    def find(self, match_text: str) -> Optional[Dict[str, Any]]:
+        """一致用日付で検索し、見つからなければタイトル（YYYY-MMDD）で検索"""
+        if not self.loaded:
+            self.load()
+        with self._lock:
+            return self.by_match.get(match_text) or self.by_title.get(journal_title(match_text))
+
+    def get_or_create(self, match_text: str,
+                      create: Callable[[str], Dict[str, Any]]) -> Tuple[Dict[str, Any], bool]:
+        """日記ページを検索し、なければ create(match_text) で作成して登録する
+
+        同じ日付（YYYY-MMDD）の作成は日付ごとのロックで直列化し、
+        待っていたスレッドは先に作成されたページを使う。registry があれば
+        作成前に台帳で日付を予約する。(ページ, 作成したか) を返す。
+        """
+        page = self.find(match_text)
+        if page:
+            return page, False
+        key = journal_title(match_text)
+        with self._lock:
+            create_lock = self._create_locks.setdefault(key, threading.Lock())
+        with create_lock:
+            page = self.find(match_text)
+            if page:
+                return page, False
+            if self.registry is not None:
+                page_id, created = self.registry.ensure(
+                    key, lambda: create(match_text)["id"], verify=self.verify
+                )
+                page = {"id": page_id}
+            else:
+                page, created = create(match_text), True
+            self.add(page, match_text)
+            return page, created
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+Journal Registry - 日付 → 日記ページIDのローカル台帳
+日記ページを作成する前に必ずこの台帳を確認し、SQLiteのトランザクションで日付を「予約」してから作成します。
+databases.query の反映遅れや、link_diary.py と create_missing_journal_pages.py の同時実行でも
+同じ日付のページが二重に作成されません。
+
+環境変数:
+  JOURNAL_REGISTRY_PATH … 台帳ファイルのパス（既定: NotionLinker/journal_registry.db）
+"""
+
+import os
+import socket
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Iterable, Optional, Tuple
+
+DEFAULT_REGISTRY_PATH = str(Path(__file__).resolve().parent / "journal_registry.db")
+
+# 予約したまま作成が終わらないプロセスを死んだとみなすまでの秒数
+CLAIM_TIMEOUT = 300
+POLL_INTERVAL = 0.5
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS journal_pages (
+    title TEXT PRIMARY KEY,
+    page_id TEXT,
+    claimed_by TEXT,
+    claimed_at REAL,
+    created_at REAL
+);
+"""
+
+
+class JournalRegistry:
+    """日記タイトル（YYYY-MMDD）→ ページIDの永続台帳"""
+
+    def __init__(self, path: Optional[str] = None, claim_timeout: float = CLAIM_TIMEOUT):
+        self.path = path or os.getenv("JOURNAL_REGISTRY_PATH", DEFAULT_REGISTRY_PATH)
+        self.claim_timeout = claim_timeout
+        # トランザクションは BEGIN IMMEDIATE で明示的に張る
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(_SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    @staticmethod
+    def _owner() -> str:
+        """予約者の識別子（ホスト・プロセス・スレッド）"""
+        return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+    def get(self, title: str) -> Optional[str]:
+        """作成済みのページIDを取得（未登録・予約中ならNone）"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT page_id FROM journal_pages WHERE title = ?", (title,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def record_many(self, items: Iterable[Tuple[str, str]]):
+        """Notion上に既にあるページを登録（登録済みのタイトルは変更しない）"""
+        now = time.time()
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO journal_pages (title, page_id, created_at) VALUES (?, ?, ?)",
+                    [(title, page_id, now) for title, page_id in items],
+                )
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def forget(self, title: str):
+        """削除・アーカイブされたページの登録を取り消す"""
+        with self._lock:
+            self.conn.execute("DELETE FROM journal_pages WHERE title = ?", (title,))
+
+    def _claim(self, title: str) -> Tuple[Optional[str], bool]:
+        """タイトルを予約する。(既存ページID, 予約できたか) を返す"""
+        now = time.time()
+        owner = self._owner()
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.conn.execute(
+                    "SELECT page_id, claimed_by, claimed_at FROM journal_pages WHERE title = ?", (title,)
+                ).fetchone()
+                if row and row[0]:
+                    self.conn.execute("COMMIT")
+                    return row[0], False
+                if row and row[1] != owner and now - (row[2] or 0) < self.claim_timeout:
+                    # 他のプロセスが作成中
+                    self.conn.execute("COMMIT")
+                    return None, False
+                self.conn.execute(
+                    """
+                    INSERT INTO journal_pages (title, page_id, claimed_by, claimed_at)
+                    VALUES (?, NULL, ?, ?)
+                    ON CONFLICT(title) DO UPDATE SET claimed_by = excluded.claimed_by, claimed_at = excluded.claimed_at
+                    """,
+                    (title, owner, now),
+                )
+                self.conn.execute("COMMIT")
+                return None, True
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def _complete(self, title: str, page_id: str):
+        with self._lock:
+            self.conn.execute(
+                "UPDATE journal_pages SET page_id = ?, created_at = ? WHERE title = ?",
+                (page_id, time.time(), title),
+            )
+
+    def _release(self, title: str):
+        with self._lock:
+            self.conn.execute(
+                "DELETE FROM journal_pages WHERE title = ? AND page_id IS NULL AND claimed_by = ?",
+                (title, self._owner()),
+            )
+
+    def ensure(self, title: str, create: Callable[[], str],
+               verify: Optional[Callable[[str], bool]] = None) -> Tuple[str, bool]:
+        """タイトルのページIDを返し、なければ予約してから create() で作成する
+
+        verify を渡すと、台帳にあるページがNotion上で生きているかを確認し、
+        削除済みなら登録を取り消して作り直す。(ページID, 作成したか) を返す。
+        """
+        while True:
+            page_id, claimed = self._claim(title)
+            if page_id:
+                if verify is None or verify(page_id):
+                    return page_id, False
+                print(f"[INFO] 台帳の日記ページが見つからないため登録を取り消します: {title} ({page_id})")
+                self.forget(title)
+                continue
+            if not claimed:
+                time.sleep(POLL_INTERVAL)
+                continue
+            try:
+                page_id = create()
+            except BaseException:
+                self._release(title)
+                raise
+            self._complete(title, page_id)
+            return page_id, True
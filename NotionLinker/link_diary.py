@@ -5,20 +5,20 @@ Notion Linker 拡張版（修正版）
 - リレーションプロパティが未設定のページのみを対象
 """
 
-import os, sys, time, random
+import os, sys
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from typing import Optional, Dict, Any, List
 
-try:
-    from notion_client import Client
-    from notion_client.errors import APIResponseError, RequestTimeoutError
-except Exception:
-    print("notion-client がありません。`pip install -r requirements.txt` を実行してください。")
-    sys.exit(1)
-
 from dotenv import load_dotenv
 load_dotenv()
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from notion_common import NotionWriter, create_client, get_prop_val, iter_database_pages, page_exists, print_call_stats, with_retry
+
+from journal_cache import JournalCache, journal_title
+from journal_registry import JournalRegistry
+
 # 基本設定
 NOTION_TOKEN = os.getenv("NOTION_TOKEN")
 JOURNAL_DB_ID = os.getenv("JOURNAL_DB_ID")
@@ -61,7 +61,8 @@ PROP_MATCH_STR = os.getenv("PROP_MATCH_STR", "一致用日付")
 PROP_JOURNAL_TITLE = os.getenv("PROP_JOURNAL_TITLE", "タイトル")
 
 RECHECK_DAYS = int(os.getenv("RECHECK_DAYS", "90"))
-SLEEP_BETWEEN = float(os.getenv("SLEEP_BETWEEN", "0.2"))
+# 各データベースを並列に処理する（false で従来どおり順番に処理）
+PARALLEL_DATABASES = os.getenv("PARALLEL_DATABASES", "true").lower() in ("1", "true", "yes")
 
 # 必須設定の確認
 if not NOTION_TOKEN or not JOURNAL_DB_ID:
@@ -81,59 +82,17 @@ if not ACTIVE_DATABASES:
     sys.exit(1)
 
 # --- Notion クライアント（タイムアウト指定）
-notion = Client(auth=NOTION_TOKEN, timeout_ms=int(NOTION_TIMEOUT * 1000))
+notion = create_client(NOTION_TOKEN, NOTION_TIMEOUT)
 
-# ---------- リトライ付きAPI呼び出しユーティリティ ----------
-def with_retry(fn, *, max_attempts=4, base_delay=1.0, what="api"):
-    attempt = 0
-    while True:
-        try:
-            return fn()
-        except RequestTimeoutError as e:
-            attempt += 1
-            if attempt >= max_attempts:
-                raise
-            delay = base_delay * (2 ** (attempt-1)) + random.uniform(0, 0.5)
-            print(f"[RETRY] Timeout on {what}. retry {attempt}/{max_attempts} in {delay:.1f}s")
-            time.sleep(delay)
-        except APIResponseError as e:
-            if getattr(e, "code", "") == "rate_limited":
-                attempt += 1
-                retry_after = float(getattr(e, "headers", {}).get("Retry-After", 1)) if hasattr(e, "headers") else 1.0
-                delay = max(retry_after, base_delay * (2 ** (attempt-1))) + random.uniform(0, 0.5)
-                print(f"[RETRY] rate_limited on {what}. retry {attempt}/{max_attempts} in {delay:.1f}s")
-                time.sleep(delay)
-                if attempt < max_attempts:
-                    continue
-            raise
+# 日記ページの検索キャッシュ（最初の検索時に日記DBを1回だけ全件取得）
+# 作成前にローカル台帳で日付を予約し、同時実行や検索の反映遅れによる重複作成を防ぐ
+journal_cache = JournalCache(
+    notion, JOURNAL_DB_ID, PROP_MATCH_STR, PROP_JOURNAL_TITLE,
+    registry=None if DRY_RUN else JournalRegistry(),
+    verify=lambda page_id: page_exists(notion, page_id),
+)
 
 # ---------- 値取り出し ----------
-def get_prop_val(prop: Dict[str, Any]) -> Optional[Any]:
-    t = prop.get("type")
-    if t == "date":
-        v = prop.get("date")
-        return v.get("start") if v else None
-    if t == "rich_text":
-        return "".join([span.get("plain_text", "") for span in prop.get("rich_text", [])]) or None
-    if t == "title":
-        return "".join([span.get("plain_text", "") for span in prop.get("title", [])]) or None
-    if t == "formula":
-        f = prop.get("formula", {})
-        typ = f.get("type")
-        if typ == "string":
-            return f.get("string")
-        if typ == "number":
-            return f.get("number")
-        if typ == "boolean":
-            return f.get("boolean")
-        if typ == "date":
-            d = f.get("date") or {}
-            return d.get("start")
-        return None
-    if t == "relation":
-        return prop.get("relation") or []
-    return None
-
 def get_page_prop(page: Dict[str, Any], prop_name: str) -> Dict[str, Any]:
     props = page.get("properties", {})
     if prop_name not in props:
@@ -141,80 +100,24 @@ def get_page_prop(page: Dict[str, Any], prop_name: str) -> Dict[str, Any]:
     return props[prop_name]
 
 # ---------- DB操作 ----------
-def iter_database_pages(database_id: str, filter_obj: Optional[Dict[str, Any]] = None):
-    start_cursor = None
-    while True:
-        def _call():
-            payload = {"database_id": database_id, "page_size": 100}
-            if filter_obj:
-                payload["filter"] = filter_obj
-            if start_cursor:
-                payload["start_cursor"] = start_cursor
-            return notion.databases.query(**payload)
-        res = with_retry(_call, what="databases.query")
-        for r in res.get("results", []):
-            yield r
-        if not res.get("has_more"):
-            break
-        start_cursor = res.get("next_cursor")
-
 def find_journal_by_match(match_text: str) -> Optional[Dict[str, Any]]:
-    # まず一致用日付プロパティで検索
-    def _call():
-        return notion.databases.query(
-            **{
-                "database_id": JOURNAL_DB_ID,
-                "filter": {"property": PROP_MATCH_STR, "rich_text": {"equals": match_text}},
-                "page_size": 1,
-            }
-        )
-    res = with_retry(_call, what="journal.query")
-    arr = res.get("results", [])
-    if arr:
-        return arr[0]
-    
-    # 一致用日付で見つからない場合、タイトルで検索
-    import re
-    pattern = r'^(\d{4})-(\d{2})-(\d{2})$'
-    match = re.match(pattern, match_text)
-    if match:
-        year, month, day = match.groups()
-        title_format = f"{year}-{month}{day}"
-        
-        def _call2():
-            return notion.databases.query(
-                **{
-                    "database_id": JOURNAL_DB_ID,
-                    "filter": {"property": PROP_JOURNAL_TITLE, "title": {"equals": title_format}},
-                    "page_size": 1,
-                }
-            )
-        res2 = with_retry(_call2, what="journal.query")
-        arr2 = res2.get("results", [])
-        if arr2:
-            return arr2[0]
-    
-    return None
+    # 一致用日付 → タイトル（YYYY-MMDD）の順にキャッシュから検索
+    return journal_cache.find(match_text)
 
 def create_journal_page(match_text: str) -> Dict[str, Any]:
-    import re
-    pattern = r'^(\d{4})-(\d{2})-(\d{2})$'
-    match = re.match(pattern, match_text)
-    if match:
-        year, month, day = match.groups()
-        title_format = f"{year}-{month}{day}"
-    else:
-        title_format = match_text
+    title_format = journal_title(match_text)
     
     props = {
         PROP_JOURNAL_TITLE: {"title": [{"type": "text", "text": {"content": title_format}}]},
     }
     if DRY_RUN:
         print(f"[DRY-RUN] Create Journal page: title={title_format} (from {match_text})")
-        return {"id": "dry-run-journal-id"}
-    def _call():
-        return notion.pages.create(**{"parent": {"database_id": JOURNAL_DB_ID}, "properties": props})
-    return with_retry(_call, what="pages.create")
+        page = {"id": "dry-run-journal-id"}
+    else:
+        def _call():
+            return notion.pages.create(**{"parent": {"database_id": JOURNAL_DB_ID}, "properties": props})
+        page = with_retry(_call, what="pages.create")
+    return page
 
 def set_relation(page_id: str, journal_page_id: str, relation_prop: str):
     if DRY_RUN:
@@ -251,7 +154,8 @@ def retrieve_page(page_id: str) -> Dict[str, Any]:
     return with_retry(_call, what="pages.retrieve")
 
 # ---------- データベース処理 ----------
-def process_database(db_name: str, db_config: Dict[str, Any]):
+def process_database(db_name: str, db_config: Dict[str, Any], writer: NotionWriter):
+    """対象ページごとに日記ページを検索・作成し、リレーション設定を writer に投入する"""
     print(f"\n=== {db_name} データベース処理開始 ===")
     
     # フィルタの設定
@@ -270,13 +174,14 @@ def process_database(db_name: str, db_config: Dict[str, Any]):
         # 新しいデータベースの場合：リレーションプロパティが空のものを対象
         filter_obj = {"property": db_config["relation_prop"], "relation": {"is_empty": True}}
 
-    pages = list(iter_database_pages(db_config["db_id"], filter_obj))
+    pages = list(iter_database_pages(notion, db_config["db_id"], filter_obj))
     if not pages:
         print(f"{db_name}: 対象ページはありません。")
         return
 
     print(f"{db_name}: 対象ページ数: {len(pages)}")
-    processed_count = 0
+    # 日記ページの検索・作成はこのスレッドで行い、リレーション設定だけを共有ライタで並列に送る
+    futures = []
     
     for i, page in enumerate(pages, 1):
         page_id = page["id"]
@@ -289,43 +194,65 @@ def process_database(db_name: str, db_config: Dict[str, Any]):
             continue
         match_text = get_prop_val(match_prop)
         if not match_text:
-            print(f"[{i}/{len(pages)}] 一致用日付が空でスキップ")
+            print(f"[{db_name} {i}/{len(pages)}] 一致用日付が空でスキップ")
             continue
 
         # 必要に応じて一致用日付へ日数オフセットを適用
         adjusted_match = _apply_match_offset_if_needed(db_name, match_text)
         if adjusted_match != match_text:
-            print(f"[{i}/{len(pages)}] match='{match_text}' → adjusted='{adjusted_match}'")
+            print(f"[{db_name} {i}/{len(pages)}] match='{match_text}' → adjusted='{adjusted_match}'")
         else:
-            print(f"[{i}/{len(pages)}] match='{match_text}' → DailyJournal を検索")
+            print(f"[{db_name} {i}/{len(pages)}] match='{match_text}' → DailyJournal を検索")
 
-        lookup_key = adjusted_match
-        journal = find_journal_by_match(lookup_key)
-        if not journal:
-            print("  該当なし → 作成")
-            journal = create_journal_page(lookup_key)
+        # 同じ日付の作成は他のデータベースのスレッドとも1回にまとめる
+        journal, created = journal_cache.get_or_create(adjusted_match, create_journal_page)
+        if created:
+            print(f"  [{db_name}] 該当なし → 作成: {journal_title(adjusted_match)}")
 
         new_id = journal["id"]
-        print(f"  リレーション設定: {page_id} -> {new_id}")
-        set_relation(page_id, new_id, db_config["relation_prop"])
-        processed_count += 1
-        time.sleep(SLEEP_BETWEEN)
-
-    print(f"{db_name}: {processed_count}件処理完了")
+        print(f"  [{db_name}] リレーション設定: {page_id} -> {new_id}")
+        futures.append(writer.submit(
+            lambda page_id=page_id, new_id=new_id: set_relation(page_id, new_id, db_config["relation_prop"]),
+            what=f"set_relation {page_id}",
+        ))
+
+    failed = sum(1 for f in futures if f.exception() is not None)
+    print(f"{db_name}: {len(futures) - failed}件処理完了")
+    if failed:
+        print(f"{db_name}: {failed}件のリレーション設定に失敗しました")
+
+def _run_database(db_name: str, db_config: Dict[str, Any], writer: NotionWriter):
+    try:
+        process_database(db_name, db_config, writer)
+    except Exception as e:
+        print(f"[ERROR] {db_name}の処理中にエラーが発生: {e}")
 
 # ---------- メイン ----------
 def main():
     print("== Notion Linker 拡張版（修正版）: 4つの新しいデータベース対応 ==")
     print(f"有効なデータベース: {', '.join(ACTIVE_DATABASES.keys())}")
     
-    for db_name, db_config in ACTIVE_DATABASES.items():
-        try:
-            process_database(db_name, db_config)
-        except Exception as e:
-            print(f"[ERROR] {db_name}の処理中にエラーが発生: {e}")
-            continue
+    print(f"並列処理: {PARALLEL_DATABASES}")
+    
+    # 日記DBは全データベースで共有するキャッシュに1回だけ読み込む
+    try:
+        journal_cache.load()
+    except Exception as e:
+        print(f"[ERROR] 日記データベースの読み込みに失敗: {e}")
+        return
+    
+    # リレーション設定は全データベースで1つのライタを共有し、送信ペースは共有レート制限で調整する
+    with NotionWriter() as writer:
+        if PARALLEL_DATABASES:
+            with ThreadPoolExecutor(max_workers=len(ACTIVE_DATABASES), thread_name_prefix="linker-db") as pool:
+                for db_name, db_config in ACTIVE_DATABASES.items():
+                    pool.submit(_run_database, db_name, db_config, writer)
+        else:
+            for db_name, db_config in ACTIVE_DATABASES.items():
+                _run_database(db_name, db_config, writer)
 
     print("\n全てのデータベースの処理が完了しました。")
+    print_call_stats()
 
 if __name__ == "__main__":
     try:
@@ -4,18 +4,21 @@
 """
 
 import os
-from notion_client import Client
+import sys
 from dotenv import load_dotenv
 
 load_dotenv()
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from notion_common import create_client, get_prop_val, with_retry
+
 NOTION_TOKEN = os.getenv("NOTION_TOKEN")
 JOURNAL_DB_ID = os.getenv("JOURNAL_DB_ID")
 if not NOTION_TOKEN or not JOURNAL_DB_ID:
     print("NOTION_TOKEN または JOURNAL_DB_ID が設定されていません。")
     exit(1)
 
-notion = Client(auth=NOTION_TOKEN)
+notion = create_client(NOTION_TOKEN)
 
 # データベース設定
 DATABASES = {
@@ -37,29 +40,6 @@ DATABASES = {
     }
 }
 
-def get_prop_val(prop):
-    """プロパティの値を取得"""
-    t = prop.get("type")
-    if t == "date":
-        v = prop.get("date")
-        return v.get("start") if v else None
-    if t == "rich_text":
-        return "".join([span.get("plain_text", "") for span in prop.get("rich_text", [])]) or None
-    if t == "title":
-        return "".join([span.get("plain_text", "") for span in prop.get("title", [])]) or None
-    if t == "formula":
-        f = prop.get("formula", {})
-        typ = f.get("type")
-        if typ == "string":
-            return f.get("string")
-        if typ == "date":
-            d = f.get("date") or {}
-            return d.get("start")
-        return None
-    if t == "relation":
-        return prop.get("relation") or []
-    return None
-
 def check_database_relations(db_name, db_config):
     print(f"\n=== {db_name} データベース ===")
     print(f"DB-ID: {db_config['db_id']}")
@@ -67,9 +47,12 @@ def check_database_relations(db_name, db_config):
     
     try:
         # データベースのページを取得（最大10件）
-        response = notion.databases.query(
-            database_id=db_config['db_id'],
-            page_size=10
+        response = with_retry(
+            lambda: notion.databases.query(
+                database_id=db_config['db_id'],
+                page_size=10
+            ),
+            what="databases.query"
         )
         
         pages = response.get("results", [])
@@ -5,20 +5,19 @@ Notion 日記ページ自動生成ツール
 - 安全のため、DRY_RUN モードで事前確認可能
 """
 
-import os, sys, time, random
+import os, sys
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any, List, Set
 
-try:
-    from notion_client import Client
-    from notion_client.errors import APIResponseError, RequestTimeoutError
-except Exception:
-    print("notion-client がありません。`pip install -r requirements.txt` を実行してください。")
-    sys.exit(1)
-
 from dotenv import load_dotenv
 load_dotenv()
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from notion_common import with_retry, create_client, iter_database_pages, page_exists
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from journal_registry import JournalRegistry
+
 NOTION_TOKEN = os.getenv("NOTION_TOKEN")
 JOURNAL_DB_ID = os.getenv("JOURNAL_DB_ID")
 DRY_RUN = os.getenv("DRY_RUN", "true").lower() in ("1", "true", "yes")  # デフォルトはDRY_RUN
@@ -29,49 +28,9 @@ if not NOTION_TOKEN or not JOURNAL_DB_ID:
     sys.exit(1)
 
 # Notion クライアント
-notion = Client(auth=NOTION_TOKEN, timeout_ms=int(NOTION_TIMEOUT * 1000))
-
-# ---------- リトライ付きAPI呼び出しユーティリティ ----------
-def with_retry(fn, *, max_attempts=4, base_delay=1.0, what="api"):
-    attempt = 0
-    while True:
-        try:
-            return fn()
-        except RequestTimeoutError as e:
-            attempt += 1
-            if attempt >= max_attempts:
-                raise
-            delay = base_delay * (2 ** (attempt-1)) + random.uniform(0, 0.5)
-            print(f"[RETRY] Timeout on {what}. retry {attempt}/{max_attempts} in {delay:.1f}s")
-            time.sleep(delay)
-        except APIResponseError as e:
-            if getattr(e, "code", "") == "rate_limited":
-                attempt += 1
-                retry_after = float(getattr(e, "headers", {}).get("Retry-After", 1)) if hasattr(e, "headers") else 1.0
-                delay = max(retry_after, base_delay * (2 ** (attempt-1))) + random.uniform(0, 0.5)
-                print(f"[RETRY] rate_limited on {what}. retry {attempt}/{max_attempts} in {delay:.1f}s")
-                time.sleep(delay)
-                if attempt < max_attempts:
-                    continue
-            raise
+notion = create_client(NOTION_TOKEN, NOTION_TIMEOUT)
 
 # ---------- データベース操作 ----------
-def iter_database_pages(database_id: str):
-    """データベース内の全ページを取得"""
-    start_cursor = None
-    while True:
-        def _call():
-            payload = {"database_id": database_id, "page_size": 100}
-            if start_cursor:
-                payload["start_cursor"] = start_cursor
-            return notion.databases.query(**payload)
-        res = with_retry(_call, what="databases.query")
-        for r in res.get("results", []):
-            yield r
-        if not res.get("has_more"):
-            break
-        start_cursor = res.get("next_cursor")
-
 def get_page_title(page: Dict[str, Any]) -> Optional[str]:
     """ページのタイトルを取得"""
     props = page.get("properties", {})
@@ -194,7 +153,7 @@ def main():
     
     # 既存ページを取得
     print("既存ページを取得中...")
-    pages = list(iter_database_pages(JOURNAL_DB_ID))
+    pages = list(iter_database_pages(notion, JOURNAL_DB_ID))
     print(f"既存ページ数: {len(pages)}")
     
     # 既存の日付を抽出
@@ -242,6 +201,15 @@ def main():
         print("キャンセルしました。")
         return
     
+    # 作成前にローカル台帳で日付を予約し、link_diary.py との同時実行でも二重作成しない
+    # 台帳にあってもNotion上で削除・アーカイブされたページは作り直す
+    registry = JournalRegistry()
+    registry.record_many(
+        (extract_date_from_title(get_page_title(page)).strftime("%Y-%m%d"), page["id"])
+        for page in pages
+        if get_page_title(page) and extract_date_from_title(get_page_title(page))
+    )
+    
     print(f"\n=== ページ作成の実行 ({len(missing_dates)}件) ===")
     created_count = 0
     error_count = 0
@@ -249,15 +217,19 @@ def main():
     for i, date in enumerate(missing_dates, 1):
         try:
             print(f"[{i}/{len(missing_dates)}] 作成: {date.strftime('%Y-%m-%d')} ({date.strftime('%Y-%m%d')})")
-            result = create_journal_page(date)
+            page_id, created = registry.ensure(
+                date.strftime("%Y-%m%d"), lambda: create_journal_page(date)["id"],
+                verify=lambda page_id: page_exists(notion, page_id),
+            )
+            if not created:
+                print(f"  作成済み（台帳）: {page_id}")
+                continue
             created_count += 1
-            print(f"  成功: {result['id']}")
+            print(f"  成功: {page_id}")
         except Exception as e:
             error_count += 1
             print(f"  エラー: {e}")
         
-        time.sleep(0.2)  # API制限対策
-        
         # 進捗表示（10件ごと）
         if i % 10 == 0:
             print(f"  進捗: {i}/{len(missing_dates)} ({i/len(missing_dates)*100:.1f}%)")
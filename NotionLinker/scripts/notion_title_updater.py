@@ -5,21 +5,17 @@ Notion 日記タイトル一括変更ツール
 - DRY_RUN モードで事前確認可能
 """
 
-import os, sys, time, random
+import os, sys, time
 from datetime import datetime
 from typing import Optional, Dict, Any, List
 import re
 
-try:
-    from notion_client import Client
-    from notion_client.errors import APIResponseError, RequestTimeoutError
-except Exception:
-    print("notion-client がありません。`pip install -r requirements.txt` を実行してください。")
-    sys.exit(1)
-
 from dotenv import load_dotenv
 load_dotenv()
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from notion_common import with_retry, create_client, iter_database_pages
+
 NOTION_TOKEN = os.getenv("NOTION_TOKEN")
 JOURNAL_DB_ID = os.getenv("JOURNAL_DB_ID")
 DRY_RUN = os.getenv("DRY_RUN", "true").lower() in ("1", "true", "yes")  # デフォルトはDRY_RUN
@@ -30,31 +26,7 @@ if not NOTION_TOKEN or not JOURNAL_DB_ID:
     sys.exit(1)
 
 # Notion クライアント
-notion = Client(auth=NOTION_TOKEN, timeout_ms=int(NOTION_TIMEOUT * 1000))
-
-# ---------- リトライ付きAPI呼び出しユーティリティ ----------
-def with_retry(fn, *, max_attempts=4, base_delay=1.0, what="api"):
-    attempt = 0
-    while True:
-        try:
-            return fn()
-        except RequestTimeoutError as e:
-            attempt += 1
-            if attempt >= max_attempts:
-                raise
-            delay = base_delay * (2 ** (attempt-1)) + random.uniform(0, 0.5)
-            print(f"[RETRY] Timeout on {what}. retry {attempt}/{max_attempts} in {delay:.1f}s")
-            time.sleep(delay)
-        except APIResponseError as e:
-            if getattr(e, "code", "") == "rate_limited":
-                attempt += 1
-                retry_after = float(getattr(e, "headers", {}).get("Retry-After", 1)) if hasattr(e, "headers") else 1.0
-                delay = max(retry_after, base_delay * (2 ** (attempt-1))) + random.uniform(0, 0.5)
-                print(f"[RETRY] rate_limited on {what}. retry {attempt}/{max_attempts} in {delay:.1f}s")
-                time.sleep(delay)
-                if attempt < max_attempts:
-                    continue
-            raise
+notion = create_client(NOTION_TOKEN, NOTION_TIMEOUT)
 
 # ---------- タイトル変換関数 ----------
 def convert_title_format(old_title: str) -> str:
@@ -103,22 +75,6 @@ def extract_date_from_title(title: str) -> Optional[str]:
     return None
 
 # ---------- データベース操作 ----------
-def iter_database_pages(database_id: str):
-    """データベース内の全ページを取得"""
-    start_cursor = None
-    while True:
-        def _call():
-            payload = {"database_id": database_id, "page_size": 100}
-            if start_cursor:
-                payload["start_cursor"] = start_cursor
-            return notion.databases.query(**payload)
-        res = with_retry(_call, what="databases.query")
-        for r in res.get("results", []):
-            yield r
-        if not res.get("has_more"):
-            break
-        start_cursor = res.get("next_cursor")
-
 def get_page_title(page: Dict[str, Any]) -> Optional[str]:
     """ページのタイトルを取得"""
     props = page.get("properties", {})
@@ -172,7 +128,7 @@ def main():
     print()
     
     # 全ページを取得
-    pages = list(iter_database_pages(JOURNAL_DB_ID))
+    pages = list(iter_database_pages(notion, JOURNAL_DB_ID))
     if not pages:
         print("対象ページはありません。")
         return
@@ -5,21 +5,17 @@ Notion 重複ページ削除ツール
 - 安全のため、DRY_RUN モードで事前確認可能
 """
 
-import os, sys, time, random
+import os, sys
 from datetime import datetime
 from typing import Optional, Dict, Any, List
 from collections import defaultdict
 
-try:
-    from notion_client import Client
-    from notion_client.errors import APIResponseError, RequestTimeoutError
-except Exception:
-    print("notion-client がありません。`pip install -r requirements.txt` を実行してください。")
-    sys.exit(1)
-
 from dotenv import load_dotenv
 load_dotenv()
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from notion_common import create_client, iter_database_pages, NotionWriter, with_retry
+
 NOTION_TOKEN = os.getenv("NOTION_TOKEN")
 JOURNAL_DB_ID = os.getenv("JOURNAL_DB_ID")
 DRY_RUN = os.getenv("DRY_RUN", "true").lower() in ("1", "true", "yes")  # デフォルトはDRY_RUN
@@ -30,49 +26,9 @@ if not NOTION_TOKEN or not JOURNAL_DB_ID:
     sys.exit(1)
 
 # Notion クライアント
-notion = Client(auth=NOTION_TOKEN, timeout_ms=int(NOTION_TIMEOUT * 1000))
-
-# ---------- リトライ付きAPI呼び出しユーティリティ ----------
-def with_retry(fn, *, max_attempts=4, base_delay=1.0, what="api"):
-    attempt = 0
-    while True:
-        try:
-            return fn()
-        except RequestTimeoutError as e:
-            attempt += 1
-            if attempt >= max_attempts:
-                raise
-            delay = base_delay * (2 ** (attempt-1)) + random.uniform(0, 0.5)
-            print(f"[RETRY] Timeout on {what}. retry {attempt}/{max_attempts} in {delay:.1f}s")
-            time.sleep(delay)
-        except APIResponseError as e:
-            if getattr(e, "code", "") == "rate_limited":
-                attempt += 1
-                retry_after = float(getattr(e, "headers", {}).get("Retry-After", 1)) if hasattr(e, "headers") else 1.0
-                delay = max(retry_after, base_delay * (2 ** (attempt-1))) + random.uniform(0, 0.5)
-                print(f"[RETRY] rate_limited on {what}. retry {attempt}/{max_attempts} in {delay:.1f}s")
-                time.sleep(delay)
-                if attempt < max_attempts:
-                    continue
-            raise
+notion = create_client(NOTION_TOKEN, NOTION_TIMEOUT)
 
 # ---------- データベース操作 ----------
-def iter_database_pages(database_id: str):
-    """データベース内の全ページを取得"""
-    start_cursor = None
-    while True:
-        def _call():
-            payload = {"database_id": database_id, "page_size": 100}
-            if start_cursor:
-                payload["start_cursor"] = start_cursor
-            return notion.databases.query(**payload)
-        res = with_retry(_call, what="databases.query")
-        for r in res.get("results", []):
-            yield r
-        if not res.get("has_more"):
-            break
-        start_cursor = res.get("next_cursor")
-
 def get_page_title(page: Dict[str, Any]) -> Optional[str]:
     """ページのタイトルを取得"""
     props = page.get("properties", {})
@@ -177,7 +133,7 @@ def main():
     
     # 全ページを取得
     print("ページを取得中...")
-    pages = list(iter_database_pages(JOURNAL_DB_ID))
+    pages = list(iter_database_pages(notion, JOURNAL_DB_ID))
     if not pages:
         print("対象ページはありません。")
         return
@@ -248,13 +204,16 @@ def main():
         return
     
     print(f"\n=== 削除の実行 ({len(pages_to_delete)}件) ===")
-    for i, page in enumerate(pages_to_delete, 1):
-        page_id = page["id"]
-        title = get_page_title(page)
-        print(f"[{i}/{len(pages_to_delete)}] 削除: {title} ({page_id})")
-        delete_page(page_id)
-        time.sleep(0.2)  # API制限対策
+    with NotionWriter() as writer:
+        for i, page in enumerate(pages_to_delete, 1):
+            page_id = page["id"]
+            title = get_page_title(page)
+            print(f"[{i}/{len(pages_to_delete)}] 削除: {title} ({page_id})")
+            writer.submit(lambda page_id=page_id: delete_page(page_id), what=f"delete {page_id}")
+        errors = writer.wait()
     
+    if errors:
+        print(f"\n削除に失敗したページ: {len(errors)}件")
     print("\n完了しました。")
 
 if __name__ == "__main__":
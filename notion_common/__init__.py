@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+notion_common - Notion連携ジョブの共通部品
+"""
+
+from .block_cache import BlockCache, get_block_cache
+from .block_diff import block_hash, fetch_block_manifest, plan_block_diff, sync_page_blocks
+from .blocks import (
+    append_blocks,
+    create_page_with_blocks,
+    pack_blocks,
+    split_text_into_chunks,
+    text_to_blocks,
+    text_to_rich_text,
+)
+from .client import (
+    create_client,
+    get_page_blocks,
+    get_prop_val,
+    iter_block_children,
+    iter_database_pages,
+    page_exists,
+    with_retry,
+)
+from .metrics import call_stats, print_call_stats
+from .rate_limit import TokenBucket, get_rate_limiter
+from .writer import NotionWriter
+
+__all__ = [
+    "BlockCache",
+    "get_block_cache",
+    "block_hash",
+    "fetch_block_manifest",
+    "plan_block_diff",
+    "sync_page_blocks",
+    "append_blocks",
+    "create_page_with_blocks",
+    "pack_blocks",
+    "split_text_into_chunks",
+    "text_to_blocks",
+    "text_to_rich_text",
+    "create_client",
+    "get_page_blocks",
+    "get_prop_val",
+    "iter_block_children",
+    "iter_database_pages",
+    "page_exists",
+    "with_retry",
+    "call_stats",
+    "print_call_stats",
+    "TokenBucket",
+    "get_rate_limiter",
+    "NotionWriter",
+]
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+Notion ページ本文のブロック一覧キャッシュ
+
+前回同期したときの本文ブロック（ID・種類・内容ハッシュ）をページごとにSQLiteへ保存し、
+差分更新（block_diff.sync_page_blocks）で blocks.children.list を呼ばずに済むようにします。
+Notion上で手作業で編集したページは、キャッシュを消すか、更新が失敗したときに自動で取り直します。
+
+環境変数:
+  NOTION_BLOCK_CACHE … キャッシュファイルのパス（既定: ~/.cache/notion_block_cache.db）
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+DEFAULT_CACHE_PATH = str(Path.home() / ".cache" / "notion_block_cache.db")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS page_blocks (
+    page_id TEXT PRIMARY KEY,
+    manifest TEXT NOT NULL,
+    synced_at REAL NOT NULL
+);
+"""
+
+
+class BlockCache:
+    """ページID → 本文ブロック一覧（[{id, type, hash}, ...]）の永続キャッシュ"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or DEFAULT_CACHE_PATH
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        # 並列ライタのワーカーからも更新するため、接続は1つをロックで共有する
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(_SCHEMA)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def get(self, page_id: str) -> Optional[List[Dict[str, str]]]:
+        """キャッシュ済みのブロック一覧を取得（未登録ならNone）"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT manifest FROM page_blocks WHERE page_id = ?", (page_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, page_id: str, manifest: List[Dict[str, str]]):
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO page_blocks (page_id, manifest, synced_at) VALUES (?, ?, ?)",
+                (page_id, json.dumps(manifest), time.time()),
+            )
+            self.conn.commit()
+
+    def discard(self, page_id: str):
+        """ページのキャッシュを破棄（差分更新以外で本文を変更したとき）"""
+        with self._lock:
+            self.conn.execute("DELETE FROM page_blocks WHERE page_id = ?", (page_id,))
+            self.conn.commit()
+
+
+_block_cache: Optional[BlockCache] = None
+_block_cache_lock = threading.Lock()
+
+
+def get_block_cache() -> BlockCache:
+    """プロセス内で共有するブロックキャッシュを返す"""
+    global _block_cache
+    with _block_cache_lock:
+        if _block_cache is None:
+            _block_cache = BlockCache(os.getenv("NOTION_BLOCK_CACHE") or None)
+        return _block_cache
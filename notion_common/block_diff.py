@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""
+Notion ページ本文の差分更新
+
+本文を全ブロック削除 → 再追加する代わりに、ローカルで組み立てたブロック列と
+前回同期時のブロック一覧（ID・内容ハッシュ）を比較し、変わったところだけを
+blocks.update / blocks.children.append(after=...) / blocks.delete で反映します。
+
+- 内容ハッシュは rich_text の文字列・装飾・リンクと色などの属性から計算する
+  （rich_text の区切り位置や既定値の有無には左右されない）
+- 同じ種類のブロック同士は削除・追加せずにその場で更新する
+- Notion は先頭への挿入ができないため、先頭に追加が必要な場合は
+  書き換え可能な最初の既存ブロックを先頭ブロックにして挿入位置にする
+"""
+
+import hashlib
+import json
+from difflib import SequenceMatcher
+from typing import Any, Dict, List, Optional, Tuple
+
+from notion_client.errors import APIResponseError
+
+from .block_cache import BlockCache
+from .blocks import append_blocks, pack_blocks
+from .client import iter_block_children, with_retry
+
+# blocks.update で本文を書き換えられるブロックの種類
+UPDATABLE_TYPES = {
+    "paragraph", "heading_1", "heading_2", "heading_3",
+    "bulleted_list_item", "numbered_list_item", "to_do", "toggle",
+    "quote", "callout", "code",
+}
+
+
+def _rich_text_signature(rich_text: List[Dict[str, Any]]) -> List[List[Any]]:
+    """rich_text を比較用に正規化（同じ装飾の隣接要素は連結する）"""
+    merged: List[List[Any]] = []
+    for item in rich_text or []:
+        item_type = item.get("type", "text")
+        if item_type == "text":
+            text = item.get("text") or {}
+            content = text.get("content", "")
+            link = (text.get("link") or {}).get("url")
+        else:
+            content = item.get("plain_text", "")
+            link = item_type
+        annotations = {k: v for k, v in (item.get("annotations") or {}).items() if v and v != "default"}
+        key = [link, sorted(annotations.items())]
+        if merged and merged[-1][0] == key:
+            merged[-1][1] += content
+        else:
+            merged.append([key, content])
+    return merged
+
+
+def block_hash(block: Dict[str, Any]) -> str:
+    """ブロックの内容ハッシュ（ローカルで組み立てたブロックとAPIの応答で同じ値になる）"""
+    block_type = block.get("type", "")
+    body = block.get(block_type) or {}
+    signature: Dict[str, Any] = {"type": block_type}
+    for key, value in body.items():
+        if key == "rich_text":
+            signature[key] = _rich_text_signature(value)
+        elif key == "children":
+            signature[key] = [block_hash(child) for child in value]
+        elif value and value != "default":
+            signature[key] = value
+    if block.get("has_children"):
+        # 子ブロックの中身は取得しないため、子を持つ既存ブロックは常に作り直す
+        signature["has_children"] = True
+    encoded = json.dumps(signature, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(encoded.encode("utf-8")).hexdigest()
+
+
+def _manifest_entry(block_id: str, block: Dict[str, Any], digest: str) -> Dict[str, Any]:
+    block_type = block.get("type", "")
+    entry = {"id": block_id, "type": block_type, "hash": digest}
+    if block.get("has_children") or (block.get(block_type) or {}).get("children"):
+        entry["has_children"] = True
+    return entry
+
+
+def fetch_block_manifest(notion, page_id: str) -> List[Dict[str, Any]]:
+    """ページの現在の本文ブロック一覧（ID・種類・ハッシュ）を取得"""
+    return [_manifest_entry(b["id"], b, block_hash(b)) for b in iter_block_children(notion, page_id)]
+
+
+def _can_update(entry: Dict[str, Any], block: Dict[str, Any]) -> bool:
+    block_type = block.get("type")
+    return (
+        entry["type"] == block_type
+        and block_type in UPDATABLE_TYPES
+        and not entry.get("has_children")
+        and not (block.get(block_type) or {}).get("children")
+    )
+
+
+def _plan(remote: List[Dict[str, Any]], local: List[Dict[str, Any]], hashes: List[str]) -> List[Tuple]:
+    ops: List[Tuple] = []
+    matcher = SequenceMatcher(None, [r["hash"] for r in remote], hashes, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.extend(("keep", remote[i], None, hashes[j]) for i, j in zip(range(i1, i2), range(j1, j2)))
+        elif tag == "delete":
+            ops.extend(("delete", remote[i], None, None) for i in range(i1, i2))
+        elif tag == "insert":
+            ops.extend(("insert", None, local[j], hashes[j]) for j in range(j1, j2))
+        else:
+            for k in range(max(i2 - i1, j2 - j1)):
+                entry = remote[i1 + k] if i1 + k < i2 else None
+                block = local[j1 + k] if j1 + k < j2 else None
+                if entry and block and _can_update(entry, block):
+                    ops.append(("update", entry, block, hashes[j1 + k]))
+                    continue
+                if entry:
+                    ops.append(("delete", entry, None, None))
+                if block:
+                    ops.append(("insert", None, block, hashes[j1 + k]))
+    return ops
+
+
+def plan_block_diff(remote: List[Dict[str, Any]], local: List[Dict[str, Any]]) -> List[Tuple]:
+    """既存ブロック一覧をローカルのブロック列に揃える操作列を返す
+
+    操作は (種類, 既存エントリ, ローカルブロック, ハッシュ) のタプルで、
+    種類は keep / update / insert / delete のいずれか。
+    """
+    hashes = [block_hash(b) for b in local]
+    ops = _plan(remote, local, hashes)
+
+    # 最初に残すブロックより前に挿入があると、挿入位置（after）を指定できない
+    for op in ops:
+        if op[0] in ("keep", "update"):
+            break
+        if op[0] == "insert":
+            if not remote:
+                return ops
+            # 先頭ブロックを書き換えられる最初の既存ブロックを探し、その前は削除する
+            for k, head in enumerate(remote):
+                if head["hash"] == hashes[0]:
+                    first = ("keep", head, None, hashes[0])
+                elif _can_update(head, local[0]):
+                    first = ("update", head, local[0], hashes[0])
+                else:
+                    continue
+                return ([("delete", r, None, None) for r in remote[:k]] + [first]
+                        + _plan(remote[k + 1:], local[1:], hashes[1:]))
+            # 書き換えられるブロックがなければ全体を作り直す
+            return ([("insert", None, b, h) for b, h in zip(local, hashes)]
+                    + [("delete", r, None, None) for r in remote])
+    return ops
+
+
+def apply_block_diff(notion, page_id: str, ops: List[Tuple], *,
+                     what: str = "page body") -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+    """操作列を実行し、更新後のブロック一覧と操作回数を返す"""
+    manifest: List[Dict[str, Any]] = []
+    stats = {"keep": 0, "update": 0, "insert": 0, "delete": 0}
+    anchor: Optional[str] = None
+    pending: List[Tuple[Dict[str, Any], str]] = []
+    deletes: List[str] = []
+
+    def flush():
+        nonlocal anchor, pending
+        if not pending:
+            return
+        created = append_blocks(notion, page_id, [b for b, _ in pending], after=anchor,
+                                what=f"{what} insert")
+        for (block, digest), result in zip(pending, created):
+            manifest.append(_manifest_entry(result["id"], block, digest))
+        if created:
+            anchor = created[-1]["id"]
+        stats["insert"] += len(pending)
+        pending = []
+
+    for kind, entry, block, digest in ops:
+        if kind == "insert":
+            pending.append((block, digest))
+            continue
+        if kind == "delete":
+            deletes.append(entry["id"])
+            continue
+        flush()
+        if kind == "update":
+            block_type = block["type"]
+            body = {k: v for k, v in block[block_type].items() if k != "children"}
+            with_retry(
+                lambda: notion.blocks.update(block_id=entry["id"], **{block_type: body}),
+                what=f"{what} update",
+            )
+            entry = _manifest_entry(entry["id"], block, digest)
+        manifest.append(dict(entry, hash=digest))
+        stats[kind] += 1
+        anchor = entry["id"]
+    flush()
+
+    for block_id in deletes:
+        with_retry(lambda: notion.blocks.delete(block_id=block_id), what=f"{what} delete")
+        stats["delete"] += 1
+    return manifest, stats
+
+
+def sync_page_blocks(notion, page_id: str, blocks: List[Dict[str, Any]], *,
+                     cache: Optional[BlockCache] = None, what: str = "page body") -> Dict[str, int]:
+    """ページ本文をブロック列に揃える（変わったブロックだけを更新・追加・削除）
+
+    cache を渡すと前回のブロック一覧を使って blocks.children.list を省略する。
+    キャッシュが古く更新に失敗した場合は、一覧を取り直して1回だけやり直す。
+    """
+    blocks = pack_blocks(blocks)
+    manifest = cache.get(page_id) if cache else None
+    from_cache = manifest is not None
+    if manifest is None:
+        manifest = fetch_block_manifest(notion, page_id)
+
+    try:
+        new_manifest, stats = apply_block_diff(notion, page_id, plan_block_diff(manifest, blocks), what=what)
+    except APIResponseError as e:
+        if cache:
+            cache.discard(page_id)
+        if not from_cache:
+            raise
+        print(f"[INFO] ブロックキャッシュが古いため本文を取り直します: {page_id} ({getattr(e, 'code', e)})")
+        manifest = fetch_block_manifest(notion, page_id)
+        new_manifest, stats = apply_block_diff(notion, page_id, plan_block_diff(manifest, blocks), what=what)
+
+    if cache:
+        cache.put(page_id, new_manifest)
+    return stats
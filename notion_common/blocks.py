@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+"""
+Notion ブロック組み立て・一括追加
+
+Notion API の制限に合わせて本文をブロックに詰め込み、最小回数の呼び出しで書き込みます。
+
+- rich_text の1要素は 2,000 文字まで（文・改行の区切りで分割）
+- 1ブロックの rich_text 配列は 100 要素まで
+- blocks.children.append / pages.create の children は 1 回 100 ブロックまで
+- 1 リクエストのペイロードは 500KB まで（余裕を持って REQUEST_MAX_BYTES で区切る）
+"""
+
+import copy
+import json
+import re
+from typing import Any, Dict, Iterator, List, Optional
+
+from .client import with_retry
+
+RICH_TEXT_MAX_CHARS = 2000
+RICH_TEXT_MAX_ITEMS = 100
+BLOCKS_PER_REQUEST = 100
+REQUEST_MAX_BYTES = 450_000
+
+# 文・改行の区切り（区切り文字は直前の文に含める）
+_SENTENCE_SPLIT = re.compile(r"([。！？!?\n])")
+
+
+def text_length(text: str) -> int:
+    """Notion が数える文字数（UTF-16 のコード単位数。絵文字は2文字になる）"""
+    return len(text.encode("utf-16-le")) // 2
+
+
+def _hard_split(text: str, max_chars: int) -> List[str]:
+    """区切りのない長い文を max_chars ごとに切る"""
+    pieces = []
+    current = []
+    current_len = 0
+    for ch in text:
+        n = 2 if ord(ch) > 0xFFFF else 1
+        if current_len + n > max_chars:
+            pieces.append("".join(current))
+            current, current_len = [], 0
+        current.append(ch)
+        current_len += n
+    if current:
+        pieces.append("".join(current))
+    return pieces
+
+
+def split_text_into_chunks(text: str, max_chars: int = RICH_TEXT_MAX_CHARS) -> List[str]:
+    """テキストを文・改行の区切りで max_chars 以下のチャンクに分割
+
+    チャンクを連結すると元のテキストに戻る（改行や空白は削らない）。
+    """
+    if not text:
+        return []
+    if text_length(text) <= max_chars:
+        return [text]
+
+    parts = _SENTENCE_SPLIT.split(text)
+    sentences = ["".join(parts[i:i + 2]) for i in range(0, len(parts), 2)]
+
+    chunks = []
+    current = ""
+    current_len = 0
+    for sentence in sentences:
+        if not sentence:
+            continue
+        n = text_length(sentence)
+        if current_len + n <= max_chars:
+            current += sentence
+            current_len += n
+            continue
+        if current:
+            chunks.append(current)
+            current, current_len = "", 0
+        if n > max_chars:
+            pieces = _hard_split(sentence, max_chars)
+            chunks.extend(pieces[:-1])
+            current = pieces[-1]
+            current_len = text_length(current)
+        else:
+            current, current_len = sentence, n
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _json_size(obj: Any) -> int:
+    return len(json.dumps(obj))
+
+
+def text_to_rich_text(text: str, annotations: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """テキストを 2,000 文字以下の rich_text 要素の配列にする"""
+    items = []
+    for chunk in split_text_into_chunks(text):
+        item: Dict[str, Any] = {"type": "text", "text": {"content": chunk}}
+        if annotations:
+            item["annotations"] = dict(annotations)
+        items.append(item)
+    return items
+
+
+def _split_rich_text_item(item: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """上限を超える text 要素を、装飾やリンクを保ったまま複数に分ける"""
+    if item.get("type", "text") != "text":
+        return [item]
+    content = item.get("text", {}).get("content", "")
+    if text_length(content) <= RICH_TEXT_MAX_CHARS:
+        return [item]
+    items = []
+    for chunk in split_text_into_chunks(content):
+        new_item = copy.deepcopy(item)
+        new_item["text"]["content"] = chunk
+        new_item.pop("plain_text", None)
+        items.append(new_item)
+    return items
+
+
+def _group_rich_text(items: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """rich_text 要素を 1 ブロックに収まる単位（要素数・バイト数）でまとめる"""
+    groups: List[List[Dict[str, Any]]] = []
+    current: List[Dict[str, Any]] = []
+    current_size = 0
+    for item in items:
+        size = _json_size(item)
+        if current and (len(current) >= RICH_TEXT_MAX_ITEMS or current_size + size > REQUEST_MAX_BYTES):
+            groups.append(current)
+            current, current_size = [], 0
+        current.append(item)
+        current_size += size
+    if current:
+        groups.append(current)
+    return groups
+
+
+def pack_blocks(blocks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """ブロック配列を Notion の制限内に収める
+
+    2,000 文字を超える rich_text 要素は分割し、要素数が 100 を超えるブロックは
+    同じ種類のブロックに分ける。子ブロック（children）は再帰的に処理する。
+    """
+    packed = []
+    for block in blocks:
+        block_type = block.get("type")
+        body = block.get(block_type) if block_type else None
+        if not isinstance(body, dict):
+            packed.append(block)
+            continue
+
+        if body.get("children"):
+            body = dict(body, children=pack_blocks(body["children"]))
+            block = dict(block, **{block_type: body})
+
+        rich_text = body.get("rich_text")
+        if not rich_text:
+            packed.append(block)
+            continue
+
+        items = []
+        for item in rich_text:
+            items.extend(_split_rich_text_item(item))
+        groups = _group_rich_text(items)
+        for i, group in enumerate(groups):
+            new_body = dict(body, rich_text=group)
+            # 子ブロックは分割後の最後のブロックに付ける
+            if i < len(groups) - 1:
+                new_body.pop("children", None)
+            packed.append(dict(block, **{block_type: new_body}))
+    return packed
+
+
+def text_to_blocks(text: str, block_type: str = "paragraph") -> List[Dict[str, Any]]:
+    """テキストを最小数のブロック（既定は段落）に詰める"""
+    blocks = []
+    for group in _group_rich_text(text_to_rich_text(text)):
+        blocks.append({
+            "object": "block",
+            "type": block_type,
+            block_type: {"rich_text": group},
+        })
+    return blocks
+
+
+def iter_block_batches(blocks: List[Dict[str, Any]],
+                       max_blocks: int = BLOCKS_PER_REQUEST) -> Iterator[List[Dict[str, Any]]]:
+    """1 リクエストで送れる単位（ブロック数・バイト数）にまとめて返す"""
+    batch: List[Dict[str, Any]] = []
+    batch_size = 0
+    for block in blocks:
+        size = _json_size(block)
+        if batch and (len(batch) >= max_blocks or batch_size + size > REQUEST_MAX_BYTES):
+            yield batch
+            batch, batch_size = [], 0
+        batch.append(block)
+        batch_size += size
+    if batch:
+        yield batch
+
+
+def append_blocks(notion, block_id: str, blocks: List[Dict[str, Any]], *,
+                  after: Optional[str] = None, what: str = "blocks.children.append") -> List[Dict[str, Any]]:
+    """ブロックを最小回数の blocks.children.append で追加し、作成されたブロックを返す
+
+    after を指定するとそのブロックの直後に挿入する（2 回目以降は直前に追加した末尾の後ろ）。
+    """
+    created: List[Dict[str, Any]] = []
+    for batch in iter_block_batches(pack_blocks(blocks)):
+        payload: Dict[str, Any] = {"block_id": block_id, "children": batch}
+        if after:
+            payload["after"] = after
+        res = with_retry(lambda: notion.blocks.children.append(**payload), what=what)
+        results = res.get("results", [])
+        created.extend(results)
+        if after and results:
+            after = results[-1]["id"]
+    return created
+
+
+def create_page_with_blocks(notion, parent: Dict[str, Any], properties: Dict[str, Any],
+                            blocks: List[Dict[str, Any]], *, what: str = "pages.create",
+                            **kwargs) -> Dict[str, Any]:
+    """本文付きでページを作成（最初の 100 ブロックは pages.create に含め、残りを追加）"""
+    batches = list(iter_block_batches(pack_blocks(blocks)))
+    first = batches[0] if batches else []
+    page = with_retry(
+        lambda: notion.pages.create(parent=parent, properties=properties, children=first, **kwargs),
+        what=what,
+    )
+    for batch in batches[1:]:
+        with_retry(
+            lambda: notion.blocks.children.append(block_id=page["id"], children=batch),
+            what="blocks.children.append",
+        )
+    return page
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""
+Notion クライアント共通ユーティリティ
+
+各スクリプトにコピーされていた with_retry / iter_database_pages /
+get_prop_val / get_page_blocks をここに集約します。
+
+- create_client: トークンごとに1つのHTTPセッション（keep-alive）を使い回す
+- with_retry: 共有レート制限 + Retry-After 対応 + 一時的エラーの指数バックオフ
+- iter_database_pages / iter_block_children: ページネーションのジェネレータ
+- 呼び出し回数とレイテンシは metrics.call_stats に記録される
+"""
+
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+import httpx
+from notion_client import Client
+from notion_client.errors import APIResponseError, RequestTimeoutError
+
+from .metrics import call_stats
+from .rate_limit import get_rate_limiter
+
+# 再試行する一時的なエラー（レート制限以外）
+TRANSIENT_ERROR_CODES = {
+    "internal_server_error",
+    "service_unavailable",
+    "database_connection_unavailable",
+    "gateway_timeout",
+    "conflict_error",
+}
+
+_clients: Dict[str, Client] = {}
+_clients_lock = threading.Lock()
+
+
+def create_client(token: str, timeout: Optional[float] = None) -> Client:
+    """Notionクライアントを返す（同じトークンならHTTPセッションを共有）"""
+    timeout = timeout if timeout is not None else float(os.getenv("NOTION_TIMEOUT", "60"))
+    with _clients_lock:
+        client = _clients.get(token)
+        if client is None:
+            max_workers = int(os.getenv("NOTION_MAX_WORKERS", "3"))
+            session = httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=max_workers + 2,
+                    max_keepalive_connections=max_workers + 2,
+                    keepalive_expiry=60,
+                ),
+            )
+            client = Client(auth=token, timeout_ms=int(timeout * 1000), client=session)
+            _clients[token] = client
+        return client
+
+
+def _retry_after(e: APIResponseError) -> float:
+    headers = getattr(e, "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After", 1))
+    except (TypeError, ValueError):
+        return 1.0
+
+
+def with_retry(fn, *, max_attempts=4, base_delay=1.0, what="api"):
+    """リトライ付きAPI呼び出し
+
+    - 呼び出し前に共有トークンバケットからトークンを取得
+    - rate_limited は Retry-After の間、全ジョブの送信を止めてから再試行
+    - タイムアウト・接続エラー・5xx は指数バックオフ（ジッター付き）で再試行
+    """
+    limiter = get_rate_limiter()
+    attempt = 0
+    while True:
+        limiter.acquire()
+        started = time.monotonic()
+        try:
+            result = fn()
+            call_stats.record(what, time.monotonic() - started)
+            return result
+        except (RequestTimeoutError, httpx.TransportError) as e:
+            call_stats.record(what, time.monotonic() - started, ok=False)
+            attempt += 1
+            if attempt >= max_attempts:
+                raise
+            delay = base_delay * (2 ** (attempt - 1)) + random.uniform(0, 0.5)
+            print(f"[RETRY] {type(e).__name__} on {what}. retry {attempt}/{max_attempts} in {delay:.1f}s")
+            call_stats.record_retry(what)
+            time.sleep(delay)
+        except APIResponseError as e:
+            call_stats.record(what, time.monotonic() - started, ok=False)
+            code = getattr(e, "code", "")
+            if code == "rate_limited":
+                attempt += 1
+                if attempt >= max_attempts:
+                    raise
+                delay = max(_retry_after(e), base_delay * (2 ** (attempt - 1))) + random.uniform(0, 0.5)
+                print(f"[RETRY] rate_limited on {what}. retry {attempt}/{max_attempts} in {delay:.1f}s")
+                call_stats.record_retry(what)
+                # 同じトークンを使う全ジョブをRetry-Afterの間止める
+                limiter.block_for(delay)
+                continue
+            if code in TRANSIENT_ERROR_CODES:
+                attempt += 1
+                if attempt >= max_attempts:
+                    raise
+                delay = base_delay * (2 ** (attempt - 1)) + random.uniform(0, 0.5)
+                print(f"[RETRY] {code} on {what}. retry {attempt}/{max_attempts} in {delay:.1f}s")
+                call_stats.record_retry(what)
+                time.sleep(delay)
+                continue
+            raise
+
+
+def iter_database_pages(notion: Client, database_id: str,
+                        filter_obj: Optional[Dict[str, Any]] = None,
+                        sorts: Optional[List[Dict[str, Any]]] = None,
+                        page_size: int = 100) -> Iterator[Dict[str, Any]]:
+    """データベースの全ページを順に返す"""
+    start_cursor = None
+    while True:
+        payload: Dict[str, Any] = {"database_id": database_id, "page_size": page_size}
+        if filter_obj:
+            payload["filter"] = filter_obj
+        if sorts:
+            payload["sorts"] = sorts
+        if start_cursor:
+            payload["start_cursor"] = start_cursor
+        res = with_retry(lambda: notion.databases.query(**payload), what="databases.query")
+        for r in res.get("results", []):
+            yield r
+        if not res.get("has_more"):
+            break
+        start_cursor = res.get("next_cursor")
+
+
+def iter_block_children(notion: Client, block_id: str, page_size: int = 100) -> Iterator[Dict[str, Any]]:
+    """ブロック（ページ）の子ブロックを順に返す"""
+    start_cursor = None
+    while True:
+        payload: Dict[str, Any] = {"block_id": block_id, "page_size": page_size}
+        if start_cursor:
+            payload["start_cursor"] = start_cursor
+        res = with_retry(lambda: notion.blocks.children.list(**payload), what="blocks.children.list")
+        for r in res.get("results", []):
+            yield r
+        if not res.get("has_more"):
+            break
+        start_cursor = res.get("next_cursor")
+
+
+def get_page_blocks(notion: Client, page_id: str) -> List[Dict[str, Any]]:
+    """ページの全ブロックを取得"""
+    return list(iter_block_children(notion, page_id))
+
+
+def page_exists(notion: Client, page_id: str) -> bool:
+    """ページがNotion上で削除・アーカイブされていないか"""
+    try:
+        page = with_retry(lambda: notion.pages.retrieve(page_id=page_id), what="pages.retrieve")
+    except APIResponseError as e:
+        if getattr(e, "code", "") == "object_not_found":
+            return False
+        raise
+    return not (page.get("archived") or page.get("in_trash"))
+
+
+def get_prop_val(prop: Dict[str, Any]) -> Optional[Any]:
+    """プロパティ値の取得"""
+    t = prop.get("type")
+    if t == "date":
+        v = prop.get("date")
+        return v.get("start") if v else None
+    if t == "rich_text":
+        return "".join([span.get("plain_text", "") for span in prop.get("rich_text", [])]) or None
+    if t == "title":
+        return "".join([span.get("plain_text", "") for span in prop.get("title", [])]) or None
+    if t == "number":
+        return prop.get("number")
+    if t == "checkbox":
+        return prop.get("checkbox")
+    if t in ("select", "status"):
+        s = prop.get(t)
+        return s.get("name") if s else None
+    if t == "multi_select":
+        return [option.get("name") for option in prop.get("multi_select", [])]
+    if t == "url":
+        return prop.get("url")
+    if t in ("created_time", "last_edited_time"):
+        return prop.get(t)
+    if t == "formula":
+        f = prop.get("formula", {})
+        typ = f.get("type")
+        if typ == "string":
+            return f.get("string")
+        if typ == "number":
+            return f.get("number")
+        if typ == "boolean":
+            return f.get("boolean")
+        if typ == "date":
+            d = f.get("date") or {}
+            return d.get("start")
+        return None
+    if t == "relation":
+        return prop.get("relation") or []
+    return None
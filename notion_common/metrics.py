@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+Notion API 呼び出し統計
+
+with_retry を通った呼び出しを種類（what）ごとに数え、レイテンシの分布を記録します。
+ジョブの最後に print_call_stats() を呼ぶと、どのAPIに時間がかかったかを確認できます。
+"""
+
+import threading
+from bisect import bisect_left
+from typing import Dict, List
+
+# レイテンシのヒストグラム境界（秒）
+LATENCY_BUCKETS = [0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0]
+
+
+class CallStats:
+    """API呼び出し回数・リトライ回数・レイテンシ分布の集計"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self.retries: Dict[str, int] = {}
+        self.total_time: Dict[str, float] = {}
+        self.histogram: Dict[str, List[int]] = {}
+
+    def record(self, what: str, elapsed: float, ok: bool = True):
+        with self._lock:
+            self.calls[what] = self.calls.get(what, 0) + 1
+            self.total_time[what] = self.total_time.get(what, 0.0) + elapsed
+            if not ok:
+                self.errors[what] = self.errors.get(what, 0) + 1
+            buckets = self.histogram.setdefault(what, [0] * (len(LATENCY_BUCKETS) + 1))
+            buckets[bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+
+    def record_retry(self, what: str):
+        with self._lock:
+            self.retries[what] = self.retries.get(what, 0) + 1
+
+    def total_calls(self) -> int:
+        with self._lock:
+            return sum(self.calls.values())
+
+    def reset(self):
+        with self._lock:
+            self.calls.clear()
+            self.errors.clear()
+            self.retries.clear()
+            self.total_time.clear()
+            self.histogram.clear()
+
+    def summary(self) -> str:
+        """集計結果を表形式の文字列で返す"""
+        with self._lock:
+            if not self.calls:
+                return "Notion API 呼び出し: 0件"
+            labels = [f"<{b}s" for b in LATENCY_BUCKETS] + [f">={LATENCY_BUCKETS[-1]}s"]
+            lines = [f"Notion API 呼び出し: {sum(self.calls.values())}件"]
+            for what in sorted(self.calls, key=lambda w: -self.total_time[w]):
+                count = self.calls[what]
+                avg = self.total_time[what] / count
+                dist = " ".join(
+                    f"{label}:{n}" for label, n in zip(labels, self.histogram[what]) if n
+                )
+                lines.append(
+                    f"  {what}: {count}件 平均{avg:.2f}s 合計{self.total_time[what]:.1f}s"
+                    f" リトライ{self.retries.get(what, 0)} エラー{self.errors.get(what, 0)} [{dist}]"
+                )
+            return "\n".join(lines)
+
+
+call_stats = CallStats()
+
+
+def print_call_stats():
+    print(call_stats.summary())
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+Notion API 共有レート制限（トークンバケット）
+
+同じマシンで動く全ジョブ（ChatGPTToNotion / NotionLinker / scripts）が
+1つの状態ファイルをファイルロック越しに共有し、合計でNotionの
+約3リクエスト/秒の枠を超えないようにします。
+429応答の Retry-After は全プロセスに伝わります。
+
+環境変数:
+  NOTION_RATE_LIMIT  … 1秒あたりのリクエスト数（既定: 3）
+  NOTION_RATE_BURST  … バケット容量（既定: 3）
+  NOTION_RATE_STATE  … 状態ファイルのパス（既定: ~/.cache/notion_rate_limit.json）
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windowsなど。プロセス内の排他のみで動作する
+    fcntl = None
+
+DEFAULT_STATE_PATH = str(Path.home() / ".cache" / "notion_rate_limit.json")
+
+
+class TokenBucket:
+    """ファイルで状態を共有するトークンバケット"""
+
+    def __init__(self, rate: float = 3.0, capacity: float = 3.0, state_path: Optional[str] = None):
+        self.rate = rate
+        self.capacity = capacity
+        self.state_path = state_path or DEFAULT_STATE_PATH
+        self._lock = threading.Lock()
+        Path(self.state_path).parent.mkdir(parents=True, exist_ok=True)
+
+    @contextmanager
+    def _locked_state(self):
+        """プロセス間ロックを取得して状態を読み書きする"""
+        with self._lock:
+            with open(self.state_path, "a+", encoding="utf-8") as f:
+                if fcntl:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                try:
+                    f.seek(0)
+                    try:
+                        state = json.loads(f.read() or "{}")
+                    except ValueError:
+                        state = {}
+                    yield state
+                    f.seek(0)
+                    f.truncate()
+                    f.write(json.dumps(state))
+                    f.flush()
+                finally:
+                    if fcntl:
+                        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _refill(self, state: dict, now: float) -> float:
+        tokens = state.get("tokens", self.capacity)
+        updated = state.get("updated", now)
+        elapsed = max(0.0, now - updated)
+        tokens = min(self.capacity, tokens + elapsed * self.rate)
+        state["updated"] = now
+        return tokens
+
+    def acquire(self):
+        """トークンを1つ取得（空なら補充されるまで待つ）"""
+        while True:
+            with self._locked_state() as state:
+                now = time.time()
+                tokens = self._refill(state, now)
+                blocked_until = state.get("blocked_until", 0.0)
+                if now >= blocked_until and tokens >= 1:
+                    state["tokens"] = tokens - 1
+                    return
+                state["tokens"] = tokens
+                wait = max(blocked_until - now, (1 - tokens) / self.rate)
+            time.sleep(max(wait, 0.01))
+
+    def block_for(self, seconds: float):
+        """Retry-After を受けたとき、全プロセスの送信を指定秒数止める"""
+        with self._locked_state() as state:
+            now = time.time()
+            state["tokens"] = 0.0
+            state["updated"] = now
+            state["blocked_until"] = max(state.get("blocked_until", 0.0), now + seconds)
+
+
+_rate_limiter: Optional[TokenBucket] = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> TokenBucket:
+    """プロセス内で共有するレートリミッタを返す"""
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            _rate_limiter = TokenBucket(
+                rate=float(os.getenv("NOTION_RATE_LIMIT", "3")),
+                capacity=float(os.getenv("NOTION_RATE_BURST", "3")),
+                state_path=os.getenv("NOTION_RATE_STATE") or None,
+            )
+        return _rate_limiter
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+Notion 並列ライタ
+
+固定の time.sleep で間隔を空ける代わりに、少数のワーカースレッドで
+書き込みを並列に送り、送信ペースは共有トークンバケットで調整します。
+未処理タスク数に上限があるため、呼び出し側が大量に投入してもメモリは増えません。
+
+環境変数:
+  NOTION_MAX_WORKERS … ワーカー数（既定: 3）
+"""
+
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Tuple
+
+
+class NotionWriter:
+    """上限付きワーカープールでNotionへの書き込みを並列実行する"""
+
+    def __init__(self, max_workers: Optional[int] = None, max_pending: Optional[int] = None):
+        self.max_workers = max_workers or int(os.getenv("NOTION_MAX_WORKERS", "3"))
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="notion-writer")
+        self._slots = threading.BoundedSemaphore(max_pending or self.max_workers * 2)
+        self._errors: List[Tuple[str, BaseException]] = []
+        self._errors_lock = threading.Lock()
+        self._futures: List[Future] = []
+
+    def submit(self, fn: Callable[[], Any], *, what: str = "api") -> Future:
+        """タスクを投入（未処理が上限に達している間はブロック）"""
+        self._slots.acquire()
+
+        def _run():
+            try:
+                return fn()
+            except BaseException as e:
+                with self._errors_lock:
+                    self._errors.append((what, e))
+                print(f"[ERROR] {what}: {e}")
+                raise
+            finally:
+                self._slots.release()
+
+        future = self._executor.submit(_run)
+        self._futures = [f for f in self._futures if not f.done()]
+        self._futures.append(future)
+        return future
+
+    def wait(self) -> List[Tuple[str, BaseException]]:
+        """投入済みタスクの完了を待ち、失敗したタスクの一覧を返す"""
+        for future in list(self._futures):
+            try:
+                future.result()
+            except BaseException:
+                pass
+        self._futures = []
+        with self._errors_lock:
+            errors, self._errors = self._errors, []
+        return errors
+
+    def close(self):
+        self.wait()
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
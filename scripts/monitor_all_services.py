@@ -11,6 +11,9 @@ import time
 import json
 import subprocess
 import logging
+import threading
+import plistlib
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
 from pathlib import Path
 import smtplib
@@ -32,6 +35,14 @@ class ServiceMonitor:
         self.notify_success = bool(notif_cfg.get('notify_success', True))
         self.notification_cooldown_seconds = int(notif_cfg.get('cooldown_seconds', 0) or 0)
         self._last_notify_times = {}  # key: subject -> datetime
+        self._notify_lock = threading.Lock()
+        # 並行チェック・タイムアウト設定
+        monitoring_cfg = self.config.get('monitoring', {})
+        self.max_workers = int(monitoring_cfg.get('max_workers', 8))
+        self.command_timeout = float(monitoring_cfg.get('command_timeout_seconds', 10))
+        self.check_timeout = float(monitoring_cfg.get('check_timeout_seconds', 60))
+        self.restart_ready_timeout = float(monitoring_cfg.get('restart_ready_timeout_seconds', 15))
+        self.restart_poll_interval = float(monitoring_cfg.get('restart_poll_interval_seconds', 0.5))
         self.services = {
             'heteml_monitor': {
                 'name': 'HETEMLMonitor',
@@ -64,6 +75,9 @@ class ServiceMonitor:
         }
         # 無効化サービス（設定ファイルから）
         self.disabled_services = set(self.config.get('disabled_services', []))
+        # チェックは共有のスレッドプールで行い、前回のチェック（復旧処理を含む）が終わるまで再投入しない
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='service-check')
+        self.running = {}  # key: service_key -> Future
     
     def _setup_logger(self):
         """ロガーの設定"""
@@ -127,7 +141,8 @@ class ServiceMonitor:
                 ['launchctl', 'print', f'gui/{uid}/{label}'],
                 capture_output=True,
                 text=True,
-                shell=False
+                shell=False,
+                timeout=self.command_timeout
             )
             
             if result.returncode == 0:
@@ -147,6 +162,24 @@ class ServiceMonitor:
             self.logger.error(f"launchd service check error for {service_name}: {e}")
             return 'error'
     
+    def wait_for_launchd_status(self, service_name, plist_name, accepted, timeout):
+        """launchdサービスが accepted のいずれかの状態になるまで待つ（最後に確認した状態を返す）"""
+        deadline = time.monotonic() + timeout
+        while True:
+            status = self.check_launchd_service(service_name, plist_name)
+            if status in accepted or time.monotonic() >= deadline:
+                return status
+            time.sleep(self.restart_poll_interval)
+    
+    def keeps_alive(self, plist_path):
+        """plistで KeepAlive が有効か（常駐するジョブか）"""
+        try:
+            with open(plist_path, 'rb') as f:
+                return bool(plistlib.load(f).get('KeepAlive', False))
+        except Exception as e:
+            self.logger.warning(f"plist read error ({plist_path}): {e}")
+            return False
+    
     def check_log_files(self, service_name, log_dir, log_glob: str | None = None):
         """ログファイルの確認"""
         try:
@@ -216,15 +249,16 @@ class ServiceMonitor:
             # サービスを停止
             unload_result = subprocess.run(
                 ['launchctl', 'unload', str(plist_path)], 
-                capture_output=True, text=True
+                capture_output=True, text=True, timeout=self.command_timeout
             )
             self.logger.info(f"Unload result for {service_name}: {unload_result.returncode}")
-            time.sleep(2)
+            # 固定時間待つ代わりに、launchdから外れる（launchctl print が失敗する）まで待つ
+            self.wait_for_launchd_status(service_name, plist_name, {'error'}, self.restart_ready_timeout)
             
             # サービスを開始
             load_result = subprocess.run(
                 ['launchctl', 'load', str(plist_path)], 
-                capture_output=True, text=True
+                capture_output=True, text=True, timeout=self.command_timeout
             )
             
             if load_result.returncode == 0:
@@ -247,14 +281,18 @@ class ServiceMonitor:
             self.logger.debug(f"Skip success notification by setting: {subject}")
             return
 
-        # クールダウン（同一件名の連投抑止）
-        if self.notification_cooldown_seconds > 0:
-            last = self._last_notify_times.get(subject)
-            if last is not None:
-                delta = (datetime.now() - last).total_seconds()
-                if delta < self.notification_cooldown_seconds:
-                    self.logger.info(f"Skip notification by cooldown ({int(delta)}s < {self.notification_cooldown_seconds}s): {subject}")
-                    return
+        # クールダウン（同一件名の連投抑止）。並行チェックから呼ばれるため判定と記録はロック内で行う
+        with self._notify_lock:
+            if self.notification_cooldown_seconds > 0:
+                last = self._last_notify_times.get(subject)
+                if last is not None:
+                    delta = (datetime.now() - last).total_seconds()
+                    if delta < self.notification_cooldown_seconds:
+                        self.logger.info(f"Skip notification by cooldown ({int(delta)}s < {self.notification_cooldown_seconds}s): {subject}")
+                        return
+            # 送信中に同じ件名が重複して送られないよう先に記録する
+            previous = self._last_notify_times.get(subject)
+            self._last_notify_times[subject] = datetime.now()
 
         try:
             email_config = self.config['email']
@@ -272,11 +310,15 @@ class ServiceMonitor:
                 server.send_message(msg)
             
             self.logger.info(f"Notification sent: {subject}")
-            # 記録
-            self._last_notify_times[subject] = datetime.now()
             
         except Exception as e:
             self.logger.error(f"Notification error: {e}")
+            # 送信できなかった場合は記録を戻す（次回は送信を試みる）
+            with self._notify_lock:
+                if previous is None:
+                    self._last_notify_times.pop(subject, None)
+                else:
+                    self._last_notify_times[subject] = previous
     
     def check_service(self, service_key, service_info):
         """個別サービスの確認"""
@@ -335,10 +377,6 @@ class ServiceMonitor:
                 else:
                     status = 'unknown'
         
-        # 状態の更新
-        self.services[service_key]['status'] = status
-        self.services[service_key]['last_check'] = datetime.now()
-        
         # MovableTypeRebuilder は毎月1日以外は通知・復旧対象外（非実行が正常）
         if service_name == 'MovableTypeRebuilder' and datetime.now().day != 1:
             return {
@@ -354,10 +392,13 @@ class ServiceMonitor:
             
             # 自動復旧の実行
             if self.restart_service(service_name, plist_name, plist_path):
-                # 再起動後の確認
-                time.sleep(5)
-                new_status = self.check_launchd_service(service_name, plist_name)
-                if new_status == 'running':
+                # 再起動後の確認（起動するまで短い間隔で確認する）
+                # KeepAlive のないスケジュール型ジョブは次の予定時刻まで動かないので、読み込まれていればよい
+                ready = {'running'} if self.keeps_alive(plist_path) else {'running', 'stopped'}
+                new_status = self.wait_for_launchd_status(
+                    service_name, plist_name, ready, self.restart_ready_timeout
+                )
+                if new_status in ready:
                     self.logger.info(f"{service_name} recovered successfully")
                     self.send_notification(
                         f"{service_name} 自動復旧完了",
@@ -387,30 +428,99 @@ class ServiceMonitor:
             'overall_status': status
         }
     
+    def _submit(self, service_key):
+        """サービスのチェックをスレッドで開始する（前回が終わっていなければ見送り None を返す）"""
+        future = self.running.get(service_key)
+        if future is not None and not future.done():
+            self.logger.warning(
+                f"{self.services[service_key]['name']} previous check is still running, skipping this cycle"
+            )
+            return None
+        future = self.executor.submit(self.check_service, service_key, self.services[service_key])
+        self.running[service_key] = future
+        return future
+    
+    def _record_result(self, service_key, result):
+        """チェック結果をサービスの状態に反映する（監視サイクルのスレッドだけが更新する）"""
+        self.services[service_key]['status'] = result['overall_status']
+        self.services[service_key]['last_check'] = datetime.now()
+        return result
+    
+    def _timeout_result(self, service_key, service_info):
+        """チェックが時間内に終わらなかったサービスの結果"""
+        self.logger.error(f"{service_info['name']} check timed out ({self.check_timeout:.0f}s)")
+        return self._record_result(service_key, {
+            'service': service_info['name'],
+            'launchd_status': 'unknown',
+            'log_status': {'status': 'timeout', 'message': 'チェックがタイムアウトしました'},
+            'overall_status': 'timeout'
+        })
+    
+    def _busy_result(self, service_key, service_info):
+        """前回のチェックがまだ終わっていないサービスの結果（次のサイクルでまた確認する）"""
+        self.services[service_key]['status'] = 'timeout'
+        return {
+            'service': service_info['name'],
+            'launchd_status': 'unknown',
+            'log_status': {'status': 'timeout', 'message': '前回のチェックが終わっていません'},
+            'overall_status': 'timeout'
+        }
+    
     def run_monitoring_cycle(self):
-        """監視サイクルの実行"""
+        """監視サイクルの実行（対象サービスを並行にチェックする）"""
         self.logger.info("Starting monitoring cycle...")
         
-        results = []
+        results = {}
+        due = []
         current_time = datetime.now()
         
         for service_key, service_info in self.services.items():
             # 監視無効化チェック
             if service_info['name'] in self.disabled_services or service_key in self.disabled_services:
                 self.logger.info(f"Skip disabled service: {service_info['name']}")
-                results.append({
+                results[service_key] = {
                     'service': service_info['name'],
                     'launchd_status': 'disabled',
                     'log_status': {'status': 'skipped', 'message': '監視対象外'},
                     'overall_status': 'disabled'
-                })
+                }
                 continue
             # チェック間隔の確認
             if (service_info['last_check'] is None or 
                 (current_time - service_info['last_check']).total_seconds() >= service_info['check_interval']):
-                
-                result = self.check_service(service_key, service_info)
-                results.append(result)
+                due.append(service_key)
+        
+        if due:
+            futures = {}
+            for service_key in due:
+                future = self._submit(service_key)
+                if future is None:
+                    results[service_key] = self._busy_result(service_key, self.services[service_key])
+                else:
+                    futures[future] = service_key
+            # 同時に実行できる数を超えた分（終わっていない前回のチェックを含む）は順番待ちになるため、
+            # その分だけ待ち時間を延ばす
+            busy = sum(1 for future in self.running.values() if not future.done())
+            rounds = max(1, -(-busy // self.max_workers))
+            # タイムアウトしたチェックの終了は待たない（サブプロセスにもタイムアウトがある）
+            done, _ = wait(futures, timeout=self.check_timeout * rounds)
+            for future, service_key in futures.items():
+                if future not in done:
+                    results[service_key] = self._timeout_result(service_key, self.services[service_key])
+                    continue
+                try:
+                    results[service_key] = self._record_result(service_key, future.result())
+                except Exception as e:
+                    self.logger.error(f"Check error for {self.services[service_key]['name']}: {e}")
+                    results[service_key] = self._record_result(service_key, {
+                        'service': self.services[service_key]['name'],
+                        'launchd_status': 'error',
+                        'log_status': {'status': 'error', 'message': str(e)},
+                        'overall_status': 'error'
+                    })
+        
+        # サービスの登録順に並べる
+        results = [results[key] for key in self.services if key in results]
         
         # 結果の要約
         healthy_count = sum(1 for r in results if r['overall_status'] == 'healthy')
@@ -6,7 +6,8 @@ Daily Reports → Notion「日記」 自動同期スクリプト
 機能:
 - 指定したMarkdownファイル（/Users/takuhito/Documents/daily-reports/*.md）を読み取り
 - ファイル名の日付 (YYYY-MM-DD.md) から Notion「日記」データベースのページ名 (YYYY-MMDD) を決定
-- ページを検索し、無ければ作成。既存なら本文ブロックを全削除して置き換え
+- ページを検索し、無ければ本文付きで作成。既存なら変わったブロックだけを差分更新
+- 作成前に NotionLinker の日記台帳（journal_registry.db）で日付を予約し、他のジョブとの二重作成を防止
 - MarkdownはネイティブNotionブロック（heading_1/2/3, bulleted_list_item, paragraph, divider）に変換
 
 必要な環境変数 (.env):
@@ -23,18 +24,9 @@ from __future__ import annotations
 import os
 import re
 import sys
-import time
-import random
 import argparse
 from pathlib import Path
-from typing import Any, Dict, List, Optional
-
-try:
-    from notion_client import Client
-    from notion_client.errors import APIResponseError, RequestTimeoutError
-except Exception:
-    print("notion-client が見つかりません。`pip install notion-client python-dotenv` を実行してください。")
-    sys.exit(1)
+from typing import Any, Dict, List, Optional, Tuple
 
 try:
     from dotenv import load_dotenv
@@ -46,6 +38,12 @@ except Exception:
 if load_dotenv:
     load_dotenv()
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from notion_common import create_client, create_page_with_blocks, get_block_cache, page_exists, print_call_stats, sync_page_blocks, with_retry
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "NotionLinker"))
+from journal_registry import JournalRegistry
+
 NOTION_TOKEN = os.getenv("NOTION_TOKEN")
 JOURNAL_DB_ID = os.getenv("JOURNAL_DB_ID")
 PROP_JOURNAL_TITLE = os.getenv("PROP_JOURNAL_TITLE", "タイトル")
@@ -55,7 +53,7 @@ if not NOTION_TOKEN or not JOURNAL_DB_ID:
     print("環境変数 NOTION_TOKEN / JOURNAL_DB_ID が未設定です。.env を確認してください。")
     sys.exit(1)
 
-notion = Client(auth=NOTION_TOKEN, timeout_ms=int(NOTION_TIMEOUT * 1000))
+notion = create_client(NOTION_TOKEN, NOTION_TIMEOUT)
 
 
 def resolve_journal_db_id() -> str:
@@ -91,32 +89,6 @@ def resolve_journal_db_id() -> str:
     raise RuntimeError("Notionで『日記』データベースが見つかりません。JOURNAL_DB_IDを.envに設定してください。")
 
 
-# ---------- リトライ付きAPIユーティリティ ----------
-def with_retry(fn, *, max_attempts: int = 4, base_delay: float = 1.0, what: str = "api"):
-    attempt = 0
-    while True:
-        try:
-            return fn()
-        except RequestTimeoutError:
-            attempt += 1
-            if attempt >= max_attempts:
-                raise
-            delay = base_delay * (2 ** (attempt - 1)) + random.uniform(0, 0.5)
-            print(f"[RETRY] Timeout on {what}. retry {attempt}/{max_attempts} in {delay:.1f}s")
-            time.sleep(delay)
-        except APIResponseError as e:
-            # レート制限は待って再試行
-            if getattr(e, "code", "") == "rate_limited":
-                attempt += 1
-                retry_after = float(getattr(e, "headers", {}).get("Retry-After", 1)) if hasattr(e, "headers") else 1.0
-                delay = max(retry_after, base_delay * (2 ** (attempt - 1))) + random.uniform(0, 0.5)
-                print(f"[RETRY] rate_limited on {what}. retry {attempt}/{max_attempts} in {delay:.1f}s")
-                time.sleep(delay)
-                if attempt < max_attempts:
-                    continue
-            raise
-
-
 # ---------- Markdown → Notion ブロック変換（シンプル版, 箇条書き・見出し対応） ----------
 def _inline_rich_text(text: str) -> List[Dict[str, Any]]:
     """非常に簡易な**bold**対応のリッチテキスト生成。"""
@@ -134,7 +106,7 @@ def _inline_rich_text(text: str) -> List[Dict[str, Any]]:
     return rich
 
 
-def parse_daily_markdown_to_blocks(content: str, max_blocks: int = 90) -> List[Dict[str, Any]]:
+def parse_daily_markdown_to_blocks(content: str, max_blocks: Optional[int] = None) -> List[Dict[str, Any]]:
     """日報用MarkdownをネイティブNotionブロックへ変換。
 
     対応:
@@ -142,6 +114,9 @@ def parse_daily_markdown_to_blocks(content: str, max_blocks: int = 90) -> List[D
       - --- 区切り線
       - - から始まる箇条書き（連続行を個別のbulleted_list_itemに）
       - それ以外は段落
+
+    長い段落の分割や100ブロックごとの送信は notion_common.append_blocks が行うため、
+    max_blocks を指定しない限りブロック数は切り詰めない。
     """
     blocks: List[Dict[str, Any]] = []
     lines = content.splitlines()
@@ -190,7 +165,7 @@ def parse_daily_markdown_to_blocks(content: str, max_blocks: int = 90) -> List[D
         if paragraph_text:
             blocks.append({"type": "paragraph", "paragraph": {"rich_text": _inline_rich_text(paragraph_text)}})
 
-        if len(blocks) >= max_blocks:
+        if max_blocks is not None and len(blocks) >= max_blocks:
             break
 
     return blocks
@@ -216,7 +191,11 @@ def date_title_from_filename(path: Path) -> str:
     return f"{y}-{mth}{d}"
 
 
-def find_or_create_journal_page(title_text: str) -> str:
+def find_or_create_journal_page(title_text: str, children: Optional[List[Dict[str, Any]]] = None) -> Tuple[str, bool]:
+    """日記ページのIDと、今回本文付きで新規作成したかどうかを返す
+
+    作成前にローカル台帳（JournalRegistry）で日付を予約し、link_diary.py などと同時に動いても二重作成しない。
+    """
     # タイトル一致で検索
     def _query():
         return notion.databases.query(
@@ -226,34 +205,37 @@ def find_or_create_journal_page(title_text: str) -> str:
                 "page_size": 1,
             }
         )
-    res = with_retry(_query, what="journal.query")
-    arr = res.get("results", [])
-    if arr:
-        return arr[0]["id"]
 
-    # 無ければ作成
-    props = {PROP_JOURNAL_TITLE: {"title": [{"type": "text", "text": {"content": title_text}}]}}
-    def _create():
-        return notion.pages.create(parent={"database_id": JOURNAL_DB_ID}, properties=props)
-    created = with_retry(_create, what="pages.create")
-    return created["id"]
+    created_ids = set()
 
+    def _find_or_create() -> str:
+        res = with_retry(_query, what="journal.query")
+        arr = res.get("results", [])
+        if arr:
+            return arr[0]["id"]
 
-def replace_page_children(page_id: str, children: List[Dict[str, Any]]):
-    # 既存の子ブロックを全削除
+        # 無ければ本文付きで作成（最初の100ブロックは作成時に含める）
+        props = {PROP_JOURNAL_TITLE: {"title": [{"type": "text", "text": {"content": title_text}}]}}
+        created = create_page_with_blocks(
+            notion, parent={"database_id": JOURNAL_DB_ID}, properties=props, blocks=children or []
+        )
+        created_ids.add(created["id"])
+        return created["id"]
+
+    registry = JournalRegistry()
     try:
-        listing = with_retry(lambda: notion.blocks.children.list(block_id=page_id), what="blocks.list")
-        for b in listing.get("results", []):
-            with_retry(lambda b_id=b["id"]: notion.blocks.delete(block_id=b_id), what="blocks.delete")
-    except Exception as e:
-        print(f"既存ブロック削除エラー: {e}")
+        page_id, _ = registry.ensure(
+            title_text, _find_or_create, verify=lambda page_id: page_exists(notion, page_id)
+        )
+    finally:
+        registry.close()
+    return page_id, page_id in created_ids
 
-    # 追加（Notionは1回に100ブロックまで）
-    idx = 0
-    while idx < len(children):
-        chunk = children[idx : idx + 90]
-        with_retry(lambda: notion.blocks.children.append(block_id=page_id, children=chunk), what="blocks.append")
-        idx += len(chunk)
+
+def replace_page_children(page_id: str, children: List[Dict[str, Any]]):
+    """本文を children に揃える（前回同期時のブロック一覧と比較し、変わったブロックだけ送信）"""
+    stats = sync_page_blocks(notion, page_id, children, cache=get_block_cache(), what="blocks")
+    print(f"本文差分: 更新{stats['update']} 追加{stats['insert']} 削除{stats['delete']} 変更なし{stats['keep']}")
 
 
 # ---------- メイン処理 ----------
@@ -270,8 +252,9 @@ def sync_daily_report(file_path: Path):
     global JOURNAL_DB_ID
     JOURNAL_DB_ID = resolve_journal_db_id()
 
-    page_id = find_or_create_journal_page(title_text)
-    replace_page_children(page_id, blocks)
+    page_id, created = find_or_create_journal_page(title_text, blocks)
+    if not created:
+        replace_page_children(page_id, blocks)
     print(f"同期完了: {file_path.name} → Notion『日記』: {title_text} ({page_id})")
 
 
@@ -282,6 +265,7 @@ def main():
 
     path = Path(args.file)
     sync_daily_report(path)
+    print_call_stats()
 
 
 if __name__ == "__main__":